@@ -0,0 +1,76 @@
+import os
+import time
+import uuid
+import mimetypes
+from datetime import timedelta
+from token_store import TokenStore
+from temp_janitor import janitor
+
+DEFAULT_TTL = timedelta(hours=1)
+CHUNK_SIZE = 64 * 1024
+FOLLOW_INTERVAL_SECONDS = 0.2
+
+
+class ArtifactStore:
+    """
+    Registers output files of tools under a random token, so they can be
+    streamed from /artifact/<token> instead of being inlined into the HTML.
+    The file is deleted by the janitor when the token expires.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.artifacts = TokenStore("artifacts", ttl=ttl)
+
+    def register(self, path, download_name, mimetype=None, complete=True):
+        """
+        Registers a file and returns its token. With complete=False the file is
+        still being written; it is streamed as it grows until finish() is called.
+        """
+        token = str(uuid.uuid4())
+        self.artifacts[token] = {
+            "path": path,
+            "download_name": download_name,
+            "mimetype": mimetype or mimetypes.guess_type(download_name)[0] or "application/octet-stream",
+            "complete": complete,
+        }
+        janitor.track(path, self.ttl)
+        return token
+
+    def get(self, token):
+        """Returns the artifact for a token or None if it is unknown, expired or its file is gone."""
+        artifact = self.artifacts.get(token)
+        if artifact is None or not os.path.exists(artifact["path"]):
+            return None
+        return artifact
+
+    def finish(self, token):
+        """Marks a file registered with complete=False as fully written."""
+        self.artifacts.update_entry(token, complete=True)
+
+    def follow(self, token):
+        """Yields the content of a growing file as it is written, until it is finished or expires."""
+        artifact = self.get(token)
+        if artifact is None:
+            return
+        deadline = time.time() + self.artifacts.ttl
+        with open(artifact["path"], "rb") as f:
+            while time.time() < deadline:
+                # Erst den Status, dann die Datei lesen, sonst gingen Daten nach dem Abschluss verloren
+                artifact = self.artifacts.get(token)
+                chunk = f.read(CHUNK_SIZE)
+                if chunk:
+                    yield chunk
+                elif artifact is None or artifact["complete"]:
+                    return
+                else:
+                    time.sleep(FOLLOW_INTERVAL_SECONDS)
+
+
+def artifact_url(token, download=False):
+    """URL of an artifact. With download=True the browser saves it instead of displaying it."""
+    return f"/artifact/{token}" + ("?download=1" if download else "")
+
+
+# Gemeinsame Instanz, die Tokens liegen im geteilten TokenStore
+artifact_store = ArtifactStore()
@@ -0,0 +1,108 @@
+import os
+import time
+import fcntl
+import tempfile
+from contextlib import contextmanager
+
+# Verzeichnis der Sperrdateien; alle Prozesse des Hosts müssen dasselbe verwenden
+SLOT_DIR = os.environ.get("SLOT_DIR") or os.path.join(tempfile.gettempdir(), "werkzeugkaestchen_slots")
+# Wartezeit zwischen zwei Versuchen, einen freien Platz zu finden
+POLL_SECONDS = 0.05
+
+# Sperrdateien, die dieser Prozess gerade hält
+_held = set()
+
+
+def _close_inherited():
+    # Ein Kindprozess, der die geerbten Deskriptoren offen hält, würde die Plätze der Eltern weiter belegen
+    for fd in list(_held):
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+    _held.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_close_inherited)
+
+
+class SlotTimeout(Exception):
+    """Raised when no slot became free within the timeout."""
+    pass
+
+
+class HostSlots:
+    """
+    Limits how many callers hold a slot at the same time on this host, across
+    all processes and threads. Every slot is a lock file that is held with
+    flock while it is in use. The kernel releases the lock when its process
+    exits, so a crashed worker never keeps a slot.
+    """
+
+    def __init__(self, name, size, directory=None):
+        self.name = name
+        self.size = max(1, size)
+        self.directory = directory
+
+    def _path(self, index):
+        return os.path.join(self.directory or SLOT_DIR, f"{self.name}.{index}.lock")
+
+    def _try_lock(self):
+        os.makedirs(self.directory or SLOT_DIR, exist_ok=True)
+        # Bei einer zufälligen Stelle beginnen, damit nicht alle um den ersten Platz konkurrieren
+        start = int.from_bytes(os.urandom(2), "big")
+        for offset in range(self.size):
+            path = self._path((start + offset) % self.size)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                _held.add(fd)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def acquire(self, timeout=None):
+        """Waits for a free slot and returns a handle for release()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fd = self._try_lock()
+        while fd is None:
+            if deadline is not None and time.monotonic() > deadline:
+                raise SlotTimeout(f"No free {self.name} slot within {timeout}s")
+            time.sleep(POLL_SECONDS)
+            fd = self._try_lock()
+        return fd
+
+    def release(self, fd):
+        # Schließen gibt die Sperre frei
+        _held.discard(fd)
+        os.close(fd)
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Holds a slot while the block runs."""
+        fd = self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release(fd)
+
+    def in_use(self):
+        """
+        Number of slots currently held by any process. Each free slot is
+        locked for a moment to find out, so this is meant for monitoring.
+        """
+        held = 0
+        for index in range(self.size):
+            path = self._path(index)
+            if not os.path.exists(path):
+                continue
+            fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                held += 1
+            finally:
+                os.close(fd)
+        return held
@@ -0,0 +1,231 @@
+import os
+import json
+import uuid
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from flask_babel import force_locale
+from token_store import TokenStore
+from temp_janitor import janitor
+
+# Tools, deren Ausführung Minuten dauern kann und die deshalb nicht im Request-Thread laufen
+HEAVY_TOOLS = {
+    "WhisperSubtitleTool",
+    "TextToSpeechTool",
+    "GifVideoConverterTool",
+    "AudioConverterTool",
+    "OcrScannerTool",
+    "TextSummaryTool",
+}
+
+# Status und Ergebnis der Jobs, für alle Webprozesse sichtbar (Download-Tokens der Tools liegen ebenfalls im TokenStore)
+job_results = TokenStore("jobs")
+
+# Wird durch init_app gesetzt; die Worker importieren dazu das Modul ihres Initializers (webapp)
+_app = None
+
+
+def events_path(job_id):
+    """Path of the file that collects the progress events of a job (one JSON object per line)."""
+    return os.path.join(tempfile.gettempdir(), f"job_{job_id}.events")
+
+
+def read_events(job_id, offset=0):
+    """
+    Returns the progress events written since offset and the new offset.
+
+    Returns (None, offset) if the job is unknown. Since the events are stored in a
+    file, every web worker on the host can stream them, not only the one that
+    submitted the job.
+    """
+    path = events_path(job_id)
+    if not os.path.exists(path):
+        return None, offset
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+
+    # Nur vollständig geschriebene Zeilen zurückgeben
+    complete = data[:data.rfind(b"\n") + 1]
+    events = [json.loads(line) for line in complete.decode("utf-8").splitlines() if line]
+    return events, offset + len(complete)
+
+
+class _EventWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, default=str) + "\n")
+
+
+def _picklable_params(value):
+    """Strips the Werkzeug file objects, workers only need the saved file paths."""
+    if isinstance(value, dict):
+        return {key: _picklable_params(item) for key, item in value.items() if key != "file_obj"}
+    if isinstance(value, list):
+        return [_picklable_params(item) for item in value]
+    return value
+
+
+def _file_paths(value):
+    """Collects the file_path entries of the (picklable) input parameters."""
+    if isinstance(value, dict):
+        paths = []
+        for key, item in value.items():
+            if key == "file_path" and isinstance(item, str):
+                paths.append(item)
+            else:
+                paths.extend(_file_paths(item))
+        return paths
+    if isinstance(value, list):
+        return [path for item in value for path in _file_paths(item)]
+    return []
+
+
+def paths_in_use():
+    """Uploads and event files of jobs that are still waiting or running, across all processes."""
+    paths = set()
+    for _job_id, job in job_results.items():
+        if job.get("status") in ("pending", "running"):
+            paths.update(job.get("paths", ()))
+    return paths
+
+
+def _execute(tool, input_params):
+    success = tool.execute_tool(input_params)
+    return {
+        "status": "done" if success else "failed",
+        # Lazy-Strings hier auflösen, solange die Sprache des Benutzers aktiv ist
+        "output": str(tool.output or ""),
+        "error_message": str(tool.error_message or ""),
+    }
+
+
+def _run_tool(tool_class, input_params, locale, job_id):
+    """Runs a tool inside a pool worker and stores the result in job_results."""
+    job_results.update_entry(job_id, status="running")
+    tool = tool_class()
+    tool.progress_callback = _EventWriter(events_path(job_id))
+    try:
+        if _app is None:
+            result = _execute(tool, input_params)
+        else:
+            with _app.app_context(), force_locale(locale or _app.config.get("BABEL_DEFAULT_LOCALE", "de")):
+                result = _execute(tool, input_params)
+        job_results.update_entry(job_id, **result)
+    finally:
+        tool.report_progress({"type": "done"})
+
+
+class JobQueue:
+    """
+    Bounded process pool for tool executions that are too slow for a request thread.
+
+    Jobs are identified by a uuid, their status can be queried with get() from
+    any web worker, since it is kept in the shared token store.
+    The optional initializer runs once in every worker process, e.g. to preload models.
+
+    The workers are started from a forkserver. The web process already runs
+    request threads when the first job arrives, and a plain fork could copy a
+    lock one of them holds into the worker. The workers import the modules of
+    the tools and of the initializer themselves instead of inheriting them.
+    """
+
+    def __init__(self, max_workers=None, retention=timedelta(hours=1), initializer=None):
+        self.max_workers = max_workers or int(os.environ.get("HEAVY_TOOL_WORKERS", 2))
+        self.retention = retention
+        self.initializer = initializer
+        self.jobs = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        global _app
+        _app = app
+        app.extensions["job_queue"] = self
+        # Der Janitor darf die Uploads wartender und laufender Jobs nicht löschen
+        janitor.paths_in_use = paths_in_use
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Der Forkserver hat keine weiteren Threads, seine Kinder erben keine gehaltenen Locks
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+            else:
+                context = multiprocessing.get_context()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=context,
+                                                 initializer=self.initializer)
+        return self._executor
+
+    def submit(self, tool, input_params: dict, locale=None) -> str:
+        """Submits a tool execution and returns the job id immediately."""
+        job_id = str(uuid.uuid4())
+        params = _picklable_params(input_params)
+
+        # Leere Ereignisdatei anlegen, damit der Job sofort abonniert werden kann
+        open(events_path(job_id), "w").close()
+
+        job_results[job_id] = {"tool_name": tool.identifier, "status": "pending",
+                               "paths": _file_paths(params) + [events_path(job_id)]}
+
+        with self._lock:
+            self.cleanup_old_jobs()
+            try:
+                future = self._get_executor().submit(_run_tool, type(tool), params, locale, job_id)
+            except BrokenProcessPool:
+                # Ein Worker ist abgestürzt (z.B. Speichermangel), Pool neu aufbauen
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                future = self._get_executor().submit(_run_tool, type(tool), params, locale, job_id)
+
+            self.jobs[job_id] = {
+                "future": future,
+                "timestamp": datetime.now(),
+            }
+
+        future.add_done_callback(lambda f: self._record_failure(job_id, f))
+        return job_id
+
+    def _record_failure(self, job_id, future):
+        # Abstürze des Workers erreichen job_results nicht, daher hier nachtragen
+        if future.cancelled():
+            job_results.update_entry(job_id, status="failed", error_message="Job wurde abgebrochen.")
+        elif future.exception() is not None:
+            job_results.update_entry(job_id, status="failed", error_message=str(future.exception()))
+
+    def get(self, job_id):
+        """Returns the status of a job or None if the job id is unknown."""
+        job = job_results.get(job_id)
+        if job is None:
+            return None
+
+        status = {"id": job_id, "tool_name": job["tool_name"], "status": job["status"]}
+        if job["status"] in ("done", "failed"):
+            status["output"] = job.get("output", "")
+            status["error_message"] = job.get("error_message", "")
+        return status
+
+    def cleanup_old_jobs(self):
+        """Forget finished jobs that are older than the retention period."""
+        now = datetime.now()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job["future"].done() and now - job["timestamp"] > self.retention]
+        for job_id in expired:
+            self.jobs.pop(job_id, None)
+            job_results.pop(job_id, None)
+            try:
+                os.remove(events_path(job_id))
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import shutil
+import pickle
+import hashlib
+import tempfile
+import threading
+
+CHUNK_SIZE = 1024 * 1024
+# Spätestens nach dieser Zeit wird das Verzeichnis durchlaufen, um Einträge anderer Prozesse mitzuzählen
+EVICT_INTERVAL_SECONDS = 300
+
+
+def file_sha256(file_path):
+    """SHA-256 of a file's content, read in chunks so large uploads don't end up in memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _content_hash(file):
+    if isinstance(file, dict):
+        return file.get("sha256") or file_sha256(file["file_path"])
+    return file_sha256(file)
+
+
+class ResultCache:
+    """
+    Disk cache for results of deterministic tools.
+
+    Keys are SHA-256 hashes over a namespace and the (normalized) inputs, usually
+    including the hash of the uploaded file. Values are either picklable objects
+    (get/put) or files (get_file/put_file). Entries expire after ttl seconds and
+    the least recently used entries are removed once max_bytes is exceeded.
+    Since everything lives on disk, the cache is shared by all worker processes.
+
+    The directory is only walked when the size known from the last walk plus
+    the entries written since then exceeds max_bytes, or every
+    EVICT_INTERVAL_SECONDS to account for the entries of other processes.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, ttl=None):
+        self.directory = directory or os.environ.get(
+            "RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "werkzeugkaestchen_cache"))
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("RESULT_CACHE_MAX_MB", 1024)) * 1024 * 1024
+        if ttl is None:
+            ttl = int(os.environ.get("RESULT_CACHE_TTL_HOURS", 24)) * 60 * 60
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Größe beim letzten Durchlauf plus die seitdem in diesem Prozess geschriebenen Einträge
+        self._known_bytes = None
+        self._last_evict = 0
+
+    @staticmethod
+    def key(namespace, *parts):
+        """Builds a cache key. Parts must be JSON serializable, dict keys are sorted."""
+        normalized = json.dumps([namespace, parts], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def file_key(self, namespace, files, *parts):
+        """
+        Builds a key over the content of one or more files plus further parts.
+        Files are paths or file info dicts; a "sha256" computed during the
+        upload is used instead of reading the file again.
+        Returns None if a file can't be read; all other methods treat a None key
+        as "don't cache", so a broken cache never makes a tool fail.
+        """
+        if isinstance(files, (str, dict)):
+            files = [files]
+        try:
+            hashes = [_content_hash(file) for file in files]
+        except Exception as e:
+            print(f"Error hashing input for result cache: {str(e)}")
+            return None
+        return self.key(namespace, hashes, *parts)
+
+    def _path(self, key, kind):
+        return os.path.join(self.directory, key[:2], f"{key}.{kind}")
+
+    def _lookup(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.misses += 1
+            return None
+
+        if time.time() - stat.st_mtime > self.ttl:
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Zugriffszeit setzen (LRU), die Änderungszeit bleibt der Erstellungszeitpunkt (TTL)
+        os.utime(path, (time.time(), stat.st_mtime))
+        self.hits += 1
+        return path
+
+    def get(self, key, default=None):
+        if key is None:
+            return default
+        path = self._lookup(self._path(key, "pkl"))
+        if path is None:
+            return default
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Error reading cache entry {key}: {str(e)}")
+            self._remove(path)
+            return default
+
+    def put(self, key, value):
+        if key is None:
+            return
+        self._write(self._path(key, "pkl"), lambda f: pickle.dump(value, f))
+
+    def get_file(self, key, destination):
+        """
+        Places the cached file at destination and returns destination, or None
+        on a miss. The file is hard-linked (copied across file systems), so an
+        eviction by another process can't delete it under the caller. Since a
+        link shares the content with the cache entry, destination must not be
+        modified in place, only replaced or deleted.
+        """
+        if key is None:
+            return None
+        path = self._lookup(self._path(key, "bin"))
+        if path is None:
+            return None
+        try:
+            if os.path.lexists(destination):
+                os.remove(destination)
+            try:
+                os.link(path, destination)
+            except OSError:
+                shutil.copyfile(path, destination)
+        except OSError as e:
+            # Zwischen Nachschlagen und Verlinken entfernt: wie ein Fehltreffer behandeln
+            print(f"Error reading cache entry {key}: {str(e)}")
+            self.hits -= 1
+            self.misses += 1
+            return None
+        return destination
+
+    def put_file(self, key, source_path):
+        if key is None:
+            return None
+
+        def copy(f):
+            with open(source_path, "rb") as source:
+                shutil.copyfileobj(source, f, CHUNK_SIZE)
+        if self._write(self._path(key, "bin"), copy):
+            return self._path(key, "bin")
+        return None
+
+    def _write(self, path, write):
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Erst in eine temporäre Datei schreiben, damit andere Prozesse nie halbe Einträge lesen
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            # Ein voller oder nicht beschreibbarer Cache darf das Tool nicht scheitern lassen
+            print(f"Error writing cache entry {path}: {str(e)}")
+            if temp_path:
+                self._remove(temp_path)
+            return False
+
+        with self._lock:
+            due = self._known_bytes is None or time.time() - self._last_evict > EVICT_INTERVAL_SECONDS
+            if self._known_bytes is not None:
+                self._known_bytes += size
+                due = due or self._known_bytes > self.max_bytes
+        if due:
+            self.evict()
+        return True
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Removes expired entries and then the least recently used ones until max_bytes is met."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    if now - stat.st_mtime > self.ttl:
+                        self._remove(path)
+                    else:
+                        entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+            self._known_bytes = total
+            self._last_evict = now
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "max_bytes": self.max_bytes, "ttl": self.ttl}
+
+
+# Gemeinsame Instanz, das Verzeichnis wird von allen Prozessen geteilt
+result_cache = ResultCache()
@@ -0,0 +1,133 @@
+// Fragt den Status eines Hintergrund-Jobs ab und zeigt das Ergebnis an, sobald es vorliegt
+document.addEventListener('DOMContentLoaded', function () {
+    const statusBox = document.getElementById('jobStatus');
+    if (!statusBox) {
+        return;
+    }
+
+    const jobId = statusBox.dataset.jobId;
+    const output = document.querySelector('.tool-output');
+    const pollInterval = 2000;
+
+    // Per innerHTML eingefügte Skripte werden nicht ausgeführt, daher neu anlegen
+    function runScripts(container) {
+        container.querySelectorAll('script').forEach(function (oldScript) {
+            const script = document.createElement('script');
+            script.textContent = oldScript.textContent;
+            oldScript.replaceWith(script);
+        });
+    }
+
+    function showError(message) {
+        statusBox.className = 'alert alert-danger';
+        statusBox.innerHTML = '';
+        const heading = document.createElement('h4');
+        heading.className = 'alert-heading';
+        heading.textContent = statusBox.dataset.errorHeading;
+        const text = document.createElement('p');
+        text.textContent = message;
+        statusBox.appendChild(heading);
+        statusBox.appendChild(text);
+    }
+
+    // Zwischenergebnisse (z.B. fertige Untertitel) werden per Server-Sent Events gestreamt
+    let progressBox = null;
+    let liveAudio = null;
+    let events = null;
+
+    function formatTime(seconds) {
+        const date = new Date(seconds * 1000);
+        return date.toISOString().substr(11, 12);
+    }
+
+    // Sprachausgabe wird schon abgespielt, während die restlichen Sätze noch erzeugt werden
+    function showLiveAudio(url) {
+        liveAudio = document.createElement('audio');
+        liveAudio.controls = true;
+        liveAudio.className = 'd-block my-3';
+        liveAudio.src = url;
+        statusBox.after(liveAudio);
+        liveAudio.play().catch(function () {});
+    }
+
+    function showProgress(event) {
+        if (event.type === 'audio') {
+            showLiveAudio(event.url);
+            return;
+        }
+        if (!progressBox) {
+            progressBox = document.createElement('pre');
+            progressBox.className = 'job-progress border rounded p-2 bg-light';
+            progressBox.style.maxHeight = '300px';
+            progressBox.style.overflowY = 'auto';
+            statusBox.after(progressBox);
+        }
+        if (event.type === 'cue') {
+            progressBox.textContent += formatTime(event.start) + ' --> ' + formatTime(event.end) + '  ' + event.text + '\n';
+        } else if (event.type === 'token') {
+            // Zusammenfassungen erscheinen Token für Token, während das Modell noch schreibt
+            progressBox.style.whiteSpace = 'pre-wrap';
+            progressBox.textContent += event.text;
+        } else if (event.type === 'page') {
+            // Erkannte Seiten erscheinen in der Reihenfolge, in der sie fertig werden
+            progressBox.style.whiteSpace = 'pre-wrap';
+            progressBox.textContent += '=== ' + event.label + ' (' + event.page + '/' + event.pages + ') ===\n' + event.text + '\n\n';
+        }
+        progressBox.scrollTop = progressBox.scrollHeight;
+    }
+
+    function stopEvents() {
+        if (events) {
+            events.close();
+            events = null;
+        }
+    }
+
+    // Nur Tools mit Zwischenergebnissen streamen; bei 503 (zu viele Streams) bleibt es beim Abfragen
+    if (window.EventSource && statusBox.dataset.events === 'true') {
+        events = new EventSource('/jobs/' + encodeURIComponent(jobId) + '/events');
+        events.onmessage = function (message) {
+            const event = JSON.parse(message.data);
+            if (event.type === 'done' || event.type === 'timeout') {
+                stopEvents();
+            } else {
+                showProgress(event);
+            }
+        };
+        events.onerror = stopEvents;
+    }
+
+    function poll() {
+        fetch('/jobs/' + encodeURIComponent(jobId))
+            .then(function (response) { return response.json(); })
+            .then(function (job) {
+                if (job.status === 'done') {
+                    stopEvents();
+                    statusBox.remove();
+                    if (progressBox) {
+                        progressBox.remove();
+                    }
+                    output.innerHTML = job.output;
+                    // Laufende Wiedergabe übernehmen, statt den fertigen Player neu zu starten
+                    const finalAudio = output.querySelector('audio');
+                    if (liveAudio && finalAudio) {
+                        liveAudio.className = '';
+                        finalAudio.replaceWith(liveAudio);
+                    } else if (liveAudio) {
+                        liveAudio.remove();
+                    }
+                    runScripts(output);
+                } else if (job.status === 'failed' || job.status === 'unknown') {
+                    stopEvents();
+                    showError(job.error_message || '');
+                } else {
+                    setTimeout(poll, pollInterval);
+                }
+            })
+            .catch(function () {
+                setTimeout(poll, pollInterval);
+            });
+    }
+
+    poll();
+});
@@ -0,0 +1,262 @@
+import os
+import time
+import heapq
+import shutil
+import fnmatch
+import threading
+from datetime import timedelta
+
+# Uploads und Ergebnisse werden genauso lange aufbewahrt wie die Download-Tokens der Tools
+DEFAULT_TTL = timedelta(hours=1)
+
+# Längste Wartezeit des Threads, falls die Uhr springt oder eine Benachrichtigung verloren geht
+MAX_SLEEP_SECONDS = 60
+
+# Dateien, die ein laufender Job noch braucht, werden nach dieser Zeit erneut geprüft
+IN_USE_RETRY_SECONDS = 300
+
+# Namen, unter denen die Tools im Temp-Verzeichnis ablegen; nur diese räumt sweep() auf
+SWEEP_PATTERNS = (
+    "upload_*", "tts_parts_*", "whisper_*", "job_*.events",
+    "converted_*", "merged_*.pdf", "qrcode_*.png", "ocr_*.txt", "ocr_*.hocr", "extracted_text_*.txt",
+    "output_????????-????-????-????-????????????.*",
+    "????????????????????????????????_*_part[12].pdf",
+)
+
+
+def _path_size(path):
+    try:
+        if os.path.isdir(path):
+            total = 0
+            for root, _, files in os.walk(path):
+                for name in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+            return total
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class TempJanitor:
+    """
+    Deletes temporary uploads and results once they expire.
+
+    Paths are registered with track() and kept in a min-heap ordered by expiry
+    time, so the background thread only looks at files that are actually due.
+    If the tracked files exceed quota_bytes, the ones that expire first are
+    removed early. Each process runs its own thread, which is started on the
+    first track() call (also in forked worker processes).
+
+    Since every process only knows the paths it tracked itself, sweep() removes
+    what earlier runs left behind, by modification time. paths_in_use can be
+    set to a function returning the paths of queued or running jobs; those are
+    never deleted, only checked again later.
+    """
+
+    def __init__(self, quota_bytes=None):
+        if quota_bytes is None:
+            quota_bytes = int(os.environ.get("TEMP_QUOTA_MB", 10240)) * 1024 * 1024
+        self.quota_bytes = quota_bytes
+        self._heap = []
+        # Aktuelle Ablaufzeit und Größe je Pfad, veraltete Heap-Einträge werden beim Entnehmen übersprungen
+        self._expires = {}
+        self._sizes = {}
+        self._usage = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self.paths_in_use = None
+        self.tracked = 0
+        self.deleted = 0
+        self.deleted_bytes = 0
+        self.quota_evictions = 0
+        self.errors = 0
+        # Threads und gehaltene Locks überleben fork nicht sauber, im Kindprozess neu anlegen
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def track(self, path, ttl=DEFAULT_TTL):
+        """Registers a file or directory for deletion after ttl. Tracking a path again extends it."""
+        ttl = ttl.total_seconds() if isinstance(ttl, timedelta) else ttl
+        size = _path_size(path)
+        # Nur nachfragen, wenn das Kontingent voraussichtlich überschritten wird
+        in_use = self._in_use() if self._usage + size > self.quota_bytes else set()
+
+        with self._condition:
+            self._add(path, time.time() + ttl, size)
+            self.tracked += 1
+            evicted = self._enforce_quota(in_use)
+            # Der Thread schläft evtl. bis zu einem späteren Zeitpunkt
+            self._condition.notify()
+
+        # Gelöscht wird außerhalb des Locks, damit track() anderer Threads nicht auf die Platte wartet
+        for path in evicted:
+            self._delete(path)
+        self._ensure_thread()
+
+    def _add(self, path, expires, size):
+        self._usage += size - self._sizes.get(path, 0)
+        self._sizes[path] = size
+        self._expires[path] = expires
+        heapq.heappush(self._heap, (expires, path))
+
+    def _in_use(self):
+        if self.paths_in_use is None:
+            return set()
+        try:
+            return set(self.paths_in_use())
+        except Exception as e:
+            print(f"Error reading the paths of running jobs: {str(e)}")
+            return set()
+
+    @staticmethod
+    def _is_in_use(path, in_use):
+        # Ein Upload-Verzeichnis ist belegt, sobald ein Job eine Datei darin braucht
+        return any(used == path or used.startswith(path.rstrip(os.sep) + os.sep) for used in in_use)
+
+    def expire(self, path):
+        """Deletes a tracked (or untracked) path right away, e.g. after it was downloaded."""
+        with self._condition:
+            self._forget(path)
+        self._delete(path)
+
+    def _forget(self, path):
+        self._expires.pop(path, None)
+        self._usage -= self._sizes.pop(path, 0)
+
+    def _pop_due(self, now):
+        """Removes and returns the paths whose expiry time has passed."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            expires, path = heapq.heappop(self._heap)
+            if self._expires.get(path) == expires:
+                self._forget(path)
+                due.append(path)
+        return due
+
+    def _enforce_quota(self, in_use):
+        """Removes the paths that expire first until the quota is met and returns them for deletion."""
+        evicted = []
+        kept = []
+        while self._usage > self.quota_bytes and self._heap:
+            expires, path = heapq.heappop(self._heap)
+            if self._expires.get(path) != expires:
+                continue
+            if self._is_in_use(path, in_use):
+                kept.append((expires, path))
+                continue
+            self._forget(path)
+            self.quota_evictions += 1
+            evicted.append(path)
+        # Belegte Pfade bleiben vorgemerkt
+        for entry in kept:
+            heapq.heappush(self._heap, entry)
+        return evicted
+
+    def _delete(self, path):
+        size = _path_size(path)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            else:
+                return
+        except OSError as e:
+            with self._condition:
+                self.errors += 1
+            print(f"Error deleting temporary file {path}: {str(e)}")
+            return
+        with self._condition:
+            self.deleted += 1
+            self.deleted_bytes += size
+
+    def run_once(self, now=None):
+        """Deletes all paths that are due and returns how many seconds the next one is away."""
+        now = time.time() if now is None else now
+        with self._condition:
+            due = self._pop_due(now)
+        in_use = self._in_use() if due else set()
+        for path in due:
+            if self._is_in_use(path, in_use):
+                self.track(path, IN_USE_RETRY_SECONDS)
+            else:
+                self._delete(path)
+
+        with self._condition:
+            if not self._heap:
+                return None
+            return max(0, self._heap[0][0] - time.time())
+
+    def sweep(self, directories, max_age=DEFAULT_TTL, now=None):
+        """
+        Deletes entries of the given directories that match SWEEP_PATTERNS and
+        were last modified more than max_age ago, e.g. files of a previous run
+        that no process tracks anymore. Returns the number of deleted paths.
+        """
+        max_age = max_age.total_seconds() if isinstance(max_age, timedelta) else max_age
+        cutoff = (time.time() if now is None else now) - max_age
+        candidates = []
+        for directory in set(directories):
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if not any(fnmatch.fnmatchcase(name, pattern) for pattern in SWEEP_PATTERNS):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if os.lstat(path).st_mtime < cutoff:
+                        candidates.append(path)
+                except OSError:
+                    pass
+
+        in_use = self._in_use() if candidates else set()
+        with self._condition:
+            tracked = set(self._expires)
+        count = 0
+        for path in candidates:
+            if path in tracked or self._is_in_use(path, in_use):
+                continue
+            self._delete(path)
+            count += 1
+        if count:
+            print(f"Removed {count} leftover temporary files")
+        return count
+
+    def _run(self):
+        while True:
+            wait = self.run_once()
+            with self._condition:
+                self._condition.wait(min(wait, MAX_SLEEP_SECONDS) if wait is not None else MAX_SLEEP_SECONDS)
+
+    def _ensure_thread(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="temp-janitor", daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "pending": len(self._expires),
+                "usage_bytes": self._usage,
+                "quota_bytes": self.quota_bytes,
+                "tracked": self.tracked,
+                "deleted": self.deleted,
+                "deleted_bytes": self.deleted_bytes,
+                "quota_evictions": self.quota_evictions,
+                "errors": self.errors,
+            }
+
+
+# Gemeinsame Instanz pro Prozess
+janitor = TempJanitor()
@@ -1,3 +1,30 @@
 import os
 import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    """Jeder Test bekommt einen leeren Ergebnis-Cache, damit frühere Läufe nichts vorwegnehmen."""
+    from result_cache import result_cache
+    monkeypatch.setattr(result_cache, "directory", str(tmp_path / "result_cache"))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def isolated_token_store(tmp_path_factory):
+    """
+    Eigene Token-Datenbank für den Testlauf. Sitzungsweit und über die Umgebung,
+    damit die Job-Worker (Forkserver) dieselbe Datei sehen.
+    """
+    import token_store
+    path = str(tmp_path_factory.mktemp("tokens") / "tokens.db")
+    os.environ["TOKEN_STORE_URL"] = "sqlite:///" + path
+    token_store.set_backend(token_store.SQLiteBackend(path))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def isolated_host_slots(tmp_path_factory):
+    """Eigene Sperrdateien für den Testlauf, damit eine laufende Instanz auf dem Rechner nicht mitzählt."""
+    import host_slots
+    host_slots.SLOT_DIR = os.environ["SLOT_DIR"] = str(tmp_path_factory.mktemp("slots"))
@@ -0,0 +1,103 @@
+import os
+import time
+import pytest
+import threading
+from datetime import timedelta
+from artifact_store import ArtifactStore, artifact_store, artifact_url
+from webapp import app
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "speech.wav"
+    path.write_bytes(bytes(range(256)) * 4)
+    return str(path)
+
+
+def test_register_and_get(artifact):
+    token = artifact_store.register(artifact, "speech.wav")
+    entry = artifact_store.get(token)
+    assert entry["path"] == artifact
+    assert entry["download_name"] == "speech.wav"
+    assert entry["mimetype"] in ("audio/wav", "audio/x-wav")
+
+
+def test_unknown_or_deleted_artifact(artifact):
+    assert artifact_store.get("unknown") is None
+    token = artifact_store.register(artifact, "speech.wav")
+    os.remove(artifact)
+    assert artifact_store.get(token) is None
+
+
+def test_expired_artifact(artifact):
+    store = ArtifactStore(ttl=timedelta(seconds=-1))
+    token = store.register(artifact, "speech.wav")
+    assert store.get(token) is None
+
+
+def test_artifact_url():
+    assert artifact_url("abc") == "/artifact/abc"
+    assert artifact_url("abc", download=True) == "/artifact/abc?download=1"
+
+
+def test_route_streams_inline(client, artifact):
+    token = artifact_store.register(artifact, "speech.wav", "audio/wav")
+    response = client.get(artifact_url(token))
+    assert response.status_code == 200
+    assert response.mimetype == "audio/wav"
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert "attachment" not in response.headers.get("Content-Disposition", "")
+    assert response.data == bytes(range(256)) * 4
+
+
+def test_route_download_is_attachment(client, artifact):
+    token = artifact_store.register(artifact, "speech.wav", "audio/wav")
+    response = client.get(artifact_url(token, download=True))
+    assert response.status_code == 200
+    assert "attachment" in response.headers["Content-Disposition"]
+    assert "speech.wav" in response.headers["Content-Disposition"]
+
+
+def test_route_range_request(client, artifact):
+    token = artifact_store.register(artifact, "speech.wav", "audio/wav")
+    response = client.get(artifact_url(token), headers={"Range": "bytes=256-511"})
+    assert response.status_code == 206
+    assert response.data == bytes(range(256))
+    assert response.headers["Content-Range"] == "bytes 256-511/1024"
+
+
+def test_route_conditional_request(client, artifact):
+    token = artifact_store.register(artifact, "speech.wav", "audio/wav")
+    etag = client.get(artifact_url(token)).headers["ETag"]
+    response = client.get(artifact_url(token), headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_route_unknown_token(client):
+    assert client.get(artifact_url("unknown")).status_code == 404
+
+
+def test_route_follows_growing_file(client, artifact):
+    token = artifact_store.register(artifact, "speech.wav", "audio/wav", complete=False)
+
+    def finish_writing():
+        time.sleep(0.3)
+        with open(artifact, "ab") as f:
+            f.write(b"rest")
+        artifact_store.finish(token)
+
+    writer = threading.Thread(target=finish_writing)
+    writer.start()
+    response = client.get(artifact_url(token))
+    writer.join()
+
+    assert response.status_code == 200
+    assert response.data == bytes(range(256)) * 4 + b"rest"
+    assert artifact_store.get(token)["complete"]
@@ -150,7 +150,7 @@ def test_cleanup_old_files(sample_audio):
     assert token is not None
     
     # Mark as downloaded
-    tool.pending_conversions[token]["downloaded"] = True
+    tool.pending_conversions.update_entry(token, downloaded=True)
     
     # Run cleanup
     tool.cleanup_old_files()
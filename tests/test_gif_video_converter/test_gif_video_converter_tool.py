@@ -199,7 +199,7 @@ class TestGifVideoConverterTool:
         }
         token = "12345678-1234-5678-1234-567812345678"
         converter_tool.execute_tool(input_params)
-        converter_tool.pending_conversions[token]["downloaded"] = True # Mark as downloaded
+        converter_tool.pending_conversions.update_entry(token, downloaded=True) # Mark as downloaded
 
         output_path = converter_tool.convert_and_save(token)
         assert output_path is None
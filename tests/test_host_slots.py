@@ -0,0 +1,47 @@
+import os
+import time
+import signal
+import multiprocessing
+import pytest
+from host_slots import HostSlots, SlotTimeout
+
+
+def hold_slot(directory, ready, seconds):
+    with HostSlots("test", 1, directory=directory).slot():
+        ready.set()
+        time.sleep(seconds)
+
+
+def test_slots_are_shared_between_processes(tmp_path):
+    slots = HostSlots("test", 1, directory=str(tmp_path))
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=hold_slot, args=(str(tmp_path), ready, 30))
+    process.start()
+    try:
+        assert ready.wait(10)
+        assert slots.in_use() == 1
+        with pytest.raises(SlotTimeout):
+            with slots.slot(timeout=0.2):
+                pass
+    finally:
+        # Ein abgestürzter Prozess gibt seinen Platz trotzdem frei
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+    with slots.slot(timeout=1):
+        assert slots.in_use() == 1
+    assert slots.in_use() == 0
+
+
+def test_forked_children_do_not_keep_the_slot(tmp_path):
+    slots = HostSlots("test", 1, directory=str(tmp_path))
+    context = multiprocessing.get_context("fork")
+    with slots.slot():
+        child = context.Process(target=time.sleep, args=(30,))
+        child.start()
+    try:
+        with slots.slot(timeout=1):
+            pass
+    finally:
+        child.kill()
+        child.join()
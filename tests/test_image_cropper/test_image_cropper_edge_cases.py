@@ -259,7 +259,7 @@ def test_cleanup_after_crop(sample_images):
     
     # Simulate download completion
     for token in tool.pending_crops.keys():
-        tool.pending_crops[token]['downloaded'] = True
+        tool.pending_crops.update_entry(token, downloaded=True)
     
     # Run cleanup
     tool.cleanup_old_files()
@@ -0,0 +1,156 @@
+import json
+import time
+import pytest
+from job_queue import JobQueue, read_events, paths_in_use, events_path, job_results
+from token_store import TokenStore
+from tool_interface import MiniTool
+from webapp import app, job_queue
+
+
+class SlowEchoTool(MiniTool):
+    pending_conversions = TokenStore("slow_echo")
+
+    def __init__(self):
+        super().__init__("Echo", "SlowEchoTool")
+
+    def execute_tool(self, input_params: dict) -> bool:
+        if not input_params.get("text"):
+            self.error_message = "Kein Text"
+            return False
+        self.pending_conversions["token"] = {"text": input_params["text"]}
+        for character in input_params["text"]:
+            self.report_progress({"type": "char", "value": character})
+        self.output = input_params["text"].upper()
+        return True
+
+
+def wait_for(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"Job {job_id} wurde nicht rechtzeitig fertig")
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_workers=1)
+    yield queue
+    queue.shutdown()
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def test_job_returns_output(queue):
+    job_id = queue.submit(SlowEchoTool(), {"text": "hallo", "file": {"file_obj": object(), "file_path": "/tmp/x"}})
+    job = wait_for(queue, job_id)
+    assert job["status"] == "done"
+    assert job["output"] == "HALLO"
+    assert job["tool_name"] == "SlowEchoTool"
+
+
+def test_uploads_of_unfinished_jobs_are_in_use(queue):
+    job_id = queue.submit(SlowEchoTool(), {"text": "abc", "file": [{"file_obj": object(), "file_path": "/tmp/upload_x/a.mp3"}]})
+    wait_for(queue, job_id)
+    assert "/tmp/upload_x/a.mp3" not in paths_in_use()
+
+    # Solange der Job wartet oder läuft, gehören seine Dateien ihm
+    job_results.update_entry(job_id, status="running")
+    assert {"/tmp/upload_x/a.mp3", events_path(job_id)} <= paths_in_use()
+    job_results.update_entry(job_id, status="done")
+
+
+def test_job_failure_reports_error(queue):
+    job_id = queue.submit(SlowEchoTool(), {})
+    job = wait_for(queue, job_id)
+    assert job["status"] == "failed"
+    assert job["error_message"] == "Kein Text"
+
+
+def test_worker_state_is_visible_in_web_process(queue):
+    SlowEchoTool.pending_conversions.clear()
+    job_id = queue.submit(SlowEchoTool(), {"text": "abc"})
+    wait_for(queue, job_id)
+    assert SlowEchoTool.pending_conversions["token"] == {"text": "abc"}
+
+
+def test_job_status_is_shared_between_queues(queue):
+    # Ein anderer Webprozess hat eine eigene Queue, sieht aber denselben Status
+    job_id = queue.submit(SlowEchoTool(), {"text": "abc"})
+    wait_for(queue, job_id)
+    other = JobQueue(max_workers=1)
+    assert other.get(job_id)["output"] == "ABC"
+
+
+def test_unknown_job_returns_404(client):
+    response = client.get('/jobs/does-not-exist')
+    assert response.status_code == 404
+    assert response.get_json()["status"] == "unknown"
+
+
+def test_heavy_tool_returns_job_page(client):
+    response = client.post('/handle_tool', data={"tool_name": "OcrScannerTool"})
+    assert response.status_code == 200
+    assert b'data-job-id="' in response.data
+
+    job_id = response.data.split(b'data-job-id="')[1].split(b'"')[0].decode()
+    wait_for(job_queue, job_id)
+    job = client.get(f'/jobs/{job_id}').get_json()
+    assert job["status"] == "failed"
+    assert job["error_message"] == "Bitte wählen Sie ein Bild aus."
+
+
+def test_progress_events_are_recorded(queue):
+    job_id = queue.submit(SlowEchoTool(), {"text": "ab"})
+    wait_for(queue, job_id)
+    events, offset = read_events(job_id)
+    assert events == [{"type": "char", "value": "a"}, {"type": "char", "value": "b"}, {"type": "done"}]
+    assert read_events(job_id, offset) == ([], offset)
+
+
+def test_events_are_streamed_as_sse(client):
+    job_id = job_queue.submit(SlowEchoTool(), {"text": "xy"})
+    response = client.get(f'/jobs/{job_id}/events')
+    assert response.mimetype == "text/event-stream"
+
+    events = [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).split("\n\n") if line]
+    assert events[-1] == {"type": "done"}
+    assert [event["value"] for event in events[:-1]] == ["x", "y"]
+
+
+def test_events_of_unknown_job_return_404(client):
+    assert client.get('/jobs/does-not-exist/events').status_code == 404
+
+
+def test_event_streams_are_limited(client, monkeypatch):
+    import threading
+    import webapp
+    monkeypatch.setattr(webapp, "event_stream_slots", threading.BoundedSemaphore(1))
+    job_id = job_queue.submit(SlowEchoTool(), {"text": "xy"})
+
+    webapp.event_stream_slots.acquire()
+    # Alle Plätze belegt: der Browser fragt stattdessen nur den Status ab
+    assert client.get(f'/jobs/{job_id}/events').status_code == 503
+    webapp.event_stream_slots.release()
+
+    response = client.get(f'/jobs/{job_id}/events')
+    response.get_data()
+    response.close()
+    # Der Platz wird nach dem Stream wieder frei
+    assert webapp.event_stream_slots.acquire(blocking=False)
+
+
+def test_event_stream_ends_after_time_limit(client, monkeypatch):
+    import webapp
+    monkeypatch.setattr(webapp, "EVENT_STREAM_SECONDS", 0)
+    job_id = job_queue.submit(SlowEchoTool(), {"text": "xy"})
+
+    data = client.get(f'/jobs/{job_id}/events').get_data(as_text=True)
+    assert json.loads(data.strip()[len("data: "):]) == {"type": "timeout"}
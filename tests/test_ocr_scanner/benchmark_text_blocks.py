@@ -0,0 +1,112 @@
+"""
+Compares the NumPy text block detection of OcrScannerTool with the former
+pixel-by-pixel implementation on a synthetic 1500x1500 scan.
+
+    python -m tests.test_ocr_scanner.benchmark_text_blocks
+"""
+import time
+import random
+from PIL import Image, ImageDraw
+from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool
+
+
+def detect_text_blocks_loops(tool, image):
+    """The former implementation of detect_text_blocks (without its time limit), kept as reference."""
+    gray = image.convert('L')
+    all_blocks = []
+
+    for threshold in tool.BLOCK_THRESHOLDS:
+        binary = gray.point(lambda x: 0 if x < threshold else 255, '1')
+        width, height = binary.size
+        pixels = binary.load()
+
+        grid_size = 10
+        grid_width = width // grid_size
+        grid_height = height // grid_size
+
+        text_blocks = []
+        for y in range(grid_height):
+            row_blocks = []
+            current_block = None
+
+            for x in range(grid_width):
+                x1, y1 = x * grid_size, y * grid_size
+                x2, y2 = min(x1 + grid_size, width), min(y1 + grid_size, height)
+
+                black_count = 0
+                total = 0
+                for py in range(y1, y2):
+                    for px in range(x1, x2):
+                        total += 1
+                        if px < width and py < height and pixels[px, py] == 0:
+                            black_count += 1
+
+                center_x, center_y = width/2, height/2
+                dist_from_center = ((x*grid_size - center_x)**2 + (y*grid_size - center_y)**2)**0.5
+                max_dist = ((width/2)**2 + (height/2)**2)**0.5
+                relative_dist = dist_from_center / max_dist
+                thresh = 0.1 + 0.3 * relative_dist
+
+                if total > 0 and black_count / total > thresh:
+                    if current_block is None:
+                        current_block = [x1, y1, x2, y2]
+                    else:
+                        current_block[2] = x2
+                else:
+                    if current_block is not None:
+                        row_blocks.append(tuple(current_block))
+                        current_block = None
+
+            if current_block is not None:
+                row_blocks.append(tuple(current_block))
+
+            text_blocks.extend(row_blocks)
+
+            if len(text_blocks) > tool.MAX_BLOCK_COUNT:
+                text_blocks = text_blocks[:tool.MAX_BLOCK_COUNT]
+                break
+
+        all_blocks.extend(text_blocks)
+
+    return tool.merge_overlapping_blocks(all_blocks)
+
+
+def synthetic_scan(width=1500, height=1500, seed=0):
+    """A page with lines of word-like boxes in different gray levels and some noise."""
+    rng = random.Random(seed)
+    image = Image.new('L', (width, height), color=255)
+    draw = ImageDraw.Draw(image)
+    for top in range(60, height - 60, 34):
+        left = rng.randint(40, 120)
+        while left < width - 100:
+            word = rng.randint(20, 90)
+            draw.rectangle([(left, top), (left + word, top + rng.randint(10, 22))], fill=rng.choice([20, 100, 150]))
+            left += word + rng.randint(8, 30)
+    for _ in range(2000):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.point((x, y), fill=rng.randint(0, 255))
+    return image
+
+
+def main():
+    tool = OcrScannerTool()
+    image = synthetic_scan()
+
+    start = time.perf_counter()
+    expected = detect_text_blocks_loops(tool, image)
+    loops_seconds = time.perf_counter() - start
+
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        blocks = tool.detect_text_blocks(image)
+    numpy_seconds = (time.perf_counter() - start) / runs
+
+    print(f"Image: {image.size[0]}x{image.size[1]}, {len(blocks)} merged blocks")
+    print(f"Python loops: {loops_seconds * 1000:8.1f} ms")
+    print(f"NumPy:        {numpy_seconds * 1000:8.1f} ms ({loops_seconds / numpy_seconds:.0f}x faster)")
+    print(f"Identical:    {blocks == expected}")
+
+
+if __name__ == "__main__":
+    main()
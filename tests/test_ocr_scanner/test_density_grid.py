@@ -0,0 +1,49 @@
+from unittest.mock import patch
+from PIL import Image, ImageDraw, ImageEnhance
+from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool
+from tests.test_ocr_scanner.benchmark_text_blocks import synthetic_scan
+
+
+def density_grid_loops(image, grid_size=20):
+    """The former cell-by-cell computation of simple_ocr, as reference."""
+    binary = ImageEnhance.Contrast(image.convert('L')).enhance(2.0).point(lambda x: 0 if x < 127 else 255, '1')
+    width, height = image.size
+    grid = []
+    for y in range(height // grid_size):
+        row = []
+        for x in range(width // grid_size):
+            region = binary.crop((x * grid_size, y * grid_size, (x + 1) * grid_size, (y + 1) * grid_size))
+            row.append(sum(1 for pixel in region.getdata() if pixel == 0) / (grid_size * grid_size))
+        grid.append(row)
+    return grid
+
+
+def test_density_grid_matches_cell_loop():
+    image = synthetic_scan(457, 333, seed=4).convert('RGB')
+    assert OcrScannerTool().density_grid(image).tolist() == density_grid_loops(image)
+
+
+def test_blank_page_detection():
+    tool = OcrScannerTool()
+    blank = Image.new('RGB', (600, 800), color='white')
+    # Einzelne Staubkörner machen eine Seite noch nicht beschrieben
+    draw = ImageDraw.Draw(blank)
+    for x, y in [(100, 100), (300, 500), (550, 20)]:
+        draw.point((x, y), fill='black')
+    assert tool.is_blank_page(blank)
+
+    draw.text((50, 400), "Ein Wort", fill='black')
+    assert not tool.is_blank_page(blank)
+
+
+def test_blank_page_skips_ocr(tmp_path):
+    file_path = str(tmp_path / "blank.png")
+    Image.new('RGB', (600, 800), color='white').save(file_path)
+    tool = OcrScannerTool()
+
+    with patch.object(OcrScannerTool, 'extract_text_from_cloud') as cloud, \
+            patch.object(OcrScannerTool, 'simple_ocr') as simple:
+        assert tool.execute_tool({"image": {"file_path": file_path, "filename": "blank.png"}})
+
+    cloud.assert_not_called()
+    simple.assert_not_called()
@@ -0,0 +1,99 @@
+import time
+import threading
+import pytest
+from PIL import Image, ImageDraw
+from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool
+
+
+class FakePool:
+    """Stands in for the Tesseract pool; answers every image with one word: the width of the image."""
+
+    size = 4
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def has_tesserocr(self):
+        return True
+
+    def image_to_data(self, image, psm=None):
+        with self.lock:
+            self.calls.append((image.size, psm))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return {'level': [5], 'page_num': [1], 'block_num': [1], 'par_num': [1], 'line_num': [1], 'word_num': [1],
+                'left': [5], 'top': [5], 'width': [10], 'height': [10], 'conf': [90.0], 'text': [str(image.width)]}
+
+    def image_to_string(self, image, psm=None):
+        return ""
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr("tools.ocr_scanner.ocr_scanner_tool.tesseract_pool", pool)
+    return pool
+
+
+def tool():
+    tool = OcrScannerTool()
+    tool.tesseract_path = None
+    return tool
+
+
+def receipt():
+    """Sparse page: a heading, two columns side by side and a footer."""
+    image = Image.new('RGB', (800, 1000), color='white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([(50, 50), (249, 69)], fill='black')
+    draw.rectangle([(50, 300), (349, 399)], fill='black')
+    draw.rectangle([(450, 320), (599, 419)], fill='black')
+    draw.rectangle([(50, 900), (149, 919)], fill='black')
+    return image
+
+
+def test_regions_are_recognized_in_reading_order(pool):
+    result = tool().recognize(receipt(), preview=False)
+
+    # Die Breite des Ausschnitts (samt Rand) steht für den Bereich
+    assert result["extracted_text"] == "220 320 170 120"
+    assert {psm for _size, psm in pool.calls} == {OcrScannerTool.REGION_PSM}
+    assert sum(width * height for (width, height), _psm in pool.calls) < 800 * 1000 / 4
+
+    # Wortpositionen beziehen sich auf die ganze Seite, jeder Bereich hat eigene Zeilen
+    assert [(region["x"], region["y"]) for region in result["text_regions"]] == [(45, 45), (45, 295), (445, 315), (45, 895)]
+    assert [region["line"] for region in result["text_regions"]] == [0, 1, 2, 3]
+
+
+def test_dense_page_is_recognized_as_a_whole(pool):
+    image = Image.new('RGB', (400, 400), color='white')
+    draw = ImageDraw.Draw(image)
+    for y in range(20, 380, 20):
+        draw.rectangle([(20, y), (380, y + 9)], fill='black')
+
+    tool().recognize(image, preview=False)
+    assert pool.calls == [((400, 400), None)]
+
+
+def test_layout_ocr_can_be_disabled(pool, monkeypatch):
+    monkeypatch.setattr(OcrScannerTool, "LAYOUT_OCR_ENABLED", False)
+    tool().recognize(receipt(), preview=False)
+    assert pool.calls == [((800, 1000), None)]
+
+
+def test_region_threads_can_be_limited(pool):
+    tool().recognize(receipt(), preview=False, region_threads=1)
+    assert len(pool.calls) == 4
+    assert pool.peak == 1
+
+
+def test_reading_order_of_columns():
+    blocks = [(400, 100, 700, 500), (0, 0, 700, 50), (0, 120, 300, 480), (0, 600, 700, 650)]
+    assert OcrScannerTool().reading_order(blocks) == [(0, 0, 700, 50), (0, 120, 300, 480),
+                                                     (400, 100, 700, 500), (0, 600, 700, 650)]
@@ -0,0 +1,112 @@
+import xml.etree.ElementTree as ET
+import pytest
+from PIL import Image, ImageDraw
+from tools.ocr_scanner import ocr_batch
+from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool
+
+
+def scan_pages(count):
+    pages = []
+    for i in range(count):
+        image = Image.new('RGB', (600, 400), color='white')
+        # Die zweite Seite bleibt leer
+        if i != 1:
+            ImageDraw.Draw(image).rectangle([(50, 80 + 40 * i), (400, 110 + 40 * i)], fill='black')
+        pages.append(image)
+    return pages
+
+
+@pytest.fixture
+def offline_tool(monkeypatch):
+    monkeypatch.setattr(OcrScannerTool, "CLOUD_OCR_ENABLED", False)
+    monkeypatch.setattr(ocr_batch, "OCR_PAGE_WORKERS", 2)
+    tool = OcrScannerTool()
+    tool.tesseract_path = None
+    events = []
+    tool.progress_callback = events.append
+    return tool, events
+
+
+def test_page_count_and_load(tmp_path):
+    pages = scan_pages(3)
+    pages[0].save(tmp_path / "scan.tif", save_all=True, append_images=pages[1:])
+    pages[0].save(tmp_path / "scan.pdf", save_all=True, append_images=pages[1:])
+
+    assert ocr_batch.page_count(str(tmp_path / "scan.tif"), "scan.tif") == 3
+    assert ocr_batch.page_count(str(tmp_path / "scan.pdf"), "scan.pdf") == 3
+
+    frame = ocr_batch.load_page(str(tmp_path / "scan.tif"), "scan.tif", 2, (1500, 1500))
+    assert frame.size == (600, 400)
+    assert frame.getpixel((100, 170)) == (0, 0, 0)
+
+    # PDF-Seiten werden direkt in der Größe gerastert, die die Erkennung nutzt
+    page = ocr_batch.load_page(str(tmp_path / "scan.pdf"), "scan.pdf", 0, (300, 300))
+    assert max(page.size) == 300
+
+
+def test_batch_reports_every_page(offline_tool, tmp_path):
+    tool, events = offline_tool
+    pages = scan_pages(3)
+    pages[0].save(tmp_path / "scan.tif", save_all=True, append_images=pages[1:])
+    pages[0].save(tmp_path / "photo.png")
+
+    assert tool.execute_tool({"image": [
+        {"file_path": str(tmp_path / "scan.tif"), "filename": "scan.tif"},
+        {"file_path": str(tmp_path / "photo.png"), "filename": "photo.png"},
+    ]})
+
+    assert sorted(event["page"] for event in events) == [1, 2, 3, 4]
+    assert {event["label"] for event in events} == {"scan.tif, Seite 1", "scan.tif, Seite 2",
+                                                    "scan.tif, Seite 3", "photo.png"}
+    # Die leere Seite wird übersprungen
+    assert [event["text"] for event in events if event["label"] == "scan.tif, Seite 2"] == [""]
+    assert "/artifact/" in str(tool.output)
+    assert "=== scan.tif, Seite 3 ===" in str(tool.output)
+
+
+def test_results_are_returned_in_page_order():
+    results = ocr_batch.recognize_pages(pow, [(2, 1), (2, 2), (2, 3)], workers=3)
+    assert results == [2, 4, 8]
+
+
+def test_pages_are_recognized_in_the_process_of_the_job():
+    import os
+    # Threads statt Prozesse, damit alle Seiten die Tesseract-Instanzen des Job-Workers nutzen
+    pids = ocr_batch.recognize_pages(lambda index: os.getpid(), [(1,), (2,)], workers=2)
+    assert pids == [os.getpid()] * 2
+
+
+def test_too_many_pages(offline_tool, tmp_path, monkeypatch):
+    tool, _events = offline_tool
+    monkeypatch.setattr(ocr_batch, "OCR_MAX_PAGES", 2)
+    pages = scan_pages(3)
+    pages[0].save(tmp_path / "scan.pdf", save_all=True, append_images=pages[1:])
+
+    assert not tool.execute_tool({"image": {"file_path": str(tmp_path / "scan.pdf"), "filename": "scan.pdf"}})
+
+
+def test_hocr_groups_words_into_lines():
+    result = {
+        "extracted_text": "Hallo Welt <3",
+        "image_width": 400,
+        "image_height": 200,
+        "text_regions": [
+            {"text": "Hallo", "x": 50, "y": 80, "width": 60, "height": 20, "line": 0, "conf": 96},
+            {"text": "Welt", "x": 120, "y": 82, "width": 70, "height": 20, "line": 0, "conf": 91},
+            {"text": "<3", "x": 50, "y": 120, "width": 20, "height": 20, "line": 1},
+        ],
+    }
+    empty = {"extracted_text": "", "image_width": 400, "image_height": 200, "text_regions": []}
+
+    document = ocr_batch.to_hocr(['scan "1".tif', "scan 2"], [result, empty])
+    root = ET.fromstring(document.encode("utf-8"))
+    ns = {"x": "http://www.w3.org/1999/xhtml"}
+
+    pages = root.findall(".//x:div[@class='ocr_page']", ns)
+    assert [page.get("title") for page in pages] == ['image "scan "1".tif"; bbox 0 0 400 200; ppageno 0',
+                                                     'image "scan 2"; bbox 0 0 400 200; ppageno 1']
+    lines = pages[0].findall("x:span[@class='ocr_line']", ns)
+    assert [line.get("title") for line in lines] == ["bbox 50 80 190 102", "bbox 50 120 70 140"]
+    assert [word.text for word in lines[0]] == ["Hallo", "Welt"]
+    assert lines[0][0].get("title") == "bbox 50 80 110 100; x_wconf 96"
+    assert lines[1][0].text == "<3"
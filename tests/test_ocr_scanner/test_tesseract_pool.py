@@ -0,0 +1,169 @@
+import sys
+import time
+import types
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw
+from tools.ocr_scanner.tesseract_pool import TesseractPool, parse_tsv
+from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool
+
+TSV = ("1\t1\t0\t0\t0\t0\t0\t0\t400\t200\t-1\t\n"
+       "5\t1\t1\t1\t1\t1\t50\t80\t60\t20\t96.5\tHallo\n"
+       "5\t1\t1\t1\t1\t2\t120\t80\t70\t20\t91\tWelt\n")
+
+
+class FakeApi:
+    """Stands in for tesserocr.PyTessBaseAPI and records what the pool does with it."""
+
+    created = []
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+    delay = 0
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.psm = 3
+        self.psm_used = []
+        FakeApi.created.append(self)
+
+    def GetPageSegMode(self):
+        return self.psm
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def SetImage(self, image):
+        self.image = image
+
+    def Recognize(self):
+        with FakeApi.lock:
+            FakeApi.active += 1
+            FakeApi.max_active = max(FakeApi.max_active, FakeApi.active)
+        time.sleep(FakeApi.delay)
+        self.psm_used.append(self.psm)
+        with FakeApi.lock:
+            FakeApi.active -= 1
+
+    def GetTSVText(self, page):
+        return TSV
+
+    def GetUTF8Text(self):
+        return "Hallo Welt\n"
+
+    def End(self):
+        pass
+
+
+@pytest.fixture
+def tesserocr(monkeypatch):
+    FakeApi.created = []
+    FakeApi.active = FakeApi.max_active = 0
+    FakeApi.delay = 0
+    module = types.ModuleType("tesserocr")
+    module.PyTessBaseAPI = FakeApi
+    module.get_languages = lambda: ("/usr/share/tessdata/", ["deu", "eng", "osd"])
+    monkeypatch.setitem(sys.modules, "tesserocr", module)
+    return module
+
+
+def test_parse_tsv():
+    data = parse_tsv("level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n" + TSV)
+    assert data["text"] == ["", "Hallo", "Welt"]
+    assert data["conf"] == [-1.0, 96.5, 91.0]
+    assert data["left"] == [0, 50, 120]
+
+
+def test_one_instance_per_language(tesserocr):
+    pool = TesseractPool(["deu", "eng", "fra"], size=4)
+    image = Image.new('L', (400, 200), color=255)
+
+    # Ohne Auswahl wird nur mit Englisch erkannt, wie zuvor mit pytesseract
+    assert pool.image_to_data(image)["text"][1:] == ["Hallo", "Welt"]
+    assert pool.image_to_string(image) == "Hallo Welt\n"
+    assert [api.lang for api in FakeApi.created] == ["eng"]
+
+    pool.image_to_string(image, language="deu")
+    # Nicht installierte Sprachen fallen auf Englisch zurück
+    pool.image_to_string(image, language="fra")
+    assert [api.lang for api in FakeApi.created] == ["eng", "deu"]
+    assert pool.stats() == {"size": 4, "instances": {"eng": 1, "deu": 1}}
+
+
+def test_preload_creates_every_installed_language(tesserocr):
+    pool = TesseractPool(["deu", "eng", "fra"], size=4)
+    pool.preload()
+    assert sorted(api.lang for api in FakeApi.created) == ["deu", "eng"]
+
+    pool.image_to_string(Image.new('L', (100, 100), color=255), language="deu")
+    assert len(FakeApi.created) == 2
+
+
+def test_concurrency_is_capped(tesserocr):
+    FakeApi.delay = 0.05
+    pool = TesseractPool(["deu"], size=2)
+    image = Image.new('L', (100, 100), color=255)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda i: pool.image_to_string(image), range(12)))
+
+    assert FakeApi.max_active == 2
+    assert len(FakeApi.created) == 2
+
+
+def test_cap_holds_across_pools(tesserocr):
+    # Zwei Pools stehen für zwei Prozesse, die sich dieselben Plätze teilen
+    FakeApi.delay = 0.05
+    pools = [TesseractPool(["deu"], size=2), TesseractPool(["deu"], size=2)]
+    image = Image.new('L', (100, 100), color=255)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda i: pools[i % 2].image_to_string(image), range(12)))
+
+    assert FakeApi.max_active == 2
+
+
+def test_page_segmentation_mode_is_restored(tesserocr):
+    pool = TesseractPool(["deu"], size=1)
+    image = Image.new('L', (100, 100), color=255)
+    pool.image_to_string(image, psm=6)
+    pool.image_to_string(image)
+
+    api = FakeApi.created[0]
+    assert api.psm_used == [6, 3]
+    assert api.psm == 3
+
+
+def test_pytesseract_fallback(monkeypatch):
+    calls = []
+    module = types.ModuleType("pytesseract")
+    module.pytesseract = types.SimpleNamespace(tesseract_cmd="tesseract")
+    module.Output = types.SimpleNamespace(DICT="dict")
+    module.get_languages = lambda: ["eng", "ita"]
+    module.image_to_string = lambda image, lang, config: calls.append((lang, config)) or "Ciao"
+    monkeypatch.setitem(sys.modules, "pytesseract", module)
+    monkeypatch.setitem(sys.modules, "tesserocr", None)
+
+    pool = TesseractPool(["deu", "eng", "ita"], size=1, tesseract_cmd="/usr/bin/tesseract")
+    assert not pool.has_tesserocr()
+    assert pool.image_to_string(Image.new('L', (10, 10)), psm=6) == "Ciao"
+    assert pool.image_to_string(Image.new('L', (10, 10)), language="ita") == "Ciao"
+    assert pool.image_to_string(Image.new('L', (10, 10)), language="deu") == "Ciao"
+    assert calls == [("eng", "--psm 6"), ("ita", ""), ("eng", "")]
+    assert module.pytesseract.tesseract_cmd == "/usr/bin/tesseract"
+
+
+def test_tool_recognizes_through_pool(tesserocr, monkeypatch, tmp_path):
+    monkeypatch.setattr("tools.ocr_scanner.ocr_scanner_tool.tesseract_pool", TesseractPool(["deu", "eng"], size=2))
+    image = Image.new('RGB', (400, 200), color='white')
+    ImageDraw.Draw(image).rectangle([(50, 80), (190, 100)], fill='black')
+    file_path = str(tmp_path / "scan.png")
+    image.save(file_path)
+
+    tool = OcrScannerTool()
+    tool.tesseract_path = None
+    assert tool.execute_tool({"image": {"file_path": file_path, "filename": "scan.png"}})
+
+    assert "Hallo Welt" in str(tool.output)
+    assert len(FakeApi.created) == 1
@@ -0,0 +1,28 @@
+import pytest
+from PIL import Image, ImageDraw
+from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool
+from tests.test_ocr_scanner.benchmark_text_blocks import detect_text_blocks_loops, synthetic_scan
+
+
+@pytest.mark.parametrize("size,seed", [((300, 200), 1), ((457, 333), 2), ((640, 480), 3)])
+def test_numpy_blocks_match_loop_implementation(size, seed):
+    tool = OcrScannerTool()
+    image = synthetic_scan(*size, seed=seed).convert('RGB')
+    assert tool.detect_text_blocks(image) == detect_text_blocks_loops(tool, image)
+
+
+def test_block_limit_matches_loop_implementation():
+    # Jede zweite Zelle schwarz: weit mehr als MAX_BLOCK_COUNT Blöcke pro Schwellwert
+    image = Image.new('L', (800, 400), color=255)
+    draw = ImageDraw.Draw(image)
+    for top in range(0, 400, 10):
+        for left in range(0, 800, 20):
+            draw.rectangle([(left, top), (left + 9, top + 9)], fill=0)
+
+    tool = OcrScannerTool()
+    assert tool.detect_text_blocks(image) == detect_text_blocks_loops(tool, image)
+
+
+def test_image_smaller_than_a_cell():
+    tool = OcrScannerTool()
+    assert tool.detect_text_blocks(Image.new('RGB', (8, 30), color='black')) == []
@@ -1,5 +1,3 @@
-import os
-import tempfile
 import pytest
 from unittest.mock import MagicMock, patch, mock_open
 from tools.pdf_merge.pdf_merge_tool import PdfMergeTool
@@ -58,12 +56,10 @@ def test_execute_invalid_order(pdf_merge_tool):
 
 
 @patch('tools.pdf_merge.pdf_merge_tool.PdfMerger')
-@patch('tools.pdf_merge.pdf_merge_tool.base64.b64encode')
 @patch('builtins.open', new_callable=mock_open)
-def test_execute_success(mock_open_file, mock_b64encode, mock_merger_class, pdf_merge_tool):
+def test_execute_success(mock_open_file, mock_merger_class, pdf_merge_tool):
     mock_merger = MagicMock()
     mock_merger_class.return_value = mock_merger
-    mock_b64encode.return_value = b"base64dummy"
 
     input_files = [
         {"file_path": "fileA.pdf", "filename": "fileA.pdf"},
@@ -79,16 +75,5 @@ def test_execute_success(mock_open_file, mock_b64encode, mock_merger_class, pdf_
     assert mock_merger.append.call_count == 2
     assert mock_merger.write.call_count == 1
     assert "erfolgreich zusammengeführt" in pdf_merge_tool.output
+    assert "/artifact/" in pdf_merge_tool.output
 
-
-def test_get_file_base64(pdf_merge_tool):
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        tmp.write(b"Hello Test PDF")
-        tmp_path = tmp.name
-
-    try:
-        result = pdf_merge_tool._get_file_base64(tmp_path)
-        assert isinstance(result, str)
-        assert "SGVsbG8gVGVzdCBQREY=" in result  # base64 of "Hello Test PDF"
-    finally:
-        os.remove(tmp_path)
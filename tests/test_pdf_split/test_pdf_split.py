@@ -1,6 +1,4 @@
-import os
 import pytest
-import tempfile
 from unittest.mock import MagicMock, patch, mock_open
 from PyPDF2 import PdfWriter
 from tools.pdf_split.pdf_split_tool import PdfSplitTool
@@ -97,9 +95,8 @@ def test_execute_split_page_too_large(mock_open_file, mock_writer_class, mock_re
 
 @patch('tools.pdf_split.pdf_split_tool.PdfReader')
 @patch('tools.pdf_split.pdf_split_tool.PdfWriter')
-@patch('tools.pdf_split.pdf_split_tool.base64.b64encode')
 @patch('builtins.open', new_callable=mock_open)
-def test_execute_success(mock_open_file, mock_b64encode, mock_writer_class, mock_reader_class, pdf_split_tool):
+def test_execute_success(mock_open_file, mock_writer_class, mock_reader_class, pdf_split_tool):
     """Test successful PDF splitting"""
     # Setup mocks
     mock_reader = create_mock_pdf(10)  # Create a 10-page PDF
@@ -109,8 +106,6 @@ def test_execute_success(mock_open_file, mock_b64encode, mock_writer_class, mock
     mock_part2_writer = MagicMock()
     mock_writer_class.side_effect = [mock_part1_writer, mock_part2_writer]
     
-    mock_b64encode.return_value = b"dummy_base64"
-    
     # Execute
     result = pdf_split_tool.execute_tool({
         "pdf_file": {
@@ -127,20 +122,6 @@ def test_execute_success(mock_open_file, mock_b64encode, mock_writer_class, mock
     assert mock_part1_writer.write.call_count == 1
     assert mock_part2_writer.write.call_count == 1
     assert "erfolgreich geteilt" in pdf_split_tool.output
+    assert pdf_split_tool.output.count("/artifact/") == 2
+    assert "base64" not in pdf_split_tool.output
 
-
-def test_get_file_base64(pdf_split_tool):
-    """Test base64 conversion of a file"""
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(b"Test content")
-        temp_path = temp_file.name
-    
-    try:
-        # Test the function
-        base64_content = pdf_split_tool._get_file_base64(temp_path)
-        assert base64_content == "VGVzdCBjb250ZW50"  # Base64 for "Test content"
-    finally:
-        # Clean up
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
\ No newline at end of file
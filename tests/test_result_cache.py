@@ -0,0 +1,99 @@
+import os
+import time
+import shutil
+import pytest
+from result_cache import ResultCache, file_sha256
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(directory=str(tmp_path / "cache"), max_bytes=1024 * 1024, ttl=60)
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / "upload.bin"
+    path.write_bytes(b"gleicher Inhalt")
+    return str(path)
+
+
+def test_key_ignores_dict_order():
+    assert ResultCache.key("tool", {"a": 1, "b": 2}) == ResultCache.key("tool", {"b": 2, "a": 1})
+    assert ResultCache.key("tool", "a") != ResultCache.key("other", "a")
+
+
+def test_file_key_depends_on_content_not_path(cache, upload, tmp_path):
+    copy = tmp_path / "copy.bin"
+    copy.write_bytes(b"gleicher Inhalt")
+    assert cache.file_key("tool", upload, "x") == cache.file_key("tool", str(copy), "x")
+    assert cache.file_key("tool", upload, "x") != cache.file_key("tool", upload, "y")
+    assert file_sha256(upload) == file_sha256(str(copy))
+
+
+def test_unreadable_file_disables_caching(cache, tmp_path):
+    key = cache.file_key("tool", str(tmp_path / "missing.bin"))
+    assert key is None
+    cache.put(key, "wert")
+    assert cache.get(key) is None
+    assert cache.put_file(key, __file__) is None
+
+
+def test_put_and_get(cache):
+    key = cache.key("tool", "eingabe")
+    assert cache.get(key) is None
+    cache.put(key, {"text": "ergebnis"})
+    assert cache.get(key) == {"text": "ergebnis"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_put_and_get_file(cache, upload, tmp_path):
+    key = cache.key("tool", "datei")
+    assert cache.get_file(key, str(tmp_path / "fehlt.bin")) is None
+    cache.put_file(key, upload)
+
+    destination = str(tmp_path / "ausgabe.bin")
+    assert cache.get_file(key, destination) == destination
+    # Auch nach dem Entfernen des Eintrags (z. B. durch einen anderen Prozess) bleibt die Datei lesbar
+    shutil.rmtree(cache.directory)
+    with open(destination, "rb") as f:
+        assert f.read() == b"gleicher Inhalt"
+
+
+def test_expired_entries_are_misses(cache):
+    key = cache.key("tool", "alt")
+    cache.put(key, "wert")
+    path = cache._path(key, "pkl")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(directory=str(tmp_path / "cache"), max_bytes=2500, ttl=60)
+    first, second, third = (cache.key("tool", n) for n in range(3))
+    cache.put(first, b"1" * 1000)
+    cache.put(second, b"2" * 1000)
+    # Zugriff macht den ersten Eintrag wieder "frisch", der zweite ist danach am ältesten
+    os.utime(cache._path(second, "pkl"), (time.time() - 30, os.stat(cache._path(second, "pkl")).st_mtime))
+    assert cache.get(first) is not None
+    cache.put(third, b"3" * 1000)
+
+    assert cache.get(first) is not None
+    assert cache.get(second) is None
+    assert cache.get(third) is not None
+
+
+def test_directory_is_only_walked_when_needed(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=2500, ttl=60)
+    walks = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: walks.append(1) or evict())
+
+    cache.put(cache.key("tool", 1), b"x" * 1000)
+    cache.put(cache.key("tool", 2), b"x" * 1000)
+    assert len(walks) == 1
+    cache.put(cache.key("tool", 3), b"x" * 1000)
+    assert len(walks) == 2
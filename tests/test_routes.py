@@ -49,3 +49,36 @@ def test_ads_hidden_by_default(client):
     response = client.get('/')
     assert response.status_code == 200
     assert b'<img src="/static/img/Beige.png"' not in response.data
+
+
+def test_concurrent_requests_do_not_share_results():
+    """Gleichzeitige Anfragen dürfen sich die Ergebnisse nicht gegenseitig überschreiben."""
+    from concurrent.futures import ThreadPoolExecutor
+    import base64
+
+    app.config['TESTING'] = True
+
+    def encode(text):
+        with app.test_client() as client:
+            response = client.post('/handle_tool', data={
+                "tool_name": "Base64EncodeTool",
+                "Zu kodierender Text": text,
+                "Kodierung": "utf-8",
+            })
+            return text, response.data
+
+    texts = [f"Anfrage Nummer {i}" for i in range(20)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(encode, texts))
+
+    for text, data in results:
+        assert base64.b64encode(text.encode()).decode().encode() in data
+
+
+def test_create_tool_returns_fresh_instances():
+    from webapp import create_tool, tools
+    first = create_tool("Base64EncodeTool")
+    second = create_tool("Base64EncodeTool")
+    assert first is not second
+    assert first is not tools["Base64EncodeTool"]
+    assert create_tool("UnknownTool") is None
@@ -0,0 +1,143 @@
+import os
+import time
+from temp_janitor import TempJanitor
+from webapp import app
+
+
+def make_file(tmp_path, name, size=10):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_only_due_files_are_deleted(tmp_path):
+    janitor = TempJanitor(quota_bytes=1024)
+    old = make_file(tmp_path, "old.bin")
+    new = make_file(tmp_path, "new.bin")
+    janitor._ensure_thread = lambda: None  # Test steuert run_once selbst
+    janitor.track(old, ttl=10)
+    janitor.track(new, ttl=100)
+
+    next_due = janitor.run_once(now=time.time() + 20)
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+    assert 0 < next_due <= 100
+    assert janitor.stats()["deleted"] == 1
+    assert janitor.stats()["usage_bytes"] == 10
+
+
+def test_tracking_again_extends_expiry(tmp_path):
+    janitor = TempJanitor(quota_bytes=1024)
+    janitor._ensure_thread = lambda: None
+    path = make_file(tmp_path, "upload.bin")
+    janitor.track(path, ttl=10)
+    janitor.track(path, ttl=100)
+
+    janitor.run_once(now=time.time() + 20)
+    assert os.path.exists(path)
+    assert janitor.stats()["pending"] == 1
+
+
+def test_quota_removes_files_expiring_first(tmp_path):
+    janitor = TempJanitor(quota_bytes=25)
+    janitor._ensure_thread = lambda: None
+    first = make_file(tmp_path, "first.bin")
+    second = make_file(tmp_path, "second.bin")
+    third = make_file(tmp_path, "third.bin")
+    janitor.track(first, ttl=10)
+    janitor.track(second, ttl=20)
+    janitor.track(third, ttl=30)
+
+    assert not os.path.exists(first)
+    assert os.path.exists(second) and os.path.exists(third)
+    assert janitor.stats()["quota_evictions"] == 1
+    assert janitor.stats()["usage_bytes"] == 20
+
+
+def test_directories_and_expire(tmp_path):
+    janitor = TempJanitor(quota_bytes=1024)
+    janitor._ensure_thread = lambda: None
+    directory = tmp_path / "whisper_token"
+    directory.mkdir()
+    make_file(directory, "a.srt")
+    janitor.track(str(directory))
+    assert janitor.stats()["usage_bytes"] == 10
+
+    janitor.expire(str(directory))
+    assert not directory.exists()
+    assert janitor.stats()["pending"] == 0
+    # Unbekannte Pfade sind kein Fehler
+    janitor.expire(str(tmp_path / "missing"))
+    assert janitor.stats()["errors"] == 0
+
+
+def test_paths_of_running_jobs_are_kept(tmp_path):
+    janitor = TempJanitor(quota_bytes=25)
+    janitor._ensure_thread = lambda: None
+    upload_dir = tmp_path / "upload_abc"
+    upload_dir.mkdir()
+    upload = make_file(upload_dir, "audio.mp3")
+    other = make_file(tmp_path, "other.bin")
+    janitor.paths_in_use = lambda: {upload}
+    janitor.track(str(upload_dir), ttl=10)
+    janitor.track(other, ttl=20)
+
+    janitor.run_once(now=time.time() + 30)
+    assert os.path.exists(upload)
+    assert not os.path.exists(other)
+
+    # Das Kontingent verdrängt den belegten Upload nicht, sondern die nächste Datei
+    later = make_file(tmp_path, "later.bin", size=20)
+    janitor.track(later, ttl=600)
+    assert os.path.exists(upload)
+    assert not os.path.exists(later)
+
+    # Nach dem Job wird der Upload beim nächsten Durchlauf gelöscht
+    janitor.paths_in_use = lambda: set()
+    janitor.run_once(now=time.time() + 1000)
+    assert not upload_dir.exists()
+
+
+def test_sweep_removes_old_leftovers(tmp_path):
+    janitor = TempJanitor(quota_bytes=1024)
+    janitor._ensure_thread = lambda: None
+    old_upload = tmp_path / "upload_old"
+    old_upload.mkdir()
+    make_file(old_upload, "scan.pdf")
+    running = tmp_path / "upload_running"
+    running.mkdir()
+    input_path = make_file(running, "audio.mp3")
+    old_result = make_file(tmp_path, "converted_token.mp3")
+    new_result = make_file(tmp_path, "merged_new.pdf")
+    foreign = make_file(tmp_path, "someone_else.db")
+    two_hours_ago = time.time() - 7200
+    for path in (old_upload, running, old_result, foreign):
+        os.utime(path, (two_hours_ago, two_hours_ago))
+    janitor.paths_in_use = lambda: {input_path}
+
+    assert janitor.sweep([str(tmp_path)]) == 2
+    assert not old_upload.exists() and not os.path.exists(old_result)
+    assert running.exists() and os.path.exists(new_result)
+    # Fremde Dateien im Temp-Verzeichnis bleiben unangetastet
+    assert os.path.exists(foreign)
+
+
+def test_background_thread_deletes_files(tmp_path):
+    janitor = TempJanitor(quota_bytes=1024)
+    path = make_file(tmp_path, "short.bin")
+    janitor.track(path, ttl=0.1)
+
+    deadline = time.time() + 5
+    while os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.02)
+    assert not os.path.exists(path)
+
+
+def test_metrics_route():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        data = client.get('/metrics').get_json()
+    assert "deleted" in data["temp_janitor"]
+    assert "hits" in data["result_cache"]
+    assert isinstance(data["whisper_model_cache"], dict)
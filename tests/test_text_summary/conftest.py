@@ -0,0 +1,115 @@
+import json
+import time
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from tools.text_summary.ollama_client import OllamaClient
+
+
+class OllamaStub(ThreadingHTTPServer):
+    """
+    Minimal stand-in for the Ollama HTTP API (/api/chat, /api/generate).
+    reply is a string or a function of the prompt; streamed answers are sent
+    word by word. Records requests, connections and the highest number of
+    requests that were processed at the same time.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.reply = "Short summary."
+        self.error = None
+        self.delay = 0
+        self.requests = []
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def chat_requests(self):
+        return [body for path, body in self.requests if path == "/api/chat"]
+
+    def answer(self, prompt):
+        return self.reply(prompt) if callable(self.reply) else self.reply
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        stub = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with stub.lock:
+            stub.requests.append((self.path, body))
+            stub.connections.add(self.client_address)
+
+        if self.path == "/api/generate":
+            self._send_json(200, {"model": body["model"], "response": "", "done": True})
+            return
+        if stub.error:
+            self._send_json(500, {"error": stub.error})
+            return
+
+        with stub.lock:
+            stub.active += 1
+            stub.max_active = max(stub.max_active, stub.active)
+        try:
+            time.sleep(stub.delay)
+            answer = stub.answer(body["messages"][0]["content"])
+        finally:
+            with stub.lock:
+                stub.active -= 1
+
+        if not body.get("stream", True):
+            self._send_json(200, {"model": body["model"], "message": {"role": "assistant", "content": answer},
+                                  "done": True})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == 0 else " " + word
+            self._send_chunk(json.dumps({"message": {"role": "assistant", "content": piece},
+                                         "done": False}).encode("utf-8") + b"\n")
+        self._send_chunk(json.dumps({"message": {"role": "assistant", "content": ""}, "done": True,
+                                     "eval_count": len(words), "eval_duration": 500_000_000}).encode("utf-8") + b"\n")
+        self._send_chunk(b"")
+
+
+@pytest.fixture
+def ollama_stub():
+    stub = OllamaStub()
+    thread = threading.Thread(target=stub.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture(autouse=True)
+def ollama(ollama_stub, monkeypatch):
+    """Points the summary tool to the stub server instead of a real Ollama."""
+    client = OllamaClient(base_url=ollama_stub.url, max_parallel=4, max_queue=32, queue_timeout=5)
+    monkeypatch.setattr("tools.text_summary.text_summary_tool.ollama_client", client)
+    yield client
+    client.close()
@@ -0,0 +1,125 @@
+import time
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from tools.text_summary.ollama_client import OllamaClient, OllamaError, OllamaBusy
+from tools.text_summary.text_summary_tool import TextSummaryTool
+
+
+@pytest.fixture
+def client(ollama_stub):
+    client = OllamaClient(base_url=ollama_stub.url, max_parallel=2, max_queue=8, queue_timeout=5, keep_alive="30m")
+    yield client
+    client.close()
+
+
+def test_chat_sends_keep_alive_and_temperature(client, ollama_stub):
+    assert client.chat("gemma3:1b", "Hallo", temperature=0) == "Short summary."
+    request = ollama_stub.chat_requests()[0]
+    assert request["stream"] is False
+    assert request["keep_alive"] == "30m"
+    assert request["options"] == {"temperature": 0}
+
+
+def test_connections_are_reused(client, ollama_stub):
+    for i in range(5):
+        client.chat("gemma3:1b", f"Text {i}")
+    for message in client.stream_chat("gemma3:1b", "Gestreamt"):
+        pass
+    assert len(ollama_stub.connections) == 1
+
+
+def test_concurrency_is_limited(client, ollama_stub):
+    ollama_stub.delay = 0.2
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        answers = list(pool.map(lambda i: client.chat("gemma3:1b", f"Text {i}"), range(6)))
+
+    assert len(answers) == 6
+    assert ollama_stub.max_active == 2
+
+
+def test_limit_is_shared_between_clients(ollama_stub):
+    # Jeder Webprozess hat seinen eigenen Client, die Grenze gilt trotzdem für alle zusammen
+    clients = [OllamaClient(base_url=ollama_stub.url, max_parallel=2, max_queue=8, queue_timeout=5)
+               for _ in range(2)]
+    ollama_stub.delay = 0.2
+    try:
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            list(pool.map(lambda i: clients[i % 2].chat("gemma3:1b", f"Text {i}"), range(6)))
+        assert ollama_stub.max_active == 2
+    finally:
+        for client in clients:
+            client.close()
+
+
+def test_full_queue_rejects_requests(ollama_stub):
+    client = OllamaClient(base_url=ollama_stub.url, max_parallel=1, max_queue=1, queue_timeout=5)
+    ollama_stub.delay = 0.5
+    try:
+        running = threading.Thread(target=client.chat, args=("gemma3:1b", "läuft"))
+        waiting = threading.Thread(target=client.chat, args=("gemma3:1b", "wartet"))
+        running.start()
+        time.sleep(0.1)
+        waiting.start()
+        deadline = time.time() + 2
+        while client.waiting() < 1 and time.time() < deadline:
+            time.sleep(0.01)
+
+        with pytest.raises(OllamaBusy):
+            client.chat("gemma3:1b", "abgewiesen")
+
+        running.join()
+        waiting.join()
+        assert client.waiting() == 0
+        assert len(ollama_stub.chat_requests()) == 2
+    finally:
+        client.close()
+
+
+def test_queue_timeout(ollama_stub):
+    client = OllamaClient(base_url=ollama_stub.url, max_parallel=1, max_queue=4, queue_timeout=0.1)
+    ollama_stub.delay = 0.5
+    try:
+        running = threading.Thread(target=client.chat, args=("gemma3:1b", "läuft"))
+        running.start()
+        time.sleep(0.1)
+        with pytest.raises(OllamaBusy, match="within"):
+            client.chat("gemma3:1b", "zu spät")
+        running.join()
+    finally:
+        client.close()
+
+
+def test_ping_keeps_model_loaded(client, ollama_stub):
+    client.ping("gemma3:4b-it-qat")
+    assert ollama_stub.requests == [("/api/generate", {"model": "gemma3:4b-it-qat", "keep_alive": "30m"})]
+
+
+def test_keep_alive_thread_pings_models(client, ollama_stub):
+    client.start_keep_alive(["gemma3:1b", "gemma3:4b-it-qat"], interval=0.05)
+    deadline = time.time() + 2
+    while len(ollama_stub.requests) < 4 and time.time() < deadline:
+        time.sleep(0.02)
+
+    pinged = [body["model"] for path, body in ollama_stub.requests if path == "/api/generate"]
+    assert pinged[:4] == ["gemma3:1b", "gemma3:4b-it-qat"] * 2
+
+
+def test_unreachable_server():
+    client = OllamaClient(base_url="http://127.0.0.1:9", max_parallel=1)
+    with pytest.raises(OllamaError, match="not reachable"):
+        client.chat("gemma3:1b", "Hallo")
+    # Der Platz wird auch nach einem Fehler wieder frei
+    with pytest.raises(OllamaError, match="not reachable"):
+        client.chat("gemma3:1b", "Hallo")
+
+
+def test_tool_reports_busy_model(ollama, monkeypatch):
+    def busy(*args, **kwargs):
+        raise OllamaBusy("32 requests are already waiting for Ollama")
+
+    monkeypatch.setattr(ollama, "chat", busy)
+    tool = TextSummaryTool()
+
+    assert not tool.execute_tool({"Text": "Ein Text."})
+    assert tool.error_message == "Das Sprachmodell ist gerade ausgelastet. Bitte versuche es später erneut."
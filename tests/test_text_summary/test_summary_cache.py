@@ -0,0 +1,69 @@
+import pytest
+from tools.text_summary.summary_cache import SummaryCache, normalize_text, simhash, hamming_distance
+from tools.text_summary.text_summary_tool import TextSummaryTool
+
+ARTICLE = " ".join(
+    f"Im Jahr {1900 + i} wurde in der Stadt ein neues Gebäude für die Bibliothek und das Archiv errichtet."
+    for i in range(15)
+)
+
+
+def test_normalize_text():
+    assert normalize_text("  Hallo\n\nWELT  ﬁx ") == "hallo welt fix"
+
+
+def test_simhash_of_small_edit_is_close():
+    edited = ARTICLE.replace("Bibliothek", "Bibliotek", 1)
+    other = " ".join(f"Der Fluss {i} fließt langsam durch das breite Tal bis hinunter zum Meer." for i in range(15))
+
+    assert hamming_distance(simhash(normalize_text(ARTICLE)), simhash(normalize_text(edited))) <= 3
+    assert hamming_distance(simhash(normalize_text(ARTICLE)), simhash(normalize_text(other))) > 3
+
+
+def test_normalized_text_hits_cache():
+    cache = SummaryCache(max_distance=0)
+    cache.put("Ein kurzer Text.", "de", "gemma3:1b", "Kurz.")
+
+    assert cache.get("  ein   KURZER\nText. ", "de", "gemma3:1b") == "Kurz."
+    assert cache.get("Ein kurzer Text.", "en", "gemma3:1b") is None
+    assert cache.get("Ein kurzer Text.", "de", "gemma3:4b-it-qat") is None
+    assert cache.get("Ein anderer Text.", "de", "gemma3:1b") is None
+
+
+def test_near_duplicate_hits_cache():
+    cache = SummaryCache(max_distance=3)
+    cache.put(ARTICLE, "de", "gemma3:1b", "Bauten 1900 bis 1914.")
+
+    assert cache.get(ARTICLE.replace("Bibliothek", "Bibliotek", 1), "de", "gemma3:1b") == "Bauten 1900 bis 1914."
+    # Ähnliche Texte nur für dieselbe Sprache und dasselbe Modell
+    assert cache.get(ARTICLE.replace("Bibliothek", "Bibliotek", 1), "en", "gemma3:1b") is None
+    # Deutlich gekürzt ist kein Duplikat mehr
+    assert cache.get(ARTICLE[:len(ARTICLE) // 2], "de", "gemma3:1b") is None
+
+
+def test_short_texts_are_only_matched_exactly():
+    cache = SummaryCache(max_distance=3)
+    cache.put("Das Wetter ist heute schön.", "de", "gemma3:1b", "Schönes Wetter.")
+    assert cache.get("Das Wetter ist heute schlecht.", "de", "gemma3:1b") is None
+
+
+def test_near_duplicate_detection_can_be_disabled():
+    cache = SummaryCache(max_distance=0)
+    cache.put(ARTICLE, "de", "gemma3:1b", "Bauten.")
+    assert cache.get(ARTICLE.replace("Bibliothek", "Bibliotek", 1), "de", "gemma3:1b") is None
+
+
+def test_distance_is_limited_by_bands():
+    with pytest.raises(ValueError):
+        SummaryCache(max_distance=4)
+
+
+def test_tool_reuses_summary_of_edited_text(ollama_stub):
+    ollama_stub.reply = "Bauten."
+
+    assert TextSummaryTool().execute_tool({"Text": ARTICLE})
+    tool = TextSummaryTool()
+    assert tool.execute_tool({"Text": "  " + ARTICLE.replace("Bibliothek", "bibliotek", 2) + "\n"})
+
+    assert tool.output == "Bauten."
+    assert len(ollama_stub.chat_requests()) == 1
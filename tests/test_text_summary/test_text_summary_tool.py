@@ -1,32 +1,23 @@
+import time
+import threading
 import pytest
-import random
-import string
-from unittest.mock import patch, MagicMock
+import itertools
+from unittest.mock import patch
 from tools.text_summary.text_summary_tool import TextSummaryTool
 from pydantic import ConfigDict
-# No need to import litellm.completion here anymore for mocking purposes
+# Die Anfragen gehen an den Ollama-Stub aus conftest.py
 
 class TestTextSummaryTool:
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
-    # Patch 'completion' in the 'litellm' module where it's actually imported from
-    @patch('litellm.completion')
-    def test_basic_summary(self, mock_completion_func):
-        """Test basic text summarization with mocked LLM response"""
+    def test_basic_summary(self, ollama_stub):
+        """Test basic text summarization with a stubbed Ollama response"""
         tool = TextSummaryTool()
         input_text = "This is a long text that needs to be summarized."
         expected_summary = "Short summary."
         input_params = {"Text": input_text}
 
-        # Configure the mock object passed by @patch
-        # Create a mock response structure that mimics litellm's response
-        mock_message = MagicMock()
-        mock_message.content = expected_summary
-        mock_choice = MagicMock()
-        mock_choice.message = mock_message
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choice]
-        mock_completion_func.return_value = mock_response # Set the return value of the mocked function
+        ollama_stub.reply = expected_summary
 
         result = tool.execute_tool(input_params)
 
@@ -34,13 +25,13 @@ class TestTextSummaryTool:
         assert result is True
         assert tool.output == expected_summary
         assert tool.error_message == ""
-        # Check if the mock was called correctly
-        mock_completion_func.assert_called_once()
-        call_args, call_kwargs = mock_completion_func.call_args
-        assert call_kwargs.get("model") == "ollama/gemma3:4b-it-qat"
-        assert "messages" in call_kwargs
-        assert len(call_kwargs["messages"]) == 1
-        assert input_text in call_kwargs["messages"][0]["content"]
+        # Check if Ollama was called correctly
+        requests = ollama_stub.chat_requests()
+        assert len(requests) == 1
+        assert requests[0]["model"] == "gemma3:4b-it-qat"
+        assert "messages" in requests[0]
+        assert len(requests[0]["messages"]) == 1
+        assert input_text in requests[0]["messages"][0]["content"]
 
 
     def test_empty_input(self):
@@ -65,33 +56,194 @@ class TestTextSummaryTool:
         assert tool.error_message == "Der Eingabetext ist leer oder ungültig."
         assert tool.output == ""
 
-    def text_too_long_input(self):
-        """Test the case where the tool should throw an error, when the text is too long."""
-        tool = TextSummaryTool()
-        allowed_chars = string.ascii_letters + string.digits
-        long_text = ''.join(random.choices(allowed_chars, k=10000))
-        input_params = {"Text": long_text}
-        
-        result = tool.execute_tool(input_params)
-        
-        assert result is False
-        assert tool.error_message == "Der Eingabetext is zu lang."
-        assert tool.output == ""
-        
-    # Patch 'completion' in the 'litellm' module where it's actually imported from
-    @patch('litellm.completion')
-    def test_llm_error(self, mock_completion_func):
-        """Test handling when litellm completion raises an exception"""
+    def test_llm_error(self, ollama_stub):
+        """Test handling when Ollama answers with an error"""
         tool = TextSummaryTool()
         input_params = {"Text": "Some text"}
         error_message = "LLM API error"
 
-        # Configure the mock to raise an exception when called
-        mock_completion_func.side_effect = Exception(error_message)
+        ollama_stub.error = error_message
 
         result = tool.execute_tool(input_params)
 
         assert result is False
         assert tool.error_message == error_message
         assert tool.output == ""
-        mock_completion_func.assert_called_once() # Ensure it was still called
+        assert len(ollama_stub.chat_requests()) == 1 # Ensure it was still called
+
+    def test_repeated_summary_is_cached(self, ollama_stub):
+        """The same text with the same model is only sent to the LLM once"""
+        input_params = {"Text": "Some text that appears twice."}
+        assert TextSummaryTool().execute_tool(input_params) is True
+        tool = TextSummaryTool()
+        assert tool.execute_tool(input_params) is True
+
+        assert tool.output == "Short summary."
+        requests = ollama_stub.chat_requests()
+        assert len(requests) == 1
+        assert requests[0]["options"]["temperature"] == 0
+
+    def test_long_text_is_summarized_in_chunks(self, ollama_stub):
+        """Texts above MAX_CHARS are summarized per chunk, then the summaries are combined"""
+        ollama_stub.reply = lambda prompt: "Teil." if "Abschnitt" in prompt else "Gesamt."
+        paragraphs = [f"Abschnitt {i}. " + "Inhalt des Dokuments. " * 100 for i in range(8)]
+        tool = TextSummaryTool()
+
+        with patch('tools.text_summary.text_summary_tool.CHUNK_TOKENS', 1200):
+            assert tool.execute_tool({"Text": "\n\n".join(paragraphs)}), tool.error_message
+
+        assert tool.output == "Gesamt."
+        prompts = [request["messages"][0]["content"] for request in ollama_stub.chat_requests()]
+        chunk_prompts = [p for p in prompts if "Abschnitt" in p]
+        assert 1 < len(chunk_prompts) < len(paragraphs)
+        assert all(f"Abschnitt {i}." in "".join(chunk_prompts) for i in range(len(paragraphs)))
+        # Die Zusammenfassung der Zusammenfassungen kommt zuletzt
+        assert prompts[-1].count("Teil.") == len(chunk_prompts)
+
+    def test_summaries_are_reduced_hierarchically(self, ollama_stub):
+        """Summaries that are still too long are summarized again in chunks"""
+        from tools.text_summary.text_summary_tool import REDUCE_METAPROMPT_DE
+        counter = itertools.count(1)
+        ollama_stub.reply = lambda prompt: f"Zusammenfassung {next(counter)}. " + "z" * 300
+        text = " ".join(f"Satz {i} zum Zusammenfassen." for i in range(2000))
+
+        with patch('tools.text_summary.text_summary_tool.CHUNK_TOKENS', 200):
+            tool = TextSummaryTool()
+            assert tool.execute_tool({"Text": text}), tool.error_message
+
+        prompts = [request["messages"][0]["content"] for request in ollama_stub.chat_requests()]
+        reduce_prompts = [p for p in prompts if p.startswith(REDUCE_METAPROMPT_DE)]
+        # Mehr als ein Reduce-Aufruf: die Zusammenfassungen wurden selbst in Abschnitte geteilt
+        assert len(reduce_prompts) > 1
+        assert prompts[-1] in reduce_prompts
+        assert tool.output.startswith(f"Zusammenfassung {len(prompts)}.")
+
+    def test_reduce_levels_are_limited(self, ollama_stub):
+        """A model whose summaries don't get shorter ends after one shortened final call"""
+        from tools.text_summary.text_summary_tool import REDUCE_METAPROMPT_DE
+        ollama_stub.reply = "Zu lang. " * 150
+        text = " ".join(f"Satz {i} zum Zusammenfassen." for i in range(500))
+
+        with patch('tools.text_summary.text_summary_tool.CHUNK_TOKENS', 200):
+            tool = TextSummaryTool()
+            assert tool.execute_tool({"Text": text}), tool.error_message
+
+        prompts = [request["messages"][0]["content"] for request in ollama_stub.chat_requests()]
+        reduce_prompts = [p for p in prompts if p.startswith(REDUCE_METAPROMPT_DE)]
+        assert reduce_prompts == [prompts[-1]]
+        assert len(prompts[-1]) <= len(REDUCE_METAPROMPT_DE) + 3 + 200 * 4
+
+    def test_document_too_long(self):
+        """Texts above MAX_DOCUMENT_CHARS are still rejected"""
+        from tools.text_summary.text_summary_tool import MAX_DOCUMENT_CHARS
+        tool = TextSummaryTool()
+
+        assert tool.execute_tool({"Text": "a" * (MAX_DOCUMENT_CHARS + 1)}) is False
+        assert tool.error_message == "Der Eingabetext is zu lang."
+
+
+def test_shorten_evenly_keeps_every_summary():
+    from tools.text_summary.text_summary_tool import shorten_evenly
+    summaries = ["Anfang " * 20, "Mitte " * 60, "Ende " * 20]
+
+    combined = shorten_evenly(summaries, max_tokens=50)
+
+    assert len(combined) <= 50 * 4
+    parts = combined.split("\n\n")
+    assert [part.split()[0] for part in parts] == ["Anfang", "Mitte", "Ende"]
+    # Längere Zusammenfassungen behalten anteilig mehr Text
+    assert len(parts[1]) > 2 * len(parts[0])
+    assert shorten_evenly(["kurz", "knapp"], max_tokens=50) == "kurz\n\nknapp"
+
+
+def test_split_into_chunks_respects_token_budget():
+    from tools.text_summary.text_summary_tool import split_into_chunks, estimate_tokens
+    text = "\n\n".join(["Kurzer Absatz."] * 50 + ["Langer Satz ohne Ende " * 200])
+
+    chunks = split_into_chunks(text, max_tokens=100)
+
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    assert chunks[0].startswith("Kurzer Absatz.\n\nKurzer Absatz.")
+    assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+
+
+def test_summary_is_streamed_to_progress_callback(ollama_stub):
+    """As a background job, the tokens are reported while the model generates them"""
+    from tools.text_summary.llm_metrics import llm_metrics
+    llm_metrics.samples.clear()
+    ollama_stub.reply = "Kurze Zusammenfassung des Textes."
+    tool = TextSummaryTool()
+    events = []
+    tool.progress_callback = events.append
+
+    assert tool.execute_tool({"Text": "Ein Text zum Streamen.", "Model": "gemma3:1b"}), tool.error_message
+
+    assert ollama_stub.chat_requests()[0]["stream"] is True
+    assert [event["text"] for event in events] == ["Kurze", " Zusammenfassung", " des", " Textes."]
+    assert all(event["type"] == "token" for event in events)
+    assert tool.output == "Kurze Zusammenfassung des Textes."
+
+    # Tokenanzahl und Dauer meldet Ollama selbst: 4 Tokens in 0,5 Sekunden
+    stats = llm_metrics.stats()["gemma3:1b"]
+    assert stats["completions"] == 1
+    assert stats["ttft_seconds"] >= 0
+    assert stats["tokens_per_second"] == 8.0
+
+    # Aus dem Cache kommt die Zusammenfassung sofort und vollständig
+    tool = TextSummaryTool()
+    tool.progress_callback = events.append
+    assert tool.execute_tool({"Text": "Ein Text zum Streamen.", "Model": "gemma3:1b"})
+    assert tool.output == "Kurze Zusammenfassung des Textes."
+    assert len(ollama_stub.chat_requests()) == 1
+
+
+def test_queue_wait_is_recorded_apart_from_time_to_first_token(ollama_stub, monkeypatch):
+    from tools.text_summary.llm_metrics import llm_metrics
+    from tools.text_summary.ollama_client import OllamaClient
+    llm_metrics.samples.clear()
+    client = OllamaClient(base_url=ollama_stub.url, max_parallel=1, max_queue=4, queue_timeout=5)
+    monkeypatch.setattr("tools.text_summary.text_summary_tool.ollama_client", client)
+    tool = TextSummaryTool()
+    tool.progress_callback = lambda event: None
+
+    # Eine andere Anfrage belegt den einzigen Platz für 0,5 Sekunden
+    occupied = threading.Event()
+
+    def occupy():
+        with client._slots.slot():
+            occupied.set()
+            time.sleep(0.5)
+
+    thread = threading.Thread(target=occupy)
+    thread.start()
+    occupied.wait(5)
+    assert tool.execute_tool({"Text": "Ein Text, der warten muss.", "Model": "gemma3:1b"}), tool.error_message
+    thread.join()
+    client.close()
+
+    stats = llm_metrics.stats()["gemma3:1b"]
+    assert stats["queue_seconds"] >= 0.3
+    assert stats["ttft_seconds"] < 0.3
+
+
+def test_streamed_error_is_reported(ollama_stub):
+    ollama_stub.error = "model 'gemma3:1b' not found"
+    tool = TextSummaryTool()
+    tool.progress_callback = lambda event: None
+
+    assert not tool.execute_tool({"Text": "Ein Text.", "Model": "gemma3:1b"})
+    assert tool.error_message == "model 'gemma3:1b' not found"
+
+
+def test_llm_metrics_are_aggregated_per_model():
+    from tools.text_summary.llm_metrics import LLMMetrics
+    metrics = LLMMetrics()
+    metrics.samples.clear()
+    metrics.record("gemma3:4b-it-qat", 0.5, 100, 4.0, 2.0)
+    metrics.record("gemma3:4b-it-qat", 1.5, 100, 6.0)
+    metrics.record("gemma3:1b", 0.2, 90, 1.0)
+
+    assert metrics.stats() == {
+        "gemma3:4b-it-qat": {"completions": 2, "queue_seconds": 1.0, "ttft_seconds": 1.0, "tokens_per_second": 20.0},
+        "gemma3:1b": {"completions": 1, "queue_seconds": 0.0, "ttft_seconds": 0.2, "tokens_per_second": 90.0},
+    }
@@ -0,0 +1,117 @@
+import sys
+import types
+import wave
+import pytest
+from tools.text_to_speech.engines import PiperEngine, XttsEngine, SynthesisError, DEFAULT_SPEAKER
+from tools.text_to_speech.text_to_speech_tool import TextToSpeechTool
+from tools.text_to_speech import text_to_speech_tool
+
+# Ersetzt das Piper-Binary: liest JSON-Zeilen und schreibt für jede eine WAV-Datei
+FAKE_PIPER = f"""#!{sys.executable}
+import sys, json, wave
+for line in sys.stdin:
+    request = json.loads(line)
+    with wave.open(request["output_file"], "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(22050)
+        f.writeframes(b"\\x00\\x00" * len(request["text"]))
+    print(request["output_file"], flush=True)
+"""
+
+
+@pytest.fixture
+def piper(tmp_path):
+    binary = tmp_path / "piper"
+    binary.write_text(FAKE_PIPER)
+    binary.chmod(0o755)
+    (tmp_path / "de.onnx").write_bytes(b"")
+    engine = PiperEngine(binary=str(binary), voice_dir=str(tmp_path), voices={"de": "de.onnx"})
+    yield engine
+    engine.close()
+
+
+def test_piper_synthesizes_with_resident_process(piper, tmp_path):
+    assert piper.is_available("de")
+    piper.synthesize("Hallo", "de", str(tmp_path / "1.wav"))
+    process = piper._processes["de"]
+    piper.synthesize("Hallo Welt", "de", str(tmp_path / "2.wav"))
+
+    # Dasselbe Modell bleibt für alle Sätze geladen
+    assert piper._processes["de"] is process
+    with wave.open(str(tmp_path / "2.wav")) as f:
+        assert f.getnframes() == len("Hallo Welt")
+
+
+def test_piper_without_voice_or_binary(tmp_path):
+    engine = PiperEngine(binary=str(tmp_path / "missing"), voice_dir=str(tmp_path), voices={"de": "de.onnx"})
+    assert not engine.is_available("de")
+    assert not engine.is_available("en")
+    with pytest.raises(SynthesisError):
+        engine.synthesize("Hallo", "de", str(tmp_path / "1.wav"))
+    with pytest.raises(SynthesisError):
+        engine.synthesize("Hello", "en", str(tmp_path / "1.wav"))
+
+
+@pytest.fixture
+def engines(piper, monkeypatch):
+    monkeypatch.setattr(text_to_speech_tool, "piper_engine", piper)
+    busy = {"value": False}
+    monkeypatch.setattr(text_to_speech_tool.synthesis_client, "is_busy", lambda: busy["value"])
+    return busy
+
+
+def test_select_engine(engines, piper):
+    tool = TextToSpeechTool()
+    xtts = text_to_speech_tool.synthesis_client
+
+    assert tool.select_engine("Piper", "Hallo.", "de") is piper
+    assert tool.select_engine("XTTS", "Hallo.", "de") is xtts
+    assert tool.select_engine("Auto", "Hallo.", "de") is xtts
+
+    # Unter Last gehen kurze Texte an Piper, lange warten auf XTTS
+    engines["value"] = True
+    assert tool.select_engine("Auto", "Hallo.", "de") is piper
+    assert tool.select_engine(None, "Hallo.", "de") is piper
+    assert tool.select_engine("Auto", "x" * (text_to_speech_tool.AUTO_PIPER_MAX_CHARS + 1), "de") is xtts
+    # Ohne Piper-Stimme für die Sprache bleibt es bei XTTS
+    assert tool.select_engine("Auto", "Hello.", "en") is xtts
+    assert tool.select_engine("Piper", "Hello.", "en") is None
+
+
+def test_tool_uses_piper(engines):
+    tool = TextToSpeechTool()
+    assert tool.execute_tool({"Text": "Erster Satz. Zweiter Satz.", "Sprache": "de", "Sprachmodell": "Piper"}), \
+        tool.error_message
+    assert "Piper" in tool.output
+
+
+def test_tool_reports_missing_piper(engines):
+    tool = TextToSpeechTool()
+    assert not tool.execute_tool({"Text": "Hello.", "Sprache": "en", "Sprachmodell": "Piper"})
+    assert "Piper" in str(tool.error_message)
+
+
+def test_xtts_computes_speaker_latents_while_loading(monkeypatch):
+    computed = []
+
+    class FakeModel:
+        speaker_manager = types.SimpleNamespace(speakers={})
+
+        def get_conditioning_latents(self, audio_path):
+            computed.extend(audio_path)
+            return ("gpt", "embedding")
+
+    class FakeTTS:
+        def __init__(self, model_name, gpu=False):
+            self.synthesizer = types.SimpleNamespace(tts_model=FakeModel())
+
+    api = types.ModuleType("TTS.api")
+    api.TTS = FakeTTS
+    monkeypatch.setitem(sys.modules, "TTS", types.ModuleType("TTS"))
+    monkeypatch.setitem(sys.modules, "TTS.api", api)
+
+    engine = XttsEngine()
+    assert computed == [DEFAULT_SPEAKER]
+    assert engine.latents(DEFAULT_SPEAKER) == ("gpt", "embedding")
+    assert computed == [DEFAULT_SPEAKER]
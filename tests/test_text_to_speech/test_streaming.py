@@ -0,0 +1,128 @@
+import wave
+import shutil
+import struct
+import pytest
+from unittest.mock import patch, MagicMock
+from tools.text_to_speech.streaming import (split_sentences, ProgressiveWavWriter, StreamingEncoder,
+                                            open_audio_writer, MAX_SENTENCE_CHARS)
+
+
+def write_wav(path, frames, frame_rate=24000):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(frames)
+
+
+def test_split_sentences():
+    assert split_sentences("Hallo Welt. Wie geht es dir?  Gut!\nOhne Punkt") == [
+        "Hallo Welt.", "Wie geht es dir?", "Gut!", "Ohne Punkt"]
+
+
+def test_split_sentences_ignores_blank_text():
+    assert split_sentences("  \n\n ") == []
+
+
+def test_long_sentences_are_split_at_commas_and_words():
+    text = ", ".join(["ein langer Satzteil"] * 40) + "."
+    sentences = split_sentences(text)
+    assert len(sentences) > 1
+    assert all(len(sentence) <= MAX_SENTENCE_CHARS for sentence in sentences)
+    assert " ".join(sentences) == text
+
+    words = " ".join(["Wort"] * 200)
+    assert all(len(sentence) <= MAX_SENTENCE_CHARS for sentence in split_sentences(words))
+
+
+def test_progressive_wav_header(tmp_path):
+    first, second = str(tmp_path / "1.wav"), str(tmp_path / "2.wav")
+    write_wav(first, b"\x01\x00" * 100)
+    write_wav(second, b"\x02\x00" * 50)
+    output = str(tmp_path / "speech.wav")
+
+    writer = ProgressiveWavWriter(output)
+    writer.append(first)
+    # Während des Schreibens kündigt der Header die maximale Länge an
+    with open(output, "rb") as f:
+        header = f.read(44)
+    assert struct.unpack("<I", header[40:44])[0] > 10 ** 9
+
+    writer.append(second)
+    writer.close()
+    with wave.open(output) as f:
+        assert f.getframerate() == 24000
+        assert f.getnframes() == 150
+        assert f.readframes(150) == b"\x01\x00" * 100 + b"\x02\x00" * 50
+
+
+def test_progressive_wav_rejects_changed_format(tmp_path):
+    first, second = str(tmp_path / "1.wav"), str(tmp_path / "2.wav")
+    write_wav(first, b"\x00\x00" * 10)
+    write_wav(second, b"\x00\x00" * 10, frame_rate=16000)
+    writer = ProgressiveWavWriter(str(tmp_path / "speech.wav"))
+    writer.append(first)
+    with pytest.raises(ValueError):
+        writer.append(second)
+    writer.close()
+
+
+def ffmpeg_process(returncode=0, stderr=b""):
+    process = MagicMock()
+    process.wait.return_value = returncode
+    process.stderr.read.return_value = stderr
+    return process
+
+
+def test_open_audio_writer(tmp_path):
+    assert isinstance(open_audio_writer(str(tmp_path / "a.wav")), ProgressiveWavWriter)
+    assert isinstance(open_audio_writer(str(tmp_path / "a.ogg"), "opus"), StreamingEncoder)
+
+
+@patch("tools.text_to_speech.streaming.ffmpeg")
+def test_streaming_encoder_pipes_pcm_to_ffmpeg(mock_ffmpeg, tmp_path):
+    first, second = str(tmp_path / "1.wav"), str(tmp_path / "2.wav")
+    write_wav(first, b"\x01\x00" * 100)
+    write_wav(second, b"\x02\x00" * 50)
+    process = ffmpeg_process()
+    stream = mock_ffmpeg.input.return_value.output.return_value.global_args.return_value.overwrite_output.return_value
+    stream.run_async.return_value = process
+
+    encoder = StreamingEncoder(str(tmp_path / "speech.mp3"), "mp3")
+    encoder.append(first)
+    encoder.append(second)
+    encoder.close()
+
+    # ffmpeg wird nur einmal gestartet und bekommt die Rohdaten beider Dateien
+    mock_ffmpeg.input.assert_called_once_with("pipe:", format="s16le", ac=1, ar=24000)
+    output_kwargs = mock_ffmpeg.input.return_value.output.call_args.kwargs
+    assert output_kwargs["acodec"] == "libmp3lame"
+    assert output_kwargs["format"] == "mp3"
+    assert [c.args[0] for c in process.stdin.write.call_args_list] == [b"\x01\x00" * 100, b"\x02\x00" * 50]
+    process.stdin.close.assert_called_once()
+
+
+@patch("tools.text_to_speech.streaming.ffmpeg")
+def test_streaming_encoder_reports_ffmpeg_errors(mock_ffmpeg, tmp_path):
+    wav = str(tmp_path / "1.wav")
+    write_wav(wav, b"\x00\x00" * 10)
+    stream = mock_ffmpeg.input.return_value.output.return_value.global_args.return_value.overwrite_output.return_value
+    stream.run_async.return_value = ffmpeg_process(1, b"Unknown encoder 'libopus'")
+
+    encoder = StreamingEncoder(str(tmp_path / "speech.ogg"), "opus")
+    encoder.append(wav)
+    with pytest.raises(RuntimeError, match="libopus"):
+        encoder.close()
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_streaming_encoder_writes_opus(tmp_path):
+    wav = str(tmp_path / "1.wav")
+    write_wav(wav, b"\x00\x00" * 24000)
+    output = str(tmp_path / "speech.ogg")
+
+    encoder = StreamingEncoder(output, "opus")
+    encoder.append(wav)
+    encoder.close()
+    with open(output, "rb") as f:
+        assert f.read(4) == b"OggS"
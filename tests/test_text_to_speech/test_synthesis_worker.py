@@ -0,0 +1,228 @@
+import os
+import time
+import wave
+import pytest
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from tools.text_to_speech.synthesis_worker import SynthesisWorker, SynthesisClient, SynthesisError, synthesis_client, _authkey
+from tools.text_to_speech.text_to_speech_tool import TextToSpeechTool
+from artifact_store import artifact_store
+
+
+class FakeEngine:
+    """Writes one second of silence per request and records in which process it was loaded."""
+
+    loads_file = None
+
+    def __init__(self):
+        with open(self.loads_file, "a") as f:
+            f.write(f"{os.getpid()}\n")
+
+    def synthesize(self, text, language, path, speaker):
+        if text == "fail":
+            raise RuntimeError("synthesis failed")
+        if text == "slow":
+            time.sleep(1)
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(24000)
+            # Erstes Zeichen als Sample-Wert, damit die Reihenfolge der Sätze prüfbar ist
+            f.writeframes(bytes([ord(text[0]) % 256, 0]) * 24000)
+
+
+class BrokenEngine:
+    def __init__(self):
+        raise ImportError("No module named 'TTS'")
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "tts.sock")
+
+
+@pytest.fixture
+def worker(socket_path, tmp_path):
+    FakeEngine.loads_file = str(tmp_path / "loads.txt")
+    worker = SynthesisWorker(address=socket_path, replicas=2, loader=FakeEngine)
+    worker.start()
+    yield worker
+    worker.stop()
+
+
+def test_synthesize_writes_wav(worker, socket_path, tmp_path):
+    client = SynthesisClient(address=socket_path, autostart=False)
+    output = str(tmp_path / "speech.wav")
+    reply = client.synthesize("Hallo Welt", "de", output)
+
+    assert reply["replica"] in [process.pid for process in worker.processes]
+    with wave.open(output) as f:
+        assert f.getnframes() == 24000
+
+
+def test_model_is_loaded_once_per_replica(worker, socket_path, tmp_path):
+    client = SynthesisClient(address=socket_path, autostart=False)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        replies = list(pool.map(lambda i: client.synthesize(f"Satz {i}", "de", str(tmp_path / f"{i}.wav")),
+                                range(8)))
+
+    assert len(replies) == 8
+    with open(FakeEngine.loads_file) as f:
+        loads = f.read().split()
+    assert sorted(loads) == sorted(str(process.pid) for process in worker.processes)
+
+
+def test_synthesis_error_is_reported(worker, socket_path, tmp_path):
+    client = SynthesisClient(address=socket_path, autostart=False)
+    with pytest.raises(SynthesisError, match="synthesis failed"):
+        client.synthesize("fail", "de", str(tmp_path / "fail.wav"))
+    # Das Replikat bleibt nach einem Fehler weiter nutzbar
+    client.synthesize("ok", "de", str(tmp_path / "ok.wav"))
+
+
+def test_load_error_is_reported(socket_path, tmp_path):
+    worker = SynthesisWorker(address=socket_path, replicas=1, loader=BrokenEngine)
+    worker.start()
+    try:
+        client = SynthesisClient(address=socket_path, autostart=False)
+        with pytest.raises(SynthesisError, match="could not be loaded"):
+            client.synthesize("Hallo", "de", str(tmp_path / "speech.wav"))
+    finally:
+        worker.stop()
+
+
+def test_crashed_replica_is_replaced(worker, socket_path, tmp_path):
+    crashed = worker.processes[0]
+    crashed.kill()
+    crashed.join()
+    worker.supervise()
+
+    assert worker.processes[0].pid != crashed.pid
+    assert all(process.is_alive() for process in worker.processes)
+    client = SynthesisClient(address=socket_path, autostart=False)
+    client.synthesize("Hallo", "de", str(tmp_path / "speech.wav"))
+
+
+def test_no_worker_without_autostart(socket_path, tmp_path):
+    client = SynthesisClient(address=socket_path, autostart=False)
+    with pytest.raises(SynthesisError):
+        client.synthesize("Hallo", "de", str(tmp_path / "speech.wav"))
+
+
+def test_second_worker_on_same_socket_is_rejected(worker, socket_path):
+    with pytest.raises(SynthesisError, match="already listening"):
+        SynthesisWorker(address=socket_path, replicas=1, loader=FakeEngine).start()
+
+
+def test_status_reports_busy_replicas(worker, socket_path, tmp_path):
+    client = SynthesisClient(address=socket_path, autostart=False)
+    assert client.status() == {"replicas": 2, "busy": 0}
+    assert not client.is_busy()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(client.synthesize, "slow", "de", str(tmp_path / f"{i}.wav")) for i in range(2)]
+        deadline = time.time() + 5
+        while not client.is_busy() and time.time() < deadline:
+            time.sleep(0.05)
+        assert client.status()["busy"] == 2
+        for future in futures:
+            future.result()
+
+    assert client.status()["busy"] == 0
+
+
+def test_parallelism_comes_from_the_running_worker(worker, socket_path):
+    client = SynthesisClient(address=socket_path, autostart=False)
+    with patch("tools.text_to_speech.synthesis_worker.REPLICAS", 1):
+        assert client.parallelism == 2
+    worker.stop()
+    with patch("tools.text_to_speech.synthesis_worker.REPLICAS", 3):
+        assert client.parallelism == 3
+
+
+def test_no_worker_counts_as_busy(socket_path):
+    client = SynthesisClient(address=socket_path, autostart=False)
+    assert client.status() is None
+    assert client.is_busy()
+
+
+def test_stop_removes_socket(socket_path, tmp_path):
+    FakeEngine.loads_file = str(tmp_path / "loads.txt")
+    worker = SynthesisWorker(address=socket_path, replicas=1, loader=FakeEngine)
+    worker.start()
+    worker.stop()
+    assert not os.path.exists(socket_path)
+    assert not os.path.exists(socket_path + ".status")
+
+
+def test_tool_streams_sentences_in_order(worker, socket_path, monkeypatch):
+    monkeypatch.setattr(synthesis_client, "address", socket_path)
+    monkeypatch.setattr(synthesis_client, "autostart", False)
+    tool = TextToSpeechTool()
+    events = []
+    tool.progress_callback = events.append
+
+    assert tool.execute_tool({"Text": "Alpha eins. Beta zwei! Gamma drei?", "Sprache": "de"}), tool.error_message
+
+    # Der Player wird schon nach dem ersten Satz angeboten
+    assert len(events) == 1 and events[0]["type"] == "audio"
+    token = events[0]["url"].split("/artifact/")[1]
+    artifact = artifact_store.get(token)
+    assert artifact["complete"]
+    assert events[0]["url"] in tool.output
+
+    with wave.open(artifact["path"]) as f:
+        assert f.getnframes() == 3 * 24000
+        frames = f.readframes(f.getnframes())
+    assert [frames[i * 48000] for i in range(3)] == [ord("A"), ord("B"), ord("G")]
+
+
+def test_repeated_sentences_come_from_phrase_cache(monkeypatch):
+    synthesized = []
+
+    def synthesize(text, language, path, speaker=None):
+        synthesized.append(text)
+        FakeEngine.synthesize(None, text, language, path, speaker)
+
+    monkeypatch.setattr(synthesis_client, "synthesize", synthesize)
+    tool = TextToSpeechTool()
+
+    assert tool.execute_tool({"Text": "Guten Tag. Hier ist der Hinweis. Guten Tag.", "Sprache": "de", "Sprachmodell": "XTTS"})
+    assert sorted(synthesized) == ["Guten Tag.", "Hier ist der Hinweis."]
+
+    synthesized.clear()
+    assert tool.execute_tool({"Text": "Guten   Tag. Neuer Satz.", "Sprache": "de", "Sprachmodell": "XTTS"})
+    assert synthesized == ["Neuer Satz."]
+
+    # Andere Sprache, anderes Audio
+    assert tool.execute_tool({"Text": "Guten Tag.", "Sprache": "en", "Sprachmodell": "XTTS"})
+    assert synthesized == ["Neuer Satz.", "Guten Tag."]
+
+
+@patch("tools.text_to_speech.text_to_speech_tool.open_audio_writer")
+def test_tool_offers_selected_format(mock_open_writer, monkeypatch):
+    monkeypatch.setattr(synthesis_client, "synthesize",
+                        lambda text, language, path, speaker=None: FakeEngine.synthesize(None, text, language, path, speaker))
+    tool = TextToSpeechTool()
+
+    assert tool.execute_tool({"Text": "Kurzer Satz.", "Sprache": "de", "Format": "Opus", "Sprachmodell": "XTTS"}), tool.error_message
+    assert mock_open_writer.call_args.args[1] == "opus"
+    assert mock_open_writer.call_args.args[0].endswith(".ogg")
+    assert 'type="audio/ogg"' in tool.output
+    assert 'download="speech.ogg"' in tool.output
+
+
+def test_tool_rejects_unknown_format():
+    tool = TextToSpeechTool()
+    assert not tool.execute_tool({"Text": "Kurzer Satz.", "Sprache": "de", "Format": "FLAC"})
+    assert "FLAC" in str(tool.error_message)
+
+
+def test_authkey_is_never_seen_half_written(socket_path):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        keys = list(pool.map(lambda i: _authkey(socket_path), range(32)))
+
+    assert len(keys[0]) == 32
+    assert set(keys) == {keys[0]}
+    # Keine temporären Dateien bleiben liegen
+    assert sorted(os.listdir(os.path.dirname(socket_path))) == ["tts.sock.key"]
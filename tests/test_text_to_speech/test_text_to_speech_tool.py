@@ -1,9 +1,21 @@
 import pytest
 from tools.text_to_speech.text_to_speech_tool import TextToSpeechTool
+from tools.text_to_speech.synthesis_worker import SynthesisWorker, synthesis_client
 from unittest.mock import patch
 
+@pytest.fixture(scope="module")
+def synthesis_worker(tmp_path_factory):
+    # Eigener Worker mit dem echten Modell, statt einen dauerhaften Hintergrundprozess zu starten
+    address = str(tmp_path_factory.mktemp("tts") / "tts.sock")
+    worker = SynthesisWorker(address=address, replicas=1)
+    worker.start()
+    yield worker
+    worker.stop()
+
 @pytest.fixture
-def tool():
+def tool(synthesis_worker, monkeypatch):
+    monkeypatch.setattr(synthesis_client, "address", synthesis_worker.address)
+    monkeypatch.setattr(synthesis_client, "autostart", False)
     return TextToSpeechTool()
 
 def test_initialization():
@@ -26,8 +38,9 @@ def test_error_handling_missing_input(tool):
         assert result is False
         assert tool.error_message is not None
 
-def test_output_contains_base64_audio(tool):
+def test_output_links_streamed_audio(tool):
     with patch("builtins.input", return_value="y"):
         input_params = {"Text": "This is a test.", "Sprache": "de"}
         tool.execute_tool(input_params)
-        assert "base64," in tool.output
+        assert "/artifact/" in tool.output
+        assert "base64," not in tool.output
@@ -0,0 +1,106 @@
+import multiprocessing
+import pytest
+from datetime import timedelta
+from token_store import TokenStore, MemoryBackend, SQLiteBackend, create_backend, set_backend, get_backend
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    previous = get_backend()
+    if request.param == "sqlite":
+        set_backend(SQLiteBackend(str(tmp_path / "tokens.db")))
+    else:
+        set_backend(MemoryBackend())
+    yield TokenStore("test")
+    set_backend(previous)
+
+
+def test_dict_semantics(store):
+    store["a"] = {"filename": "bild.png", "downloaded": False}
+    assert "a" in store
+    assert store["a"]["filename"] == "bild.png"
+    assert list(store) == ["a"]
+    assert len(store) == 1
+    assert store.pop("a")["filename"] == "bild.png"
+    assert "a" not in store
+    assert store.pop("a", None) is None
+    with pytest.raises(KeyError):
+        store["a"]
+
+
+def test_namespaces_are_separate(store):
+    other = TokenStore("other")
+    store["a"] = {"x": 1}
+    assert "a" not in other
+    other.clear()
+    assert "a" in store
+
+
+def test_entries_are_read_only(store):
+    store["a"] = {"downloaded": False}
+    # Die Änderung ginge in einer Kopie verloren, daher schlägt sie laut fehl
+    with pytest.raises(TypeError):
+        store["a"]["downloaded"] = True
+    with pytest.raises(TypeError):
+        store.items()[0][1].update(downloaded=True)
+    assert store["a"]["downloaded"] is False
+    assert dict(store["a"], downloaded=True) == {"downloaded": True}
+
+    assert store.update_entry("a", downloaded=True) == {"downloaded": True}
+    assert store["a"]["downloaded"] is True
+    assert store.update_entry("missing", downloaded=True) is None
+
+
+def test_claim_is_granted_once(store):
+    store["a"] = {"filename": "x"}
+    assert store.claim("a") == {"filename": "x"}
+    assert store.claim("a") is None
+    store.release("a")
+    assert store.claim("a") == {"filename": "x"}
+    assert store.claim("missing") is None
+
+
+def test_expired_entries_disappear(store):
+    expiring = TokenStore("test", ttl=timedelta(seconds=-1))
+    expiring["a"] = {"x": 1}
+    assert "a" not in store
+    assert store.items() == []
+    assert store.claim("a") is None
+
+
+def _claim(path, token, results):
+    set_backend(SQLiteBackend(path))
+    results.put(TokenStore("test").claim(token) is not None)
+
+
+def test_claim_is_atomic_across_processes(tmp_path):
+    path = str(tmp_path / "tokens.db")
+    previous = get_backend()
+    set_backend(SQLiteBackend(path))
+    try:
+        TokenStore("test")["a"] = {"x": 1}
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [context.Process(target=_claim, args=(path, "a", results)) for _ in range(8)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert sorted(results.get() for _ in processes) == [False] * 7 + [True]
+    finally:
+        set_backend(previous)
+
+
+def test_create_backend_from_url(tmp_path):
+    assert isinstance(create_backend("memory://"), MemoryBackend)
+    backend = create_backend(f"sqlite:///{tmp_path}/tokens.db")
+    assert isinstance(backend, SQLiteBackend)
+    assert backend.path == f"{tmp_path}/tokens.db"
+    with pytest.raises(ValueError):
+        create_backend("ftp://example.org")
+
+
+def test_items_keep_insertion_order(store):
+    for token in ["c", "a", "b"]:
+        store[token] = {"x": token}
+    assert list(store) == ["c", "a", "b"]
@@ -0,0 +1,82 @@
+import io
+import os
+import hashlib
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+import upload_spool
+from upload_spool import SpoolingRequest, SpooledUpload, spooled_file_info
+from tools.image_converter.image_converter_tool import ImageConverterTool
+from webapp import app
+
+
+def upload(files):
+    builder = EnvironBuilder(method="POST", data=files)
+    return SpoolingRequest(builder.get_environ())
+
+
+def test_same_file_name_gets_separate_paths():
+    first = spooled_file_info(upload({"image": (io.BytesIO(b"eins"), "scan.png")}).files["image"])
+    second = spooled_file_info(upload({"image": (io.BytesIO(b"zwei"), "scan.png")}).files["image"])
+
+    assert first["file_path"] != second["file_path"]
+    assert first["filename"] == second["filename"] == "scan.png"
+    with open(first["file_path"], "rb") as f:
+        assert f.read() == b"eins"
+    assert first["sha256"] == hashlib.sha256(b"eins").hexdigest()
+
+
+def test_same_file_name_within_one_request():
+    request = upload({"pdf_files": [(io.BytesIO(b"a"), "teil.pdf"), (io.BytesIO(b"b"), "teil.pdf")]})
+    paths = [spooled_file_info(file)["file_path"] for file in request.files.getlist("pdf_files")]
+    assert len(set(paths)) == 2
+    assert os.path.dirname(paths[0]) == os.path.dirname(paths[1])
+
+
+def test_file_name_is_sanitized():
+    info = spooled_file_info(upload({"file": (io.BytesIO(b"x"), "../../etc/passwd")}).files["file"])
+    assert os.path.basename(info["file_path"]) == "passwd"
+    assert os.path.basename(os.path.dirname(info["file_path"])).startswith("upload_")
+
+
+def test_oversized_upload_is_rejected_while_streaming(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_spool, "MAX_UPLOAD_BYTES", 10)
+    path = str(tmp_path / "big.bin")
+    spooled = SpooledUpload(path)
+    spooled.write(b"x" * 10)
+    with pytest.raises(RequestEntityTooLarge):
+        spooled.write(b"x")
+    assert not os.path.exists(path)
+
+
+def test_handle_tool_passes_hash_to_tool():
+    app.config['TESTING'] = True
+    ImageConverterTool.pending_conversions.clear()
+    with app.test_client() as client:
+        response = client.post('/handle_tool', data={
+            "tool_name": "ImageConverterTool",
+            "target_format": "PNG",
+            "image": (io.BytesIO(b"kein echtes Bild"), "bild.png"),
+        })
+    assert response.status_code == 200
+
+    (conversion,) = [entry for _, entry in ImageConverterTool.pending_conversions.items()]
+    assert conversion["sha256"] == hashlib.sha256(b"kein echtes Bild").hexdigest()
+    assert os.path.basename(os.path.dirname(conversion["file_path"])).startswith("upload_")
+
+
+def test_handle_tool_passes_multiple_files_as_list(monkeypatch):
+    import webapp
+    submitted = []
+    monkeypatch.setattr(webapp.job_queue, "submit", lambda tool, params, locale: submitted.append(params) or "job")
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        response = client.post('/handle_tool', data={
+            "tool_name": "OcrScannerTool",
+            "image": [(io.BytesIO(b"eins"), "seite1.png"), (io.BytesIO(b"zwei"), "seite2.png")],
+        })
+    assert response.status_code == 200
+
+    (params,) = submitted
+    assert [info["filename"] for info in params["image"]] == ["seite1.png", "seite2.png"]
+    assert params["image"][1]["sha256"] == hashlib.sha256(b"zwei").hexdigest()
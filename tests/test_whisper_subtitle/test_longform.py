@@ -0,0 +1,150 @@
+import os
+import numpy as np
+import pytest
+from unittest.mock import patch
+from tools.whisper_subtitle import longform
+from tools.whisper_subtitle.longform import find_split_points, transcribe_long_form
+
+SAMPLE_RATE = 100  # Niedrige Abtastrate, damit die Testdaten klein bleiben
+
+
+def speech_with_pauses(seconds, pauses):
+    """Noise with silent gaps at the given (start, end) seconds."""
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, seconds * SAMPLE_RATE).astype(np.float32)
+    for start, end in pauses:
+        audio[start * SAMPLE_RATE:end * SAMPLE_RATE] = 0
+    return audio
+
+
+class FakeModel:
+    def transcribe(self, audio, **options):
+        duration = len(audio) / SAMPLE_RATE
+        return {
+            "text": f" {len(audio)}",
+            "language": "de",
+            "segments": [{"id": 0, "start": 0.0, "end": duration, "text": f" {len(audio)}",
+                          "words": [{"word": "x", "start": 0.5, "end": 1.0}]}],
+        }
+
+
+class FakeCache:
+    def get(self, model_size):
+        return FakeModel()
+
+
+def test_short_audio_is_not_split():
+    audio = speech_with_pauses(100, [])
+    assert find_split_points(audio, chunk_seconds=300, sample_rate=SAMPLE_RATE) == [(0, len(audio))]
+
+
+def test_split_points_fall_into_pauses():
+    audio = speech_with_pauses(1000, [(290, 293), (610, 612)])
+    ranges = find_split_points(audio, chunk_seconds=300, search_seconds=30, frame_seconds=1,
+                               sample_rate=SAMPLE_RATE)
+
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(audio)
+    # Abschnitte schließen lückenlos aneinander an
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+    assert 290 * SAMPLE_RATE <= ranges[0][1] < 293 * SAMPLE_RATE
+    assert 610 * SAMPLE_RATE <= ranges[1][1] < 612 * SAMPLE_RATE
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_timestamps_are_offset_per_chunk(workers):
+    import multiprocessing
+    audio = speech_with_pauses(1000, [(290, 293), (610, 612)])
+    with patch.object(longform, "model_cache", FakeCache()), \
+            patch.object(longform, "CHUNK_SECONDS", 300), \
+            patch.object(longform, "_pool_context", lambda: multiprocessing.get_context("fork")):
+        result = transcribe_long_form(audio, "tiny", workers=workers, sample_rate=SAMPLE_RATE)
+
+    segments = result["segments"]
+    assert len(segments) == 4
+    assert [segment["id"] for segment in segments] == [0, 1, 2, 3]
+    assert segments[0]["start"] == 0.0
+    for previous, current in zip(segments, segments[1:]):
+        assert current["start"] == pytest.approx(previous["end"])
+        assert current["words"][0]["start"] == pytest.approx(current["start"] + 0.5)
+    assert segments[-1]["end"] == pytest.approx(1000)
+    assert result["language"] == "de"
+
+
+class LoadingCache:
+    """Keeps the model once loaded and writes the id of every process that loads it to a file."""
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.model = None
+
+    def get(self, model_size):
+        if self.model is None:
+            with open(self.log_path, "a") as f:
+                f.write(f"{os.getpid()}\n")
+            self.model = FakeModel()
+        return self.model
+
+
+def test_each_worker_loads_the_model_once(tmp_path):
+    import multiprocessing
+    audio = speech_with_pauses(1000, [(290, 293), (610, 612)])
+    log_path = tmp_path / "loads.txt"
+    # Mit fork sehen die Worker den Test-Cache, der Ablauf ist sonst derselbe
+    with patch.object(longform, "model_cache", LoadingCache(str(log_path))), \
+            patch.object(longform, "CHUNK_SECONDS", 300), \
+            patch.object(longform, "_pool_context", lambda: multiprocessing.get_context("fork")):
+        transcribe_long_form(audio, "tiny", workers=2, sample_rate=SAMPLE_RATE)
+
+    loads = log_path.read_text().split()
+    assert len(loads) == len(set(loads)) <= 2
+    assert str(os.getpid()) not in loads
+
+
+def test_workers_are_not_forked_from_the_job_worker():
+    assert longform._pool_context().get_start_method() != "fork"
+
+
+def test_default_workers_stay_within_the_cpu_budget(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("HEAVY_TOOL_WORKERS", "2")
+    monkeypatch.setenv("WHISPER_LONGFORM_WORKERS", "16")
+    assert longform.cpu_budget() == 4
+    assert longform.default_workers() == 4
+    monkeypatch.delenv("WHISPER_LONGFORM_WORKERS")
+    assert longform.default_workers() == 2
+
+
+class WindowedModel:
+    """Returns two segments per window; the second one starts at 20 s and may be cut off."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((len(audio), options.get("language"), options.get("initial_prompt")))
+        index = len(self.calls)
+        return {
+            "text": f" a{index} b{index}",
+            "language": "de",
+            "segments": [{"id": 0, "start": 0.0, "end": 20.0, "text": f" a{index}"},
+                         {"id": 1, "start": 20.0, "end": len(audio) / 100, "text": f" b{index}"}],
+        }
+
+
+def test_segments_are_streamed_per_window():
+    reported = []
+    model = WindowedModel()
+    with patch.object(longform, "WINDOW_SAMPLES", 3000):
+        result = longform.transcribe_streaming(model, np.zeros(6000), reported.append,
+                                               sample_rate=100, verbose=True)
+
+    # Das zweite Segment eines Fensters wird im nächsten Fenster neu erkannt, außer am Ende
+    assert [[segment["text"] for segment in segments] for segments in reported] == [[" a1"], [" a2"], [" a3", " b3"]]
+    assert [segment["start"] for segment in result["segments"]] == [0.0, 20.0, 40.0, 60.0]
+    assert [segment["id"] for segment in result["segments"]] == [0, 1, 2, 3]
+    assert result["text"] == " a1 a2 a3 b3"
+    assert result["language"] == "de"
+    # Ab dem zweiten Fenster stehen die Sprache des ersten und der bisherige Text fest
+    assert model.calls == [(3000, None, None), (3000, "de", " a1"), (2000, "de", " a1 a2")]
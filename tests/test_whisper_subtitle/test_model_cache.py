@@ -0,0 +1,79 @@
+import torch
+import pytest
+from tools.whisper_subtitle.model_cache import WhisperModelCache
+
+# Ein Linear(256, 256)-Modell belegt (256*256 + 256) * 4 Bytes
+MODEL_BYTES = (256 * 256 + 256) * 4
+
+
+@pytest.fixture
+def loads():
+    return []
+
+
+@pytest.fixture
+def cache(loads):
+    def loader(model_size):
+        loads.append(model_size)
+        return torch.nn.Linear(256, 256)
+    return WhisperModelCache(budget_bytes=2 * MODEL_BYTES, loader=loader)
+
+
+def test_cache_hit_does_not_reload(cache, loads):
+    first = cache.get("tiny")
+    second = cache.get("tiny")
+    assert first is second
+    assert loads == ["tiny"]
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["resident_bytes"] == MODEL_BYTES
+
+
+def test_least_recently_used_model_is_evicted(cache, loads):
+    cache.get("tiny")
+    cache.get("base")
+    cache.get("tiny")  # tiny ist jetzt das zuletzt benutzte Modell
+    cache.get("small")
+
+    stats = cache.stats()
+    assert stats["resident_models"] == ["tiny", "small"]
+    assert stats["evictions"] == 1
+
+    cache.get("base")
+    assert loads == ["tiny", "base", "small", "base"]
+
+
+def test_model_larger_than_budget_is_kept(loads):
+    cache = WhisperModelCache(budget_bytes=1, loader=lambda size: torch.nn.Linear(256, 256))
+    cache.get("large")
+    assert cache.stats()["resident_models"] == ["large"]
+
+
+def test_preload_from_env(cache, loads, monkeypatch):
+    monkeypatch.setenv("WHISPER_PRELOAD_MODELS", "tiny, base")
+    cache.preload_from_env()
+    assert loads == ["tiny", "base"]
+    assert cache.stats()["misses"] == 2
+
+
+def test_events_are_recorded_in_the_shared_metrics(loads):
+    from tools.whisper_subtitle.cache_metrics import ModelCacheMetrics
+    metrics = ModelCacheMetrics()
+    metrics.samples.clear()
+    cache = WhisperModelCache(budget_bytes=MODEL_BYTES, loader=lambda size: torch.nn.Linear(256, 256),
+                              metrics=metrics)
+    cache.get("tiny")
+    cache.get("tiny")
+    cache.get("tiny")
+    cache.get("base")
+
+    # Ein anderer Prozess sieht dieselben Messwerte
+    stats = ModelCacheMetrics().stats()
+    assert stats["tiny"]["hits"] == 2
+    assert stats["tiny"]["misses"] == 1
+    assert stats["tiny"]["evictions"] == 1
+    assert stats["tiny"]["hit_rate"] == pytest.approx(0.667)
+    assert stats["base"] == {"hits": 0, "misses": 1, "evictions": 0, "hit_rate": 0.0,
+                             "load_seconds": stats["base"]["load_seconds"]}
+    assert stats["base"]["load_seconds"] >= 0
@@ -1,9 +1,13 @@
 import os
 import os
+import re
 import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
 # Removed tempfile import as it's not directly used in the test logic anymore
 
 from tools.whisper_subtitle.whisper_subtitle_tool import WhisperSubtitleTool
+from artifact_store import artifact_store
 from flask_babel import lazy_gettext as _
 
 class TestWhisperSubtitleTool(unittest.TestCase):
@@ -61,5 +65,80 @@ class TestWhisperSubtitleTool(unittest.TestCase):
 
     # Removed test_execute_tool_embed_subtitles as the feature is gone
 
+    @patch("tools.whisper_subtitle.whisper_subtitle_tool.model_cache")
+    @patch("tools.whisper_subtitle.whisper_subtitle_tool.whisper.load_audio")
+    def test_audio_is_decoded_once(self, mock_load_audio, mock_model_cache):
+        audio = np.zeros(16000, dtype=np.float32)
+        mock_load_audio.return_value = audio
+        model = MagicMock()
+        model.transcribe.return_value = {
+            "text": "Hallo",
+            "language": "en",
+            "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": "Hallo"}],
+        }
+        mock_model_cache.get.return_value = model
+
+        input_params = {
+            _("Eingabedatei"): self.test_audio_path,
+            _("Sprache"): "english",
+            _("Modellgröße"): "tiny",
+            _("Aufgabe"): "transcribe",
+        }
+        success = self.tool.execute_tool(input_params)
+
+        self.assertTrue(success, self.tool.error_message)
+        mock_load_audio.assert_called_once_with(self.test_audio_path)
+        self.assertIs(model.transcribe.call_args.args[0], audio)
+
+    @patch("tools.whisper_subtitle.whisper_subtitle_tool.model_cache")
+    @patch("tools.whisper_subtitle.whisper_subtitle_tool.whisper.load_audio")
+    def test_cues_are_streamed_and_all_formats_written(self, mock_load_audio, mock_model_cache):
+        mock_load_audio.return_value = np.zeros(16000 * 5, dtype=np.float32)
+        model = MagicMock()
+        model.transcribe.return_value = {
+            "text": " Hallo Welt",
+            "language": "de",
+            "segments": [{"id": 0, "start": 0.0, "end": 1.5, "text": " Hallo Welt"}],
+        }
+        mock_model_cache.get.return_value = model
+
+        events = []
+        self.tool.progress_callback = events.append
+        input_params = {
+            _("Eingabedatei"): {"file_path": self.test_audio_path, "filename": "meeting.wav"},
+            _("Sprache"): "german",
+            _("Modellgröße"): "tiny",
+            _("Aufgabe"): "transcribe",
+        }
+        success = self.tool.execute_tool(input_params)
+
+        self.assertTrue(success, self.tool.error_message)
+        self.assertEqual(events, [{"type": "cue", "start": 0.0, "end": 1.5, "text": "Hallo Welt"}])
+        self.assertNotIn("base64", self.tool.output)
+
+        tokens = re.findall(r'/artifact/([0-9a-f-]+)\?download=1', self.tool.output)
+        artifacts = [artifact_store.get(token) for token in tokens]
+        self.assertEqual({a["download_name"] for a in artifacts},
+                         {"meeting.srt", "meeting.vtt", "meeting.json", "meeting.tsv"})
+        srt = next(a for a in artifacts if a["download_name"] == "meeting.srt")
+        self.assertEqual(srt["mimetype"], "application/x-subrip")
+        with open(srt["path"], encoding="utf-8") as f:
+            self.assertIn("Hallo Welt", f.read())
+
+    @patch("tools.whisper_subtitle.whisper_subtitle_tool.model_cache")
+    @patch("tools.whisper_subtitle.whisper_subtitle_tool.whisper.load_audio")
+    def test_empty_audio_fails_before_model_load(self, mock_load_audio, mock_model_cache):
+        mock_load_audio.return_value = np.zeros(0, dtype=np.float32)
+        input_params = {
+            _("Eingabedatei"): self.test_audio_path,
+            _("Sprache"): "english",
+            _("Modellgröße"): "tiny",
+            _("Aufgabe"): "transcribe",
+        }
+        success = self.tool.execute_tool(input_params)
+
+        self.assertFalse(success)
+        mock_model_cache.get.assert_not_called()
+
 if __name__ == "__main__":
     unittest.main()
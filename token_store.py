@@ -0,0 +1,391 @@
+import os
+import time
+import json
+import sqlite3
+import tempfile
+import threading
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+# Einträge leben länger als das einstündige Aufräumfenster der Tools,
+# damit cleanup_old_files die zugehörigen Dateien noch findet
+DEFAULT_TTL = timedelta(hours=2)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    # z.B. Lazy-Strings von flask_babel
+    return str(value)
+
+
+def _decode(entry):
+    if "__datetime__" in entry and len(entry) == 1:
+        return datetime.fromisoformat(entry["__datetime__"])
+    return entry
+
+
+class ReadOnlyEntry(dict):
+    """
+    Entry as returned by TokenStore. Changing it would only change a copy,
+    so it raises instead of silently losing the change.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Token store entries are read-only, use store[token] = {...} or update_entry()")
+
+    __setitem__ = __delitem__ = _read_only
+    update = pop = popitem = clear = setdefault = _read_only
+    __ior__ = _read_only
+
+    def __reduce__(self):
+        # Beim Pickeln (z.B. an Worker-Prozesse) als gewöhnliches dict übergeben
+        return dict, (dict(self),)
+
+
+def _readonly(value):
+    return ReadOnlyEntry(value) if isinstance(value, dict) else value
+
+
+def _dumps(value):
+    # JSON statt pickle: Einträge aus einem geteilten Server dürfen keinen Code ausführen können
+    return json.dumps(value, default=_encode)
+
+
+def _loads(data):
+    return json.loads(data, object_hook=_decode)
+
+
+class MemoryBackend:
+    """Keeps the entries in the current process. Only suitable for a single worker and for tests."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _live(self, namespace, token):
+        entry = self._entries.get((namespace, token))
+        if entry is not None and entry["expires"] < time.time():
+            del self._entries[(namespace, token)]
+            return None
+        return entry
+
+    def get(self, namespace, token):
+        with self._lock:
+            entry = self._live(namespace, token)
+            return _loads(entry["value"]) if entry else None
+
+    def set(self, namespace, token, value, ttl):
+        with self._lock:
+            self._entries[(namespace, token)] = {
+                "value": _dumps(value), "expires": time.time() + ttl, "claimed": False
+            }
+
+    def update(self, namespace, token, fields):
+        with self._lock:
+            entry = self._live(namespace, token)
+            if entry is None:
+                return None
+            value = _loads(entry["value"])
+            value.update(fields)
+            entry["value"] = _dumps(value)
+            return value
+
+    def claim(self, namespace, token):
+        with self._lock:
+            entry = self._live(namespace, token)
+            if entry is None or entry["claimed"]:
+                return None
+            entry["claimed"] = True
+            return _loads(entry["value"])
+
+    def release(self, namespace, token):
+        with self._lock:
+            entry = self._live(namespace, token)
+            if entry is not None:
+                entry["claimed"] = False
+
+    def delete(self, namespace, token):
+        with self._lock:
+            return self._entries.pop((namespace, token), None) is not None
+
+    def items(self, namespace):
+        with self._lock:
+            return [(token, _loads(self._entries[(ns, token)]["value"]))
+                    for ns, token in list(self._entries)
+                    if ns == namespace and self._live(ns, token) is not None]
+
+    def clear(self, namespace):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+
+class SQLiteBackend:
+    """
+    Stores the entries in an SQLite database. All worker processes on the host
+    that use the same file see the same tokens. WAL mode lets readers and the
+    single writer work concurrently.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # Verbindungen dürfen weder zwischen Threads noch über fork hinweg geteilt werden
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                " namespace TEXT NOT NULL, token TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires REAL NOT NULL, claimed INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (namespace, token))"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, namespace, token):
+        row = self._connection().execute(
+            "SELECT value FROM tokens WHERE namespace = ? AND token = ? AND expires >= ?",
+            (namespace, token, time.time())).fetchone()
+        return _loads(row[0]) if row else None
+
+    def set(self, namespace, token, value, ttl):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO tokens (namespace, token, value, expires, claimed) VALUES (?, ?, ?, ?, 0)",
+            (namespace, token, _dumps(value), time.time() + ttl))
+
+    def update(self, namespace, token, fields):
+        connection = self._connection()
+        # IMMEDIATE sperrt für Schreiber sofort, damit kein anderes Update dazwischen kommt
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value FROM tokens WHERE namespace = ? AND token = ? AND expires >= ?",
+                (namespace, token, time.time())).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            value = _loads(row[0])
+            value.update(fields)
+            connection.execute("UPDATE tokens SET value = ? WHERE namespace = ? AND token = ?",
+                               (_dumps(value), namespace, token))
+            connection.execute("COMMIT")
+            return value
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def claim(self, namespace, token):
+        connection = self._connection()
+        # Nur der erste Aufrufer ändert die Zeile, alle weiteren sehen rowcount 0
+        cursor = connection.execute(
+            "UPDATE tokens SET claimed = 1 WHERE namespace = ? AND token = ? AND claimed = 0 AND expires >= ?",
+            (namespace, token, time.time()))
+        if cursor.rowcount == 0:
+            return None
+        return self.get(namespace, token)
+
+    def release(self, namespace, token):
+        self._connection().execute(
+            "UPDATE tokens SET claimed = 0 WHERE namespace = ? AND token = ?", (namespace, token))
+
+    def delete(self, namespace, token):
+        cursor = self._connection().execute(
+            "DELETE FROM tokens WHERE namespace = ? AND token = ?", (namespace, token))
+        return cursor.rowcount > 0
+
+    def items(self, namespace):
+        connection = self._connection()
+        now = time.time()
+        connection.execute("DELETE FROM tokens WHERE expires < ?", (now,))
+        rows = connection.execute(
+            "SELECT token, value FROM tokens WHERE namespace = ? ORDER BY rowid", (namespace,)).fetchall()
+        return [(token, _loads(value)) for token, value in rows]
+
+    def clear(self, namespace):
+        self._connection().execute("DELETE FROM tokens WHERE namespace = ?", (namespace,))
+
+
+class RedisBackend:
+    """
+    Stores the entries in Redis (or a compatible server such as Valkey or KeyDB),
+    so several hosts can share the tokens. Requires the redis package.
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("TOKEN_STORE_URL points to Redis, but the redis package is not installed.")
+        self._redis = redis
+        self.client = redis.Redis.from_url(url)
+
+    def _key(self, namespace, token):
+        return f"token:{namespace}:{token}"
+
+    def _claim_key(self, namespace, token):
+        return f"claim:{namespace}:{token}"
+
+    def get(self, namespace, token):
+        data = self.client.get(self._key(namespace, token))
+        return _loads(data) if data is not None else None
+
+    def set(self, namespace, token, value, ttl):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(namespace, token), _dumps(value), px=int(ttl * 1000))
+        pipe.delete(self._claim_key(namespace, token))
+        pipe.execute()
+
+    def update(self, namespace, token, fields):
+        key = self._key(namespace, token)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    # Optimistisch: schlägt fehl, wenn ein anderer Prozess den Eintrag inzwischen ändert
+                    pipe.watch(key)
+                    data = pipe.get(key)
+                    if data is None:
+                        pipe.unwatch()
+                        return None
+                    value = _loads(data)
+                    value.update(fields)
+                    pipe.multi()
+                    pipe.set(key, _dumps(value), keepttl=True)
+                    pipe.execute()
+                    return value
+                except self._redis.WatchError:
+                    continue
+
+    def claim(self, namespace, token):
+        ttl = self.client.pttl(self._key(namespace, token))
+        if ttl is None or ttl <= 0:
+            return None
+        if not self.client.set(self._claim_key(namespace, token), 1, nx=True, px=ttl):
+            return None
+        return self.get(namespace, token)
+
+    def release(self, namespace, token):
+        self.client.delete(self._claim_key(namespace, token))
+
+    def delete(self, namespace, token):
+        return self.client.delete(self._key(namespace, token), self._claim_key(namespace, token)) > 0
+
+    def items(self, namespace):
+        prefix = f"token:{namespace}:"
+        items = []
+        for key in self.client.scan_iter(match=prefix + "*"):
+            data = self.client.get(key)
+            if data is not None:
+                items.append((key.decode("utf-8")[len(prefix):], _loads(data)))
+        return items
+
+    def clear(self, namespace):
+        for pattern in (f"token:{namespace}:*", f"claim:{namespace}:*"):
+            for key in self.client.scan_iter(match=pattern):
+                self.client.delete(key)
+
+
+def create_backend(url=None):
+    """
+    Creates the backend for a URL from TOKEN_STORE_URL:
+    sqlite:///path/to/tokens.db (default), memory:// or redis://host:port/db.
+    """
+    url = url or os.environ.get("TOKEN_STORE_URL")
+    if not url:
+        return SQLiteBackend(os.path.join(tempfile.gettempdir(), "werkzeugkaestchen_tokens.db"))
+
+    scheme = urlparse(url).scheme
+    if scheme == "sqlite":
+        return SQLiteBackend(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url[len("sqlite://"):])
+    if scheme == "memory":
+        return MemoryBackend()
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisBackend(url)
+    raise ValueError(f"Unknown token store URL: {url}")
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Replaces the backend used by all token stores, e.g. in tests."""
+    global _backend
+    _backend = backend
+
+
+class TokenStore(MutableMapping):
+    """
+    Dict-like store for the state a tool keeps between execute_tool and the
+    download request. The entries live in a shared backend, so the download
+    may be served by any worker process or host. Entries are stored as JSON,
+    datetime values are supported.
+
+    Reading an entry returns a read-only copy; changing it raises TypeError.
+    Changes are written with store[token] = {...} or with update_entry().
+    """
+
+    def __init__(self, namespace, ttl=DEFAULT_TTL):
+        self.namespace = namespace
+        self.ttl = ttl.total_seconds() if isinstance(ttl, timedelta) else ttl
+
+    @property
+    def backend(self):
+        return get_backend()
+
+    def __getitem__(self, token):
+        value = self.backend.get(self.namespace, token)
+        if value is None:
+            raise KeyError(token)
+        return _readonly(value)
+
+    def __setitem__(self, token, value):
+        self.backend.set(self.namespace, token, value, self.ttl)
+
+    def __delitem__(self, token):
+        if not self.backend.delete(self.namespace, token):
+            raise KeyError(token)
+
+    def __contains__(self, token):
+        return self.backend.get(self.namespace, token) is not None
+
+    def __iter__(self):
+        return iter([token for token, _ in self.backend.items(self.namespace)])
+
+    def __len__(self):
+        return len(self.backend.items(self.namespace))
+
+    def items(self):
+        # Einmal lesen, statt für jeden Schlüssel einzeln (andere Prozesse könnten dazwischen löschen)
+        return [(token, _readonly(value)) for token, value in self.backend.items(self.namespace)]
+
+    def clear(self):
+        self.backend.clear(self.namespace)
+
+    def update_entry(self, token, **fields):
+        """Atomically updates fields of an entry. Returns the new entry or None if the token is unknown."""
+        return _readonly(self.backend.update(self.namespace, token, fields))
+
+    def claim(self, token):
+        """
+        Atomically claims a token and returns its entry. Only the first caller
+        gets the entry, all others get None until the token is released.
+        """
+        return _readonly(self.backend.claim(self.namespace, token))
+
+    def release(self, token):
+        """Gives a claimed token back, e.g. if the download failed."""
+        self.backend.release(self.namespace, token)
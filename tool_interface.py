@@ -14,6 +14,10 @@ class MiniTool(ABC):
     output = ""
     error_message = ""
     description = ""
+    # Wird gesetzt, wenn das Tool als Hintergrund-Job läuft (siehe job_queue.py)
+    progress_callback = None
+    # Tools, die Zwischenergebnisse melden, setzen das auf True; nur für sie öffnet der Browser einen Event-Stream
+    reports_progress = False
     
     def __init__(self, name, identifier, output_type=OutputType.TEXT):
         self.name = name
@@ -28,4 +32,14 @@ class MiniTool(ABC):
         
         Returns True if the tool successfully passed, False if execution failed.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def report_progress(self, event: dict):
+        """
+        Reports an intermediate result (e.g. a finished subtitle cue) while the tool is running.
+
+        Events are streamed to the browser when the tool runs as a background job,
+        otherwise they are ignored.
+        """
+        if self.progress_callback is not None:
+            self.progress_callback(event)
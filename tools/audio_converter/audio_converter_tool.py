@@ -5,6 +5,9 @@ import uuid
 from datetime import datetime, timedelta
 from pydub import AudioSegment
 from tool_interface import MiniTool, OutputType
+from temp_janitor import janitor
+from token_store import TokenStore
+from result_cache import result_cache
 from flask_babel import lazy_gettext as _
 
 class AudioConverterTool(MiniTool):
@@ -31,7 +34,7 @@ class AudioConverterTool(MiniTool):
         'FLAC': 'FLAC'
     }
 
-    pending_conversions = {}
+    pending_conversions = TokenStore("audio_converter")
     temp_dir = tempfile.gettempdir()
 
     def get_available_formats(self):
@@ -68,7 +71,8 @@ class AudioConverterTool(MiniTool):
                 "target_format": target_format.lower(),
                 "filename": os.path.splitext(audio_info["filename"])[0] + "." + target_format.lower(),
                 "timestamp": datetime.now(),
-                "downloaded": False
+                "downloaded": False,
+                "sha256": audio_info.get("sha256")
             }
 
             # Textvariablen extern festlegen
@@ -114,10 +118,17 @@ class AudioConverterTool(MiniTool):
                 print(_("Error: Source file is empty: {0}").format(conversion['file_path']))
                 return None
 
-            print(_("Loading audio file: {0}").format(conversion['file_path']))
-            audio = AudioSegment.from_file(conversion["file_path"])
             target_format = conversion["target_format"].lstrip('.')
             output_path = os.path.join(self.temp_dir, f"converted_{token}.{target_format}")
+
+            # Dieselbe Datei wurde bereits in dieses Format konvertiert
+            cache_key = result_cache.file_key("audio_converter", conversion, target_format)
+            if result_cache.get_file(cache_key, output_path):
+                janitor.track(output_path)
+                return output_path
+
+            print(_("Loading audio file: {0}").format(conversion['file_path']))
+            audio = AudioSegment.from_file(conversion["file_path"])
             print(_("Converting to: {0}").format(output_path))
 
             if target_format == "aac":
@@ -135,6 +146,8 @@ class AudioConverterTool(MiniTool):
                 return None
 
             print(_("Success: Converted file created with size {0} bytes").format(file_size))
+            result_cache.put_file(cache_key, output_path)
+            janitor.track(output_path)
             return output_path
 
         except Exception as e:
@@ -148,7 +161,7 @@ class AudioConverterTool(MiniTool):
         now = datetime.now()
         tokens_to_remove = []
 
-        for token, conversion in self.pending_conversions.items():
+        for token, conversion in list(self.pending_conversions.items()):
             if (now - conversion["timestamp"] > timedelta(hours=1) or conversion["downloaded"]):
                 try:
                     if os.path.exists(conversion["file_path"]):
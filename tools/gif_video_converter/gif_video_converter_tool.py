@@ -5,9 +5,17 @@ from datetime import datetime, timedelta
 from flask_babel import lazy_gettext as _
 import ffmpeg
 from tool_interface import MiniTool, OutputType
+from temp_janitor import janitor
+from token_store import TokenStore
+from result_cache import result_cache
 
 
 class GifVideoConverterTool(MiniTool):
+    # Dictionary für die Verwaltung der Konvertierungen.
+    # Klassenvariable, da pro Request eine neue Tool-Instanz erzeugt wird.
+    pending_conversions = TokenStore("gif_video_converter")
+    temp_dir = tempfile.gettempdir()
+
     def __init__(self):
         super().__init__(_("GIF/Video Konverter"), "GifVideoConverterTool", OutputType.TEXT)
         self.description = _("Konvertiert Videos in GIFs und umgekehrt")
@@ -22,10 +30,6 @@ class GifVideoConverterTool(MiniTool):
         self.conversion_started_text = _("Ihre {0} Konvertierung wurde erfolgreich gestartet. Bitte klicken Sie auf den Button unten, um die Datei herunterzuladen.")
         self.download_button = _("Konvertierte Datei herunterladen")
         self.new_conversion_button = _("Neue Konvertierung starten")
-        
-        # Dictionary für die Verwaltung der Konvertierungen
-        self.pending_conversions = {}
-        self.temp_dir = tempfile.gettempdir()
 
     def execute_tool(self, input_params: dict) -> bool:
         try:
@@ -68,7 +72,8 @@ class GifVideoConverterTool(MiniTool):
                 "resize": resize if not is_gif else None,
                 "format": format if is_gif else None,
                 "timestamp": datetime.now(),
-                "downloaded": False
+                "downloaded": False,
+                "sha256": file_info.get("sha256")
             }
 
             # HTML-Ausgabe mit Download-Link
@@ -111,11 +116,20 @@ class GifVideoConverterTool(MiniTool):
             input_path = conversion["file_path"]
             is_gif = conversion["is_gif"]
 
+            # Alle Einstellungen gehören zum Schlüssel, Dateiname und Zeitstempel nicht
+            cache_key = result_cache.file_key(
+                "gif_video_converter", conversion, is_gif,
+                conversion.get("quality"), conversion.get("fps"), conversion.get("resize"), conversion.get("format")
+            )
+
             # Bestimme Ausgabedateipfad und -format
             if is_gif:
                 # GIF zu Video
                 format = conversion.get("format", "mp4")
                 output_path = os.path.join(self.temp_dir, f"converted_{token}.{format}")
+                if result_cache.get_file(cache_key, output_path):
+                    janitor.track(output_path)
+                    return output_path
 
                 # Qualitätseinstellungen
                 quality_settings = {
@@ -141,6 +155,9 @@ class GifVideoConverterTool(MiniTool):
             else:
                 # Video zu GIF
                 output_path = os.path.join(self.temp_dir, f"converted_{token}.gif")
+                if result_cache.get_file(cache_key, output_path):
+                    janitor.track(output_path)
+                    return output_path
 
                 # Qualitäts- und FPS-Einstellungen
                 fps = int(conversion.get("fps", 10))
@@ -173,6 +190,8 @@ class GifVideoConverterTool(MiniTool):
                 )
                 ffmpeg.run(stream, overwrite_output=True, quiet=True)
 
+            result_cache.put_file(cache_key, output_path)
+            janitor.track(output_path)
             return output_path
 
         except Exception as e:
@@ -184,7 +203,7 @@ class GifVideoConverterTool(MiniTool):
         now = datetime.now()
         tokens_to_remove = []
 
-        for token, conversion in self.pending_conversions.items():
+        for token, conversion in list(self.pending_conversions.items()):
             # Entferne Konvertierungen, die älter als 1 Stunde sind oder bereits heruntergeladen wurden
             if (now - conversion["timestamp"] > timedelta(hours=1) or
                     conversion["downloaded"]):
@@ -3,6 +3,9 @@ import tempfile
 import uuid
 from PIL import Image
 from tool_interface import MiniTool, OutputType
+from temp_janitor import janitor
+from token_store import TokenStore
+from result_cache import result_cache
 from datetime import datetime, timedelta
 from flask_babel import lazy_gettext as _
 
@@ -31,7 +34,7 @@ class ImageConverterTool(MiniTool):
     }
 
     # Class variable to store pending conversions
-    pending_conversions = {}
+    pending_conversions = TokenStore("image_converter")
     temp_dir = tempfile.gettempdir()  # Get system's temp directory
 
     def __init__(self):
@@ -75,7 +78,8 @@ class ImageConverterTool(MiniTool):
                 "target_format": target_format.lower(),
                 "filename": os.path.splitext(image_info["filename"])[0] + "." + target_format.lower(),
                 "timestamp": datetime.now(),
-                "downloaded": False
+                "downloaded": False,
+                "sha256": image_info.get("sha256")
             }
 
             # Definiere die Texte für die Übersetzung
@@ -118,14 +122,20 @@ class ImageConverterTool(MiniTool):
             return None
 
         try:
+            # Create output filename in temp directory
+            output_path = os.path.join(
+                self.temp_dir,
+                f"converted_{token}.{conversion['target_format']}"
+            )
+
+            # Gleiches Bild im gleichen Zielformat wurde schon konvertiert
+            cache_key = result_cache.file_key("image_converter", conversion, conversion["target_format"])
+            if result_cache.get_file(cache_key, output_path):
+                janitor.track(output_path)
+                return output_path
+
             # Open and convert the image
             with Image.open(conversion["file_path"]) as img:
-                # Create output filename in temp directory
-                output_path = os.path.join(
-                    self.temp_dir,
-                    f"converted_{token}.{conversion['target_format']}"
-                )
-
                 # Convert and save
                 if conversion["target_format"].upper() == "JPEG":
                     # Convert to RGB if saving as JPEG
@@ -133,7 +143,10 @@ class ImageConverterTool(MiniTool):
                         img = img.convert("RGB")
 
                 img.save(output_path, format=conversion["target_format"].upper())
-                return output_path
+
+            result_cache.put_file(cache_key, output_path)
+            janitor.track(output_path)
+            return output_path
 
         except Exception as e:
             print(f"Error converting image: {str(e)}")
@@ -144,7 +157,7 @@ class ImageConverterTool(MiniTool):
         now = datetime.now()
         tokens_to_remove = []
 
-        for token, conversion in self.pending_conversions.items():
+        for token, conversion in list(self.pending_conversions.items()):
             # Remove conversions older than 1 hour or already downloaded
             if (now - conversion["timestamp"] > timedelta(hours=1) or
                     conversion["downloaded"]):
@@ -5,6 +5,8 @@ import tempfile
 import uuid
 from datetime import datetime, timedelta
 from tool_interface import MiniTool, OutputType
+from temp_janitor import janitor
+from token_store import TokenStore
 import json
 
 class ImageCropperTool(MiniTool):
@@ -12,7 +14,7 @@ class ImageCropperTool(MiniTool):
     description = _("Schneiden Sie Ihre Bilder interaktiv zu. Wählen Sie den gewünschten Bereich mit der Maus aus.")
 
     # Speichert ausstehende Zuschnitte mit Metadaten
-    pending_crops = {}
+    pending_crops = TokenStore("image_cropper")
     temp_dir = tempfile.gettempdir()
 
     def __init__(self):
@@ -143,6 +145,7 @@ class ImageCropperTool(MiniTool):
                     f"cropped_{token}_{crop_info['filename']}"
                 )
                 cropped.save(output_path)
+                janitor.track(output_path)
                 return output_path
 
         except Exception as e:
@@ -154,7 +157,7 @@ class ImageCropperTool(MiniTool):
         now = datetime.now()
         tokens_to_remove = []
 
-        for token, crop in self.pending_crops.items():
+        for token, crop in list(self.pending_crops.items()):
             if (now - crop["timestamp"] > timedelta(hours=1)) or crop["downloaded"]:
                 try:
                     if os.path.exists(crop["file_path"]):
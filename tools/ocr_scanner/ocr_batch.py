@@ -0,0 +1,155 @@
+import os
+import html
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PIL import Image
+
+# Seiten, die gleichzeitig in eigenen Threads erkannt werden
+OCR_PAGE_WORKERS = int(os.environ.get("OCR_PAGE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Höchstzahl an Seiten pro Auftrag, über alle hochgeladenen Dateien zusammen
+OCR_MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", 100))
+# PDF-Seiten werden höchstens mit dieser Auflösung gerastert (und nie größer, als die Erkennung sie nutzt)
+PDF_RENDER_DPI = int(os.environ.get("OCR_PDF_DPI", 300))
+
+
+class PdfSupportMissing(Exception):
+    """Raised for PDF uploads when pypdfium2 is not installed."""
+    pass
+
+
+def is_pdf(filename):
+    return filename.lower().endswith(".pdf")
+
+
+def _pdfium():
+    try:
+        import pypdfium2
+    except ImportError:
+        raise PdfSupportMissing("pypdfium2 is required to read PDF files")
+    return pypdfium2
+
+
+def page_count(file_path, filename):
+    """Number of pages of a PDF or frames of an image (multi-page TIFF)."""
+    if is_pdf(filename):
+        pdf = _pdfium().PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with Image.open(file_path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def load_page(file_path, filename, index, max_size):
+    """
+    Opens page index of a PDF or frame index of an image. PDF pages are
+    rendered on the fly, at PDF_RENDER_DPI but no larger than max_size.
+    """
+    if is_pdf(filename):
+        pdf = _pdfium().PdfDocument(file_path)
+        try:
+            page = pdf[index]
+            width, height = page.get_size()
+            scale = min(PDF_RENDER_DPI / 72, max_size[0] / width, max_size[1] / height)
+            return page.render(scale=scale, grayscale=True).to_pil()
+        finally:
+            pdf.close()
+
+    with Image.open(file_path) as image:
+        image.seek(index)
+        if image.mode not in ('RGB', 'L'):
+            return image.convert('RGB')
+        return image.copy()
+
+
+def recognize_pages(function, pages, workers=None, on_page=None):
+    """
+    Calls function(*page) for every page, spread over threads. The threads
+    share the resident Tesseract instances of the process (see TesseractPool)
+    instead of each starting a process with its own.
+
+    on_page(index, result) is called as soon as a page is done, so the order
+    follows the threads, not the pages. Returns the results in page order.
+    """
+    workers = min(workers or OCR_PAGE_WORKERS, len(pages))
+    results = [None] * len(pages)
+
+    if workers <= 1:
+        for index, page in enumerate(pages):
+            results[index] = function(*page)
+            if on_page:
+                on_page(index, results[index])
+        return results
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-page") as executor:
+        futures = {executor.submit(function, *page): index for index, page in enumerate(pages)}
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if on_page:
+                on_page(index, results[index])
+    return results
+
+
+def combined_text(labels, results):
+    """All pages in one text, each under a heading with its label."""
+    return "\n\n".join(f"=== {label} ===\n{result['extracted_text'].strip()}"
+                       for label, result in zip(labels, results))
+
+
+def _bbox(regions):
+    return (min(r['x'] for r in regions), min(r['y'] for r in regions),
+            max(r['x'] + r['width'] for r in regions), max(r['y'] + r['height'] for r in regions))
+
+
+def _title(*parts):
+    return html.escape("; ".join(parts), quote=True)
+
+
+def to_hocr(labels, results):
+    """
+    Builds one hOCR document from the recognized pages. Words are grouped
+    into lines by their line number; coordinates refer to the page image
+    the recognition ran on. Pages without word positions (simple OCR) stay empty.
+    """
+    body = []
+    for page_number, (label, result) in enumerate(zip(labels, results), start=1):
+        title = _title('image "%s"' % label, "bbox 0 0 %d %d" % (result["image_width"], result["image_height"]),
+                       "ppageno %d" % (page_number - 1))
+        body.append(f'  <div class="ocr_page" id="page_{page_number}" title="{title}">')
+
+        lines = {}
+        for region in result.get("text_regions", []):
+            # Ältere Cache-Einträge kennen keine Zeilen, dann steht jedes Wort für sich
+            lines.setdefault(region.get("line", ("word", len(lines))), []).append(region)
+
+        for line_number, words in enumerate(lines.values(), start=1):
+            line_id = f"{page_number}_{line_number}"
+            title = _title("bbox %d %d %d %d" % _bbox(words))
+            body.append(f'   <span class="ocr_line" id="line_{line_id}" title="{title}">')
+            for word_number, word in enumerate(words, start=1):
+                title = ["bbox %d %d %d %d" % _bbox([word])]
+                if "conf" in word:
+                    title.append(f"x_wconf {word['conf']}")
+                body.append(f'    <span class="ocrx_word" id="word_{line_id}_{word_number}" title="{_title(*title)}">'
+                            f'{html.escape(word["text"])}</span>')
+            body.append('   </span>')
+        body.append('  </div>')
+
+    return "\n".join([
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"',
+        '    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">',
+        '<html xmlns="http://www.w3.org/1999/xhtml">',
+        ' <head>',
+        '  <title></title>',
+        '  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>',
+        '  <meta name="ocr-system" content="werkzeugkaestchen"/>',
+        '  <meta name="ocr-capabilities" content="ocr_page ocr_line ocrx_word"/>',
+        ' </head>',
+        ' <body>',
+        *body,
+        ' </body>',
+        '</html>',
+        '',
+    ])
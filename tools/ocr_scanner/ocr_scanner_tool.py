@@ -1,4 +1,5 @@
 import os
+import html
 import tempfile
 import uuid
 import base64
@@ -10,17 +11,30 @@ import json
 import urllib.request
 import urllib.parse
 import urllib.error
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from PIL import Image, ImageEnhance, ImageFilter, ImageOps
 from tool_interface import MiniTool, OutputType
+from token_store import TokenStore
+from result_cache import result_cache
+from artifact_store import artifact_store, artifact_url
+from tools.ocr_scanner.tesseract_pool import TesseractPool
+from tools.ocr_scanner import ocr_batch
 from flask_babel import lazy_gettext as _
 
+# Teil des Cache-Schlüssels; erhöhen, wenn sich das Ergebnis bei gleichem Bild ändert
+# (2: dünn besetzte Seiten werden bereichsweise erkannt, 3: nur noch mit einer Sprache)
+RECOGNITION_VERSION = 3
+
+
 class OcrScannerTool(MiniTool):
     name = _("OCR Scanner")
     description = _("Extrahiert Text aus Bilddateien mittels OCR-Technologie.")
+    reports_progress = True
 
     # Supported image formats
-    SUPPORTED_FORMATS = ['PNG', 'JPG', 'JPEG', 'BMP', 'TIFF']
+    SUPPORTED_FORMATS = ['PNG', 'JPG', 'JPEG', 'BMP', 'TIFF', 'TIF', 'PDF']
     
     # Supported languages
     LANGUAGES = {
@@ -32,14 +46,22 @@ class OcrScannerTool(MiniTool):
     }
 
     # Class variable to store pending scans
-    pending_scans = {}
+    pending_scans = TokenStore("ocr_scanner")
     temp_dir = tempfile.gettempdir()
     
     # Constants for resource limits
     MAX_IMAGE_SIZE = (1500, 1500)  # Maximum image dimensions
-    MAX_PROCESSING_TIME = 15  # Maximum processing time in seconds
+    BLOCK_THRESHOLDS = (80, 127, 170)  # Low, medium, high thresholds for text block detection
+    BLANK_PAGE_MAX_DENSITY = 0.02  # Pages without a 20x20 cell above this share of dark pixels count as blank
     MAX_BLOCK_COUNT = 1000  # Maximum number of text blocks to process
     MAX_COMPONENT_SIZE = 10000  # Maximum pixels in a connected component
+
+    # Layout-aware OCR: only the detected text regions are recognized, one block each (PSM 6)
+    LAYOUT_OCR_ENABLED = True
+    LAYOUT_MAX_COVERAGE = 0.5  # Regions covering more of the page are recognized as a whole page
+    LAYOUT_MAX_REGIONS = 40  # More regions cost more than one pass over the page
+    REGION_PADDING = 10  # White margin around each region in pixels, Tesseract needs some border
+    REGION_PSM = 6  # Assume a single uniform block of text
     
     # Cloud OCR API settings - using a free public demo OCR API
     CLOUD_OCR_ENABLED = True  # Set to False to disable cloud OCR
@@ -70,25 +92,42 @@ class OcrScannerTool(MiniTool):
         
         return None
 
+    def tesseract_available(self):
+        """Tesseract can be used through tesserocr or through the tesseract program."""
+        return bool(self.tesseract_path) or tesseract_pool.has_tesserocr()
+
     def execute_tool(self, input_params: dict) -> bool:
         try:
             if "image" not in input_params:
                 self.error_message = _("Bitte wählen Sie ein Bild aus.")
                 return False
 
-            image_info = input_params["image"]
-
-            # Check if the file is a valid image format
-            file_extension = os.path.splitext(image_info["filename"])[1].upper().lstrip('.')
-            if file_extension not in self.SUPPORTED_FORMATS and file_extension != 'JPEG':
-                self.error_message = _("Das ausgewählte Dateiformat wird nicht unterstützt. Unterstützte Formate: PNG, JPG, BMP, TIFF.")
-                return False
-                
-            # Check if file exists and has content
-            if not os.path.exists(image_info["file_path"]) or os.path.getsize(image_info["file_path"]) == 0:
-                self.error_message = _("Die ausgewählte Datei ist leer oder beschädigt.")
+            # Mehrere Dateien kommen als Liste, eine einzelne als dict
+            files = input_params["image"]
+            if isinstance(files, dict):
+                files = [files]
+            if not files:
+                self.error_message = _("Bitte wählen Sie ein Bild aus.")
                 return False
 
+            for file_info in files:
+                # Check if the file is a valid image format
+                file_extension = os.path.splitext(file_info["filename"])[1].upper().lstrip('.')
+                if file_extension not in self.SUPPORTED_FORMATS:
+                    self.error_message = _("Das ausgewählte Dateiformat wird nicht unterstützt. Unterstützte Formate: PNG, JPG, BMP, TIFF, PDF.")
+                    return False
+
+                # Check if file exists and has content
+                if not os.path.exists(file_info["file_path"]) or os.path.getsize(file_info["file_path"]) == 0:
+                    self.error_message = _("Die ausgewählte Datei ist leer oder beschädigt.")
+                    return False
+
+            # PDFs, mehrseitige TIFFs und mehrere Dateien werden Seite für Seite erkannt
+            if len(files) > 1 or ocr_batch.is_pdf(files[0]["filename"]) or self.count_pages(files[0]) > 1:
+                return self.execute_batch(files)
+
+            image_info = files[0]
+
             # Generate a unique token for this scan
             token = str(uuid.uuid4())
 
@@ -97,7 +136,8 @@ class OcrScannerTool(MiniTool):
                 "file_path": image_info["file_path"],
                 "timestamp": datetime.now(),
                 "processed": False,
-                "filename": image_info["filename"]
+                "filename": image_info["filename"],
+                "sha256": image_info.get("sha256")
             }
 
             # Process the image and extract text
@@ -170,95 +210,153 @@ class OcrScannerTool(MiniTool):
             self.error_message = _("Fehler bei der Bildverarbeitung: %(error)s", error=str(e))
             return False
 
+    def count_pages(self, file_info):
+        """Number of pages of an upload; files that can't be opened count as one page."""
+        try:
+            return ocr_batch.page_count(file_info["file_path"], file_info["filename"])
+        except ocr_batch.PdfSupportMissing:
+            raise
+        except Exception as e:
+            print(f"Error counting pages: {str(e)}")
+            return 1
+
+    def execute_batch(self, files):
+        """
+        Recognizes all pages of all files in parallel worker processes.
+        Each page is reported as soon as it is done; the combined text and
+        an hOCR file with the word positions are offered for download.
+        """
+        try:
+            pages = []
+            labels = []
+            for file_info in files:
+                count = self.count_pages(file_info)
+                for index in range(count):
+                    pages.append((file_info["file_path"], file_info["filename"], index, file_info.get("sha256")))
+                    labels.append(file_info["filename"] if count == 1
+                                  else f"{file_info['filename']}, {_('Seite')} {index + 1}")
+        except ocr_batch.PdfSupportMissing:
+            self.error_message = _("PDF-Dateien können nicht gelesen werden, da pypdfium2 nicht installiert ist.")
+            return False
+        except Exception as e:
+            print(f"Error reading PDF: {str(e)}")
+            self.error_message = _("Die ausgewählte Datei ist leer oder beschädigt.")
+            return False
+
+        if len(pages) > ocr_batch.OCR_MAX_PAGES:
+            self.error_message = _("Es können höchstens %(count)d Seiten auf einmal erkannt werden.",
+                                   count=ocr_batch.OCR_MAX_PAGES)
+            return False
+
+        def on_page(index, result):
+            self.report_progress({
+                "type": "page",
+                "page": index + 1,
+                "pages": len(pages),
+                "label": labels[index],
+                "text": result["extracted_text"],
+            })
+
+        results = ocr_batch.recognize_pages(recognize_page, pages, on_page=on_page)
+
+        text = ocr_batch.combined_text(labels, results)
+        batch_id = uuid.uuid4().hex
+        text_path = os.path.join(self.temp_dir, f"ocr_{batch_id}.txt")
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        hocr_path = os.path.join(self.temp_dir, f"ocr_{batch_id}.hocr")
+        with open(hocr_path, "w", encoding="utf-8") as f:
+            f.write(ocr_batch.to_hocr(labels, results))
+
+        text_url = artifact_url(artifact_store.register(text_path, "extracted_text.txt", "text/plain"), download=True)
+        hocr_url = artifact_url(artifact_store.register(hocr_path, "extracted_text.hocr", "text/html"), download=True)
+
+        success_heading = _("Text aus %(count)d Seiten extrahiert", count=len(pages))
+        self.output = f"""
+            <div class="card mb-4">
+                <div class="card-header bg-success text-white">
+                    <h4 class="card-title mb-0">{success_heading}</h4>
+                </div>
+                <div class="card-body">
+                    <div class="form-group">
+                        <label for="extractedText">{_("Extrahierter Text")}:</label>
+                        <textarea id="extractedText" class="form-control" rows="15" readonly>{html.escape(text)}</textarea>
+                    </div>
+                    <div class="d-flex justify-content-between mt-3">
+                        <button onclick="copyToClipboard()" class="btn btn-primary">
+                            <i class="fas fa-copy"></i> {_("Text kopieren")}
+                        </button>
+                        <a href="{text_url}" class="btn btn-success">
+                            <i class="fas fa-download"></i> {_("Extrahierten Text herunterladen")}
+                        </a>
+                        <a href="{hocr_url}" class="btn btn-success">
+                            <i class="fas fa-download"></i> {_("hOCR herunterladen")}
+                        </a>
+                        <a href="/tool/OcrScannerTool" class="btn btn-secondary">
+                            <i class="fas fa-redo"></i> {_("Anderes Bild scannen")}
+                        </a>
+                    </div>
+                </div>
+            </div>
+            <script>
+            function copyToClipboard() {{
+                var textarea = document.getElementById('extractedText');
+                textarea.select();
+                document.execCommand('copy');
+                alert('{_("Text in die Zwischenablage kopiert!")}');
+            }}
+            </script>
+            """
+        return True
+
     def detect_text_blocks(self, image):
         """
         Detect blocks of text in an image and return their bounding boxes.
         Uses multiple methods for more robust detection.
         """
-        start_time = time.time()
-        
-        # Convert to grayscale
-        gray = image.convert('L')
-        
+        gray = np.asarray(image.convert('L'))
+        height, width = gray.shape
+
         # Apply multiple thresholds for better detection
-        thresholds = [80, 127, 170]  # Low, medium, high thresholds
+        thresholds = np.array(self.BLOCK_THRESHOLDS)
+        grid_size = 10  # Divide image into cells
+        grid_width = width // grid_size
+        grid_height = height // grid_size
+        if grid_width == 0 or grid_height == 0:
+            return []
+
+        # Schwarze Pixel pro Zelle für alle Schwellwerte auf einmal zählen (nur vollständige Zellen)
+        cells = gray[:grid_height * grid_size, :grid_width * grid_size].reshape(
+            grid_height, grid_size, grid_width, grid_size)
+        black_ratio = np.stack([(cells < threshold).sum(axis=(1, 3)) for threshold in thresholds]) / (grid_size * grid_size)
+
+        # Adaptive threshold based on cell position
+        # More strict in the center (likely text area), less strict at edges
+        center_x, center_y = width/2, height/2
+        max_dist = ((width/2)**2 + (height/2)**2)**0.5
+        cell_x = np.arange(grid_width) * grid_size - center_x
+        cell_y = np.arange(grid_height) * grid_size - center_y
+        dist_from_center = (cell_y[:, None]**2 + cell_x[None, :]**2)**0.5
+        thresh = 0.1 + 0.3 * (dist_from_center / max_dist)  # 0.1 near center, up to 0.4 at corners
+
+        active = black_ratio > thresh
         all_blocks = []
-        
-        for threshold in thresholds:
-            # Abort if taking too long
-            if time.time() - start_time > self.MAX_PROCESSING_TIME / 3:
-                break
-                
-            # Apply threshold to get binary image
-            binary = gray.point(lambda x: 0 if x < threshold else 255, '1')
-            
-            # Find text blocks using a grid-based approach
-            width, height = binary.size
-            pixels = binary.load()
-            
-            grid_size = 10  # Divide image into cells
-            grid_width = width // grid_size
-            grid_height = height // grid_size
-            
-            # Find potential text blocks
-            text_blocks = []
-            for y in range(grid_height):
-                row_blocks = []
-                current_block = None
-                
-                for x in range(grid_width):
-                    # Check timeout
-                    if time.time() - start_time > self.MAX_PROCESSING_TIME / 2:
-                        break
-                    
-                    # Count black pixels in this cell
-                    x1, y1 = x * grid_size, y * grid_size
-                    x2, y2 = min(x1 + grid_size, width), min(y1 + grid_size, height)
-                    
-                    black_count = 0
-                    total = 0
-                    for py in range(y1, y2):
-                        for px in range(x1, x2):
-                            total += 1
-                            if px < width and py < height and pixels[px, py] == 0:
-                                black_count += 1
-                    
-                    # Adaptive threshold based on cell position
-                    # More strict in the center (likely text area), less strict at edges
-                    center_x, center_y = width/2, height/2
-                    dist_from_center = ((x*grid_size - center_x)**2 + (y*grid_size - center_y)**2)**0.5
-                    max_dist = ((width/2)**2 + (height/2)**2)**0.5
-                    relative_dist = dist_from_center / max_dist
-                    
-                    # Adjust threshold based on distance from center
-                    thresh = 0.1 + 0.3 * relative_dist  # 0.1 near center, up to 0.4 at corners
-                    
-                    if total > 0 and black_count / total > thresh:
-                        if current_block is None:
-                            current_block = [x1, y1, x2, y2]
-                        else:
-                            current_block[2] = x2  # Extend current block
-                    else:
-                        if current_block is not None:
-                            # Save completed block
-                            row_blocks.append(tuple(current_block))
-                            current_block = None
-                
-                # Don't forget the last block in the row
-                if current_block is not None:
-                    row_blocks.append(tuple(current_block))
-                
-                # Add all blocks from this row
-                text_blocks.extend(row_blocks)
-                
-                # Limit the number of blocks to prevent memory issues
-                if len(text_blocks) > self.MAX_BLOCK_COUNT:
-                    text_blocks = text_blocks[:self.MAX_BLOCK_COUNT]
-                    break
-                    
-            # Merge overlapping blocks
-            all_blocks.extend(text_blocks)
-            
+        for threshold_active in active:
+            # Zusammenhängende Zellen einer Zeile bilden einen Block: Anfang und Ende der Läufe suchen
+            edges = np.diff(np.pad(threshold_active.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+            rows, starts = np.nonzero(edges == 1)
+            _rows, ends = np.nonzero(edges == -1)
+
+            # Limit the number of blocks to prevent memory issues
+            count = min(len(rows), self.MAX_BLOCK_COUNT)
+            y1 = rows[:count] * grid_size
+            all_blocks.extend(zip(
+                (starts[:count] * grid_size).tolist(),
+                y1.tolist(),
+                (ends[:count] * grid_size).tolist(),
+                (y1 + grid_size).tolist(),
+            ))
+
         return self.merge_overlapping_blocks(all_blocks)
         
     def merge_overlapping_blocks(self, blocks):
@@ -293,49 +391,127 @@ class OcrScannerTool(MiniTool):
         
         return merged_blocks
 
+    def merge_regions(self, blocks):
+        """
+        Merges touching or overlapping blocks until no two of them overlap.
+        Unlike merge_overlapping_blocks, which only compares neighbours in
+        sorted order, this also joins blocks of two columns whose rows interleave.
+        """
+        regions = []
+        for block in sorted(blocks, key=lambda b: (b[1], b[0])):
+            current = list(block)
+            merged = True
+            while merged:
+                merged = False
+                for other in regions:
+                    if (other[0] <= current[2] and other[1] <= current[3] and
+                            other[2] >= current[0] and other[3] >= current[1]):
+                        current = [min(current[0], other[0]), min(current[1], other[1]),
+                                   max(current[2], other[2]), max(current[3], other[3])]
+                        regions.remove(other)
+                        merged = True
+                        break
+            regions.append(current)
+        return [tuple(region) for region in regions]
+
+    def reading_order(self, blocks):
+        """
+        Sorts blocks top to bottom. Blocks that overlap vertically form a row
+        and are read left to right, so columns side by side stay in order.
+        """
+        rows = []
+        for block in sorted(blocks, key=lambda b: (b[1], b[0])):
+            if rows and block[1] < rows[-1][0]:
+                rows[-1][0] = max(rows[-1][0], block[3])
+                rows[-1][1].append(block)
+            else:
+                rows.append([block[3], [block]])
+        return [block for _bottom, row in rows for block in sorted(row, key=lambda b: b[0])]
+
+    def layout_regions(self, image):
+        """
+        Text regions worth recognizing one by one, padded and in reading order.
+        Returns None if the page is too dense for that to pay off.
+        """
+        width, height = image.size
+        padding = self.REGION_PADDING
+        blocks = [(max(0, x1 - padding), max(0, y1 - padding), min(width, x2 + padding), min(height, y2 + padding))
+                  for x1, y1, x2, y2 in self.detect_text_blocks(image)]
+        # Durch den Rand können sich Bereiche nun überlappen
+        regions = self.merge_regions(blocks)
+
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if not regions or len(regions) > self.LAYOUT_MAX_REGIONS or area > self.LAYOUT_MAX_COVERAGE * width * height:
+            return None
+        return self.reading_order(regions)
+
+    def recognize_layout(self, ocr_image, threads=None):
+        """
+        Runs Tesseract only on the detected text regions, on up to threads
+        threads (default: the size of the Tesseract pool), and returns the
+        words in pytesseract's Output.DICT format with page coordinates and in
+        reading order. Dense pages, and pages where no word was found in the
+        regions, are recognized as a whole.
+        """
+        regions = self.layout_regions(ocr_image) if self.LAYOUT_OCR_ENABLED else None
+        if regions is None:
+            return tesseract_pool.image_to_data(ocr_image)
+
+        print(f"Recognizing {len(regions)} text regions")
+        with ThreadPoolExecutor(max_workers=min(len(regions), threads or tesseract_pool.size)) as executor:
+            results = list(executor.map(
+                lambda region: tesseract_pool.image_to_data(ocr_image.crop(region), psm=self.REGION_PSM), regions))
+
+        ocr_data = {}
+        block_offset = 0
+        for (x1, y1, _x2, _y2), data in zip(regions, results):
+            # Koordinaten auf die Seite umrechnen, Blocknummern seitenweit eindeutig machen
+            shifted = dict(data, left=[x + x1 for x in data['left']], top=[y + y1 for y in data['top']])
+            if 'block_num' in data:
+                shifted['block_num'] = [block + block_offset for block in data['block_num']]
+                block_offset = max(shifted['block_num'], default=block_offset) + 1
+            for column, values in shifted.items():
+                ocr_data.setdefault(column, []).extend(values)
+
+        if not any(text.strip() for text in ocr_data.get('text', [])):
+            return tesseract_pool.image_to_data(ocr_image)
+        return ocr_data
+
+    def density_grid(self, image, grid_size=20):
+        """
+        Share of dark pixels in each grid_size x grid_size cell of the
+        contrast-enhanced image, as array of shape (rows, columns).
+        Incomplete cells at the right and bottom edge are left out.
+        """
+        # Convert to grayscale and apply contrast
+        enhanced = np.asarray(ImageEnhance.Contrast(image.convert('L')).enhance(2.0))
+        height, width = enhanced.shape
+        grid_width = width // grid_size
+        grid_height = height // grid_size
+
+        # Find potential text areas by looking for dark regions
+        threshold = 127  # Mid-point threshold
+        cells = enhanced[:grid_height * grid_size, :grid_width * grid_size] < threshold
+        return cells.reshape(grid_height, grid_size, grid_width, grid_size).mean(axis=(1, 3))
+
+    def is_blank_page(self, image):
+        """True if no cell of the image contains more than a few dark pixels, so OCR can be skipped."""
+        density = self.density_grid(image)
+        return density.size > 0 and density.max() < self.BLANK_PAGE_MAX_DENSITY
+
     def simple_ocr(self, image):
         """
         A simplified OCR implementation that works without external libraries.
         """
         try:
             # Basic visual analysis of the image
-            width, height = image.size
-            
-            # Convert to grayscale and apply contrast
-            gray = image.convert('L')
-            enhanced = ImageEnhance.Contrast(gray).enhance(2.0)
-            
-            # Find potential text areas by looking for dark regions
-            threshold = 127  # Mid-point threshold
-            binary = enhanced.point(lambda x: 0 if x < threshold else 255, '1')
-            
-            # Count dark pixels in a grid
-            grid_size = 20
-            grid_width = width // grid_size
-            grid_height = height // grid_size
+            density = self.density_grid(image)
             
             # Create a simple visual representation
+            # Determine character to use
+            symbols = np.where(density > 0.3, '█', np.where(density > 0.1, '▓', ' '))
             grid_text = []
-            for y in range(grid_height):
-                line = []
-                for x in range(grid_width):
-                    # Get the region
-                    x1, y1 = x * grid_size, y * grid_size
-                    x2, y2 = min(x1 + grid_size, width), min(y1 + grid_size, height)
-                    region = binary.crop((x1, y1, x2, y2))
-                    
-                    # Count black pixels
-                    black_pixels = sum(1 for pixel in region.getdata() if pixel == 0)
-                    total_pixels = (x2-x1) * (y2-y1)
-                    
-                    # Determine character to use
-                    if total_pixels > 0 and black_pixels / total_pixels > 0.3:
-                        line.append('█')
-                    elif total_pixels > 0 and black_pixels / total_pixels > 0.1:
-                        line.append('▓')
-                    else:
-                        line.append(' ')
-                        
+            for line in symbols:
                 # Add the line if it contains potential text
                 if '█' in line or '▓' in line:
                     grid_text.append(''.join(line))
@@ -370,6 +546,14 @@ class OcrScannerTool(MiniTool):
             if not os.path.exists(scan_info["file_path"]):
                 print("File does not exist")
                 return _("Das Bild konnte nicht gefunden werden."), self.generate_fallback_image()
+
+            # Dasselbe Bild wurde schon einmal erkannt: Ergebnis direkt übernehmen
+            cache_key = result_cache.file_key("ocr", scan_info, self.tesseract_available(), RECOGNITION_VERSION)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                print("OCR result cache hit")
+                self.pending_scans.update_entry(token, processed=True, **cached)
+                return cached["extracted_text"], cached["enhanced_image"]
                 
             try:
                 # Open the image with error handling
@@ -390,128 +574,20 @@ class OcrScannerTool(MiniTool):
             
             # Process the image safely
             try:
-                # Basic processing steps
-                
-                # 1. Resize large images to reasonable dimensions
-                width, height = image.size
-                if width > self.MAX_IMAGE_SIZE[0] or height > self.MAX_IMAGE_SIZE[1]:
-                    ratio = min(self.MAX_IMAGE_SIZE[0] / width, self.MAX_IMAGE_SIZE[1] / height)
-                    new_size = (int(width * ratio), int(height * ratio))
-                    image = image.resize(new_size, Image.LANCZOS)
-                
-                # 2. Convert to grayscale for OCR processing
-                grayscale = image.convert('L')
-                
-                # 3. Create a copy for display with basic enhancements
-                display_image = grayscale.copy()
-                display_image = ImageEnhance.Contrast(display_image).enhance(1.8)
-                
-                # Generate base64 of the enhanced image for display
-                buffered = io.BytesIO()
-                display_image.save(buffered, format="PNG")
-                enhanced_image_base64 = base64.b64encode(buffered.getvalue()).decode()
-                
-                # Store original image size for text area mapping
-                image_width, image_height = image.size
-                
-                # Try to extract text in order of reliability:
-                # 1. Local Tesseract if available
-                # 2. Cloud OCR API if enabled
-                # 3. Simple OCR as last resort
-                extracted_text = ""
-                text_regions = []
-                
-                # Try local Tesseract first if available
-                if self.tesseract_path:
-                    try:
-                        print("Trying local Tesseract OCR")
-                        import pytesseract
-                        
-                        # Set Tesseract path explicitly if we found it
-                        pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
-                        
-                        # Apply basic processing for OCR
-                        ocr_image = ImageEnhance.Contrast(grayscale).enhance(1.5)
-                        ocr_image = ocr_image.filter(ImageFilter.SHARPEN)
-                        
-                        # Extract text using pytesseract with detailed output
-                        # This gives us word regions and their coordinates
-                        ocr_data = pytesseract.image_to_data(ocr_image, output_type=pytesseract.Output.DICT)
-                        
-                        # Build text regions from OCR data
-                        result_text = []
-                        for i in range(len(ocr_data['text'])):
-                            if int(ocr_data['conf'][i]) > 20 and ocr_data['text'][i].strip():  # Only keep confident results
-                                x, y, w, h = ocr_data['left'][i], ocr_data['top'][i], ocr_data['width'][i], ocr_data['height'][i]
-                                text = ocr_data['text'][i]
-                                result_text.append(text)
-                                text_regions.append({
-                                    'text': text,
-                                    'x': x,
-                                    'y': y,
-                                    'width': w,
-                                    'height': h
-                                })
-                        
-                        # Join all text parts
-                        extracted_text = ' '.join(result_text)
-                        
-                        # If that failed, try standard OCR
-                        if not extracted_text.strip():
-                            extracted_text = pytesseract.image_to_string(ocr_image)
-                            
-                            # If still no results, try with original image
-                            if not extracted_text.strip():
-                                extracted_text = pytesseract.image_to_string(image)
-                        
-                        # Clean up the text
-                        extracted_text = self.clean_text(extracted_text)
-                        
-                        if extracted_text.strip():
-                            print("Local Tesseract extraction successful")
-                    
-                    except (ImportError, Exception) as e:
-                        print(f"Local Tesseract error: {str(e)}")
-                        extracted_text = ""
-                
-                # If local Tesseract failed or isn't available, try cloud OCR
-                if not extracted_text.strip() and self.CLOUD_OCR_ENABLED:
-                    try:
-                        print("Trying cloud OCR service")
-                        # Save image to a temporary file for upload
-                        buffered = io.BytesIO()
-                        image.save(buffered, format="PNG")
-                        img_str = base64.b64encode(buffered.getvalue()).decode()
-                        
-                        # Try to extract text using cloud OCR API
-                        cloud_text, cloud_regions = self.extract_text_from_cloud(img_str)
-                        if cloud_text:
-                            extracted_text = cloud_text
-                            text_regions = cloud_regions
-                            print("Cloud OCR extraction successful")
-                        
-                    except Exception as e:
-                        print(f"Cloud OCR error: {str(e)}")
-                        extracted_text = ""
-                
-                # If both methods failed, use simple OCR
-                if not extracted_text.strip():
-                    print("Falling back to simple OCR")
-                    extracted_text = self.simple_ocr(image)
-                    # No text regions for simple OCR
-                
+                result = self.recognize(image)
+                extracted_text = result["extracted_text"]
+
                 # Mark as processed and store the results
-                self.pending_scans[token]["processed"] = True
-                self.pending_scans[token]["extracted_text"] = extracted_text
-                self.pending_scans[token]["enhanced_image"] = enhanced_image_base64
-                self.pending_scans[token]["text_regions"] = text_regions
-                self.pending_scans[token]["image_width"] = image_width
-                self.pending_scans[token]["image_height"] = image_height
+                self.pending_scans.update_entry(token, processed=True, **result)
+
+                # Nur echte Treffer cachen, Fehlschläge (z.B. Cloud nicht erreichbar) erneut versuchen
+                if extracted_text.strip():
+                    result_cache.put(cache_key, result)
                 
                 if not extracted_text.strip():
                     extracted_text = self.generate_fallback_text(image)
                 
-                return extracted_text, enhanced_image_base64
+                return extracted_text, result["enhanced_image"]
                 
             except Exception as e:
                 print(f"Error during image processing: {str(e)}")
@@ -523,6 +599,144 @@ class OcrScannerTool(MiniTool):
             traceback.print_exc()
             return _("Unerwarteter Fehler bei der Bildverarbeitung."), self.generate_fallback_image()
 
+    def recognize(self, image, preview=True, region_threads=None):
+        """
+        Extracts the text of an opened image. Returns a dict with the text, the
+        recognized words (text_regions), the size of the recognized image and,
+        with preview=True, the contrast-enhanced image as base64 PNG.
+        region_threads limits the threads recognizing the regions of a sparse page.
+        """
+        # Basic processing steps
+        
+        # 1. Resize large images to reasonable dimensions
+        width, height = image.size
+        if width > self.MAX_IMAGE_SIZE[0] or height > self.MAX_IMAGE_SIZE[1]:
+            ratio = min(self.MAX_IMAGE_SIZE[0] / width, self.MAX_IMAGE_SIZE[1] / height)
+            new_size = (int(width * ratio), int(height * ratio))
+            image = image.resize(new_size, Image.LANCZOS)
+        
+        # 2. Convert to grayscale for OCR processing
+        grayscale = image.convert('L')
+        
+        # 3. Create a copy for display with basic enhancements
+        enhanced_image_base64 = None
+        if preview:
+            display_image = grayscale.copy()
+            display_image = ImageEnhance.Contrast(display_image).enhance(1.8)
+            
+            # Generate base64 of the enhanced image for display
+            buffered = io.BytesIO()
+            display_image.save(buffered, format="PNG")
+            enhanced_image_base64 = base64.b64encode(buffered.getvalue()).decode()
+        
+        # Store original image size for text area mapping
+        image_width, image_height = image.size
+        
+        # Try to extract text in order of reliability:
+        # 1. Local Tesseract if available
+        # 2. Cloud OCR API if enabled
+        # 3. Simple OCR as last resort
+        extracted_text = ""
+        text_regions = []
+        
+        # Leere Seiten (z.B. Rückseiten eines Scans) gar nicht erst erkennen lassen
+        blank_page = self.is_blank_page(grayscale)
+        if blank_page:
+            print("Blank page, skipping OCR")
+        
+        # Try local Tesseract first if available
+        if self.tesseract_available() and not blank_page:
+            try:
+                print("Trying local Tesseract OCR")
+                
+                # Set Tesseract path explicitly if we found it
+                if self.tesseract_path:
+                    tesseract_pool.tesseract_cmd = self.tesseract_path
+                
+                # Apply basic processing for OCR
+                ocr_image = ImageEnhance.Contrast(grayscale).enhance(1.5)
+                ocr_image = ocr_image.filter(ImageFilter.SHARPEN)
+                
+                # Extract text using pytesseract with detailed output
+                # This gives us word regions and their coordinates
+                ocr_data = self.recognize_layout(ocr_image, threads=region_threads)
+                
+                # Build text regions from OCR data
+                result_text = []
+                lines = {}
+                for i in range(len(ocr_data['text'])):
+                    if int(ocr_data['conf'][i]) > 20 and ocr_data['text'][i].strip():  # Only keep confident results
+                        x, y, w, h = ocr_data['left'][i], ocr_data['top'][i], ocr_data['width'][i], ocr_data['height'][i]
+                        text = ocr_data['text'][i]
+                        result_text.append(text)
+                        # Zeilen fortlaufend nummerieren, für die hOCR-Ausgabe
+                        line_id = tuple(ocr_data[column][i] if column in ocr_data else 0
+                                        for column in ('block_num', 'par_num', 'line_num'))
+                        text_regions.append({
+                            'text': text,
+                            'x': x,
+                            'y': y,
+                            'width': w,
+                            'height': h,
+                            'line': lines.setdefault(line_id, len(lines)),
+                            'conf': int(ocr_data['conf'][i])
+                        })
+                
+                # Join all text parts
+                extracted_text = ' '.join(result_text)
+                
+                # If that failed, try standard OCR
+                if not extracted_text.strip():
+                    extracted_text = tesseract_pool.image_to_string(ocr_image)
+                    
+                    # If still no results, try with original image
+                    if not extracted_text.strip():
+                        extracted_text = tesseract_pool.image_to_string(image)
+                
+                # Clean up the text
+                extracted_text = self.clean_text(extracted_text)
+                
+                if extracted_text.strip():
+                    print("Local Tesseract extraction successful")
+            
+            except (ImportError, Exception) as e:
+                print(f"Local Tesseract error: {str(e)}")
+                extracted_text = ""
+        
+        # If local Tesseract failed or isn't available, try cloud OCR
+        if not extracted_text.strip() and self.CLOUD_OCR_ENABLED and not blank_page:
+            try:
+                print("Trying cloud OCR service")
+                # Save image to a temporary file for upload
+                buffered = io.BytesIO()
+                image.save(buffered, format="PNG")
+                img_str = base64.b64encode(buffered.getvalue()).decode()
+                
+                # Try to extract text using cloud OCR API
+                cloud_text, cloud_regions = self.extract_text_from_cloud(img_str)
+                if cloud_text:
+                    extracted_text = cloud_text
+                    text_regions = cloud_regions
+                    print("Cloud OCR extraction successful")
+                
+            except Exception as e:
+                print(f"Cloud OCR error: {str(e)}")
+                extracted_text = ""
+        
+        # If both methods failed, use simple OCR
+        if not extracted_text.strip() and not blank_page:
+            print("Falling back to simple OCR")
+            extracted_text = self.simple_ocr(image)
+            # No text regions for simple OCR
+        
+        return {
+            "extracted_text": extracted_text,
+            "enhanced_image": enhanced_image_base64,
+            "text_regions": text_regions,
+            "image_width": image_width,
+            "image_height": image_height,
+        }
+
     def extract_text_from_cloud(self, base64_image):
         """Extract text from image using a cloud OCR service"""
         try:
@@ -567,7 +781,7 @@ class OcrScannerTool(MiniTool):
                         # Extract text regions if available
                         text_regions = []
                         lines = text_overlay.get('Lines', [])
-                        for line in lines:
+                        for line_number, line in enumerate(lines):
                             words = line.get('Words', [])
                             for word in words:
                                 if 'WordText' in word and 'Left' in word and 'Top' in word and 'Width' in word and 'Height' in word:
@@ -576,7 +790,8 @@ class OcrScannerTool(MiniTool):
                                         'x': word['Left'],
                                         'y': word['Top'],
                                         'width': word['Width'],
-                                        'height': word['Height']
+                                        'height': word['Height'],
+                                        'line': line_number
                                     })
                         
                         return self.clean_text(text), text_regions
@@ -664,7 +879,7 @@ class OcrScannerTool(MiniTool):
         now = datetime.now()
         tokens_to_remove = []
 
-        for token, scan in self.pending_scans.items():
+        for token, scan in list(self.pending_scans.items()):
             # Remove scans older than 1 hour
             if now - scan["timestamp"] > timedelta(hours=1):
                 # Try to remove the temporary files
@@ -678,4 +893,28 @@ class OcrScannerTool(MiniTool):
 
         # Remove the processed tokens from pending_scans
         for token in tokens_to_remove:
-            self.pending_scans.pop(token, None) 
\ No newline at end of file
+            self.pending_scans.pop(token, None)
+
+
+def recognize_page(file_path, filename, index, sha256=None):
+    """Recognizes one page of an upload; runs in the page threads of the batch mode."""
+    tool = OcrScannerTool()
+    cache_key = result_cache.file_key("ocr_page", {"file_path": file_path, "sha256": sha256}, index,
+                                      ocr_batch.PDF_RENDER_DPI, tool.tesseract_available(), RECOGNITION_VERSION)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Die Seiten-Threads teilen sich die Plätze des Tesseract-Pools, statt dass jeder alle belegt
+    region_threads = max(1, tesseract_pool.size // ocr_batch.OCR_PAGE_WORKERS)
+    result = tool.recognize(ocr_batch.load_page(file_path, filename, index, OcrScannerTool.MAX_IMAGE_SIZE),
+                            preview=False, region_threads=region_threads)
+    # Lazy-Strings (z.B. von simple_ocr) auflösen, bevor das Ergebnis in den Cache kommt
+    result["extracted_text"] = str(result["extracted_text"])
+    if result["extracted_text"].strip():
+        result_cache.put(cache_key, result)
+    return result
+
+
+# Gemeinsamer Pool pro Prozess, lädt alle Sprachen der Tool-Auswahl
+tesseract_pool = TesseractPool(OcrScannerTool.LANGUAGES)
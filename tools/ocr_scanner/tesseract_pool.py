@@ -0,0 +1,192 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from host_slots import HostSlots
+
+# Höchstens so viele Erkennungen laufen gleichzeitig, über alle Prozesse des Hosts zusammen
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 1))
+# Sprache, mit der erkannt wird, wenn keine gewählt ist (wie zuvor der Standard von pytesseract)
+DEFAULT_LANGUAGE = "eng"
+
+_TSV_INT_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                    "left", "top", "width", "height")
+
+
+def parse_tsv(tsv):
+    """Turns Tesseract's TSV output into the dict of lists pytesseract returns for Output.DICT."""
+    data = {column: [] for column in _TSV_INT_COLUMNS + ("conf", "text")}
+    for line in tsv.splitlines():
+        fields = line.split("\t", 11)
+        if len(fields) < 11 or fields[0] == "level":
+            continue
+        fields += [""] * (12 - len(fields))
+        for column, value in zip(_TSV_INT_COLUMNS, fields):
+            data[column].append(int(value))
+        data["conf"].append(float(fields[10]))
+        data["text"].append(fields[11])
+    return data
+
+
+class TesseractPool:
+    """
+    Long-lived Tesseract instances for the OCR tool. With tesserocr, each
+    instance is a TessBaseAPI that loaded the traineddata of one language;
+    instances are kept per language, handed out to one thread at a time and
+    created on demand or by preload(). Recognition uses a single language,
+    DEFAULT_LANGUAGE unless another installed one is asked for, since every
+    additional language makes Tesseract slower. Without tesserocr, pytesseract
+    starts the tesseract program per call. Either way, at most `size`
+    recognitions run at once on the whole host: every call holds one of the
+    pool's lock-file slots, which web processes, job workers and page
+    processes share.
+    """
+
+    def __init__(self, languages, size=OCR_WORKERS, tesseract_cmd=None):
+        self.languages = list(languages)
+        self.size = size
+        self.tesseract_cmd = tesseract_cmd
+        self._tesserocr = None
+        self._slots = HostSlots("ocr", size)
+        self._reset_after_fork()
+        # TessBaseAPI-Instanzen lassen sich nicht in einen Kindprozess mitnehmen
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._idle = {}
+        self._created = {}
+        self._lock = threading.Lock()
+        self._installed = None
+
+    def has_tesserocr(self):
+        if self._tesserocr is None:
+            try:
+                import tesserocr  # noqa: F401
+                self._tesserocr = True
+            except ImportError:
+                self._tesserocr = False
+        return self._tesserocr
+
+    def _installed_languages(self, pytesseract=None):
+        with self._lock:
+            if self._installed is None:
+                try:
+                    if pytesseract is None:
+                        import tesserocr
+                        _path, installed = tesserocr.get_languages()
+                    else:
+                        installed = pytesseract.get_languages()
+                    self._installed = set(installed)
+                except Exception as e:
+                    print(f"Error listing the Tesseract languages: {str(e)}")
+                    self._installed = {DEFAULT_LANGUAGE}
+            return self._installed
+
+    def _language(self, language, pytesseract=None):
+        # Nicht installierte Sprachen fallen auf die Standardsprache zurück
+        if language in self.languages and language in self._installed_languages(pytesseract):
+            return language
+        return DEFAULT_LANGUAGE
+
+    def _create_api(self, language):
+        import tesserocr
+        print(f"Loading Tesseract ({language})")
+        return tesserocr.PyTessBaseAPI(lang=language)
+
+    @contextmanager
+    def _api(self, language):
+        language = self._language(language)
+        with self._slots.slot():
+            with self._lock:
+                idle = self._idle.setdefault(language, queue.LifoQueue())
+            try:
+                api = idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    self._created[language] = self._created.get(language, 0) + 1
+                try:
+                    api = self._create_api(language)
+                except Exception:
+                    with self._lock:
+                        self._created[language] -= 1
+                    raise
+            try:
+                yield api
+            finally:
+                idle.put(api)
+
+    def preload(self, languages=None):
+        """
+        Creates one instance per language ahead of the first request, e.g. when
+        a job worker starts. Defaults to all configured, installed languages.
+        """
+        if not self.has_tesserocr():
+            return
+        installed = self._installed_languages()
+        for language in languages or self.languages:
+            if language in installed:
+                with self._api(language):
+                    pass
+
+    def preload_from_env(self):
+        if os.environ.get("OCR_PRELOAD", "0") == "1":
+            self.preload()
+
+    def _pytesseract(self):
+        import pytesseract
+        if self.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        return pytesseract
+
+    def _recognize(self, api, image, psm):
+        previous = api.GetPageSegMode()
+        if psm is not None:
+            api.SetPageSegMode(psm)
+        try:
+            api.SetImage(image)
+            api.Recognize()
+        finally:
+            api.SetPageSegMode(previous)
+
+    def image_to_data(self, image, psm=None, language=DEFAULT_LANGUAGE):
+        """Words with confidence and bounding box, in the format of pytesseract's Output.DICT."""
+        if self.has_tesserocr():
+            with self._api(language) as api:
+                self._recognize(api, image, psm)
+                return parse_tsv(api.GetTSVText(0))
+
+        pytesseract = self._pytesseract()
+        config = f"--psm {psm}" if psm is not None else ""
+        with self._slots.slot():
+            return pytesseract.image_to_data(image, lang=self._language(language, pytesseract),
+                                             config=config, output_type=pytesseract.Output.DICT)
+
+    def image_to_string(self, image, psm=None, language=DEFAULT_LANGUAGE):
+        if self.has_tesserocr():
+            with self._api(language) as api:
+                self._recognize(api, image, psm)
+                return api.GetUTF8Text()
+
+        pytesseract = self._pytesseract()
+        config = f"--psm {psm}" if psm is not None else ""
+        with self._slots.slot():
+            return pytesseract.image_to_string(image, lang=self._language(language, pytesseract), config=config)
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "instances": dict(self._created)}
+
+    def close(self):
+        with self._lock:
+            idle = dict(self._idle)
+        for language, instances in idle.items():
+            while True:
+                try:
+                    api = instances.get_nowait()
+                except queue.Empty:
+                    break
+                api.End()
+                with self._lock:
+                    self._created[language] -= 1
@@ -1,9 +1,11 @@
 import os
 import tempfile
-import base64
+import uuid
 import json
 from flask_babel import lazy_gettext as _
 from tool_interface import MiniTool
+from artifact_store import artifact_store, artifact_url
+from result_cache import result_cache
 from PyPDF2 import PdfMerger
 
 
@@ -63,10 +65,7 @@ class PdfMergeTool(MiniTool):
                     return False
                 ordered_files.append(file_info)
 
-            # Begin merging
-            merger = PdfMerger()
             filenames = []
-
             for file_info in ordered_files:
                 file_path = file_info.get("file_path")
                 filename = file_info.get("filename")
@@ -75,19 +74,27 @@ class PdfMergeTool(MiniTool):
                     self.error_message = _("Eine oder mehrere Dateien sind ungültig oder nicht im PDF-Format.")
                     return False
 
-                merger.append(file_path)
                 filenames.append(filename)
 
             # Save merged file
             temp_dir = tempfile.gettempdir()
             merged_filename = "merged.pdf"
-            merged_path = os.path.join(temp_dir, merged_filename)
+            merged_path = os.path.join(temp_dir, f"merged_{uuid.uuid4().hex}.pdf")
+
+            # Die Reihenfolge gehört zum Schlüssel, die Dateinamen nicht
+            cache_key = result_cache.file_key("pdf_merge", ordered_files)
+            if not result_cache.get_file(cache_key, merged_path):
+                # Begin merging
+                merger = PdfMerger()
+                for file_info in ordered_files:
+                    merger.append(file_info["file_path"])
 
-            with open(merged_path, 'wb') as f_out:
-                merger.write(f_out)
-            merger.close()
+                with open(merged_path, 'wb') as f_out:
+                    merger.write(f_out)
+                merger.close()
+                result_cache.put_file(cache_key, merged_path)
 
-            base64_pdf = self._get_file_base64(merged_path)
+            merged_url = artifact_url(artifact_store.register(merged_path, merged_filename, "application/pdf"), download=True)
 
             self.output = f"""
             <div class="pdf-merge-tool">
@@ -96,7 +103,7 @@ class PdfMergeTool(MiniTool):
                 <ol>
                     {''.join(f"<li>{name}</li>" for name in filenames)}
                 </ol>
-                <a href="data:application/pdf;base64,{base64_pdf}" download="{merged_filename}" class="btn btn-success mt-3">
+                <a href="{merged_url}" download="{merged_filename}" class="btn btn-success mt-3">
                     📄 {self.download_button}
                 </a>
             </div>
@@ -106,8 +113,3 @@ class PdfMergeTool(MiniTool):
         except Exception as e:
             self.error_message = _("Fehler beim Zusammenführen:") + f" {str(e)}"
             return False
-
-
-    def _get_file_base64(self, file_path):
-        with open(file_path, "rb") as file:
-            return base64.b64encode(file.read()).decode("utf-8")
@@ -1,8 +1,10 @@
 import os
 import tempfile
-import base64
+import uuid
 from flask_babel import lazy_gettext as _
 from tool_interface import MiniTool
+from artifact_store import artifact_store, artifact_url
+from result_cache import result_cache
 from PyPDF2 import PdfReader, PdfWriter
 
 
@@ -61,43 +63,38 @@ class PdfSplitTool(MiniTool):
             filename = pdf_file_info["filename"]
             filename_base = os.path.splitext(filename)[0]
 
-            # Open the PDF file
-            with open(file_path, 'rb') as file:
-                pdf = PdfReader(file)
-                total_pages = len(pdf.pages)
-
-                if split_page > total_pages:
-                    self.error_message = _("Die Seitenzahl muss kleiner sein als die Gesamtseitenzahl ({0})").format(total_pages)
+            # Save the split PDFs to temporary files
+            temp_dir = tempfile.gettempdir()
+            part1_filename = f"{filename_base}_part1.pdf"
+            part2_filename = f"{filename_base}_part2.pdf"
+            # Eindeutige Pfade, damit gleichnamige Dateien verschiedener Benutzer sich nicht überschreiben
+            unique = uuid.uuid4().hex
+            part1_path = os.path.join(temp_dir, f"{unique}_{part1_filename}")
+            part2_path = os.path.join(temp_dir, f"{unique}_{part2_filename}")
+
+            # Dieselbe PDF an derselben Stelle geteilt: Teile aus dem Cache übernehmen
+            cache_key = result_cache.file_key("pdf_split", pdf_file_info, split_page)
+            part1_key = cache_key and cache_key + "_part1"
+            part2_key = cache_key and cache_key + "_part2"
+            total_pages = result_cache.get(cache_key)
+            cached = (total_pages is not None and result_cache.get_file(part1_key, part1_path)
+                      and result_cache.get_file(part2_key, part2_path))
+
+            if not cached:
+                # Ein schon verlinkter Teil teilt sich den Inhalt mit dem Cache und darf nicht überschrieben werden
+                for path in (part1_path, part2_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                total_pages = self._split(file_path, split_page, part1_path, part2_path)
+                if total_pages is None:
                     return False
+                result_cache.put_file(part1_key, part1_path)
+                result_cache.put_file(part2_key, part2_path)
+                result_cache.put(cache_key, total_pages)
 
-                # Create writers for the two parts
-                part1_writer = PdfWriter()
-                part2_writer = PdfWriter()
-
-                # Add pages to the first part (pages 0 to split_page-1)
-                for page_num in range(0, split_page - 1):
-                    part1_writer.add_page(pdf.pages[page_num])
-
-                # Add pages to the second part (pages split_page-1 to end)
-                for page_num in range(split_page - 1, total_pages):
-                    part2_writer.add_page(pdf.pages[page_num])
-
-                # Save the split PDFs to temporary files
-                temp_dir = tempfile.gettempdir()
-                part1_filename = f"{filename_base}_part1.pdf"
-                part2_filename = f"{filename_base}_part2.pdf"
-                part1_path = os.path.join(temp_dir, part1_filename)
-                part2_path = os.path.join(temp_dir, part2_filename)
-
-                with open(part1_path, 'wb') as output_file:
-                    part1_writer.write(output_file)
-
-                with open(part2_path, 'wb') as output_file:
-                    part2_writer.write(output_file)
-
-                # Convert the PDFs to base64 for download links
-                part1_base64 = self._get_file_base64(part1_path)
-                part2_base64 = self._get_file_base64(part2_path)
+            # Download links are served from /artifact/<token>
+            part1_url = artifact_url(artifact_store.register(part1_path, part1_filename, "application/pdf"), download=True)
+            part2_url = artifact_url(artifact_store.register(part2_path, part2_filename, "application/pdf"), download=True)
 
             # Create HTML output with download links
             result = f"""
@@ -126,7 +123,7 @@ class PdfSplitTool(MiniTool):
                                             </div>
                                             <div class="card-body">
                                                 <p class="mb-2">{self.part1_contains} {split_page - 1}</p>
-                                                <a href="data:application/pdf;base64,{part1_base64}" 
+                                                <a href="{part1_url}" 
                                                    download="{part1_filename}" 
                                                    class="btn btn-primary">
                                                    <i class="fas fa-download"></i> {self.part1_download}
@@ -141,7 +138,7 @@ class PdfSplitTool(MiniTool):
                                             </div>
                                             <div class="card-body">
                                                 <p class="mb-2">{self.part2_contains} {split_page} {self.part2_pages_text_end} {total_pages}</p>
-                                                <a href="data:application/pdf;base64,{part2_base64}" 
+                                                <a href="{part2_url}" 
                                                    download="{part2_filename}" 
                                                    class="btn btn-primary">
                                                    <i class="fas fa-download"></i> {self.part2_download}
@@ -164,7 +161,32 @@ class PdfSplitTool(MiniTool):
             self.error_message = _("Fehler beim Teilen der PDF-Datei:") + f" {str(e)}"
             return False
 
-    def _get_file_base64(self, file_path):
-        """Convert file to base64 string for embedding in HTML"""
-        with open(file_path, "rb") as file:
-            return base64.b64encode(file.read()).decode("utf-8")
\ No newline at end of file
+    def _split(self, file_path, split_page, part1_path, part2_path):
+        """Writes both parts and returns the total page count, or None if split_page is out of range."""
+        with open(file_path, 'rb') as file:
+            pdf = PdfReader(file)
+            total_pages = len(pdf.pages)
+
+            if split_page > total_pages:
+                self.error_message = _("Die Seitenzahl muss kleiner sein als die Gesamtseitenzahl ({0})").format(total_pages)
+                return None
+
+            # Create writers for the two parts
+            part1_writer = PdfWriter()
+            part2_writer = PdfWriter()
+
+            # Add pages to the first part (pages 0 to split_page-1)
+            for page_num in range(0, split_page - 1):
+                part1_writer.add_page(pdf.pages[page_num])
+
+            # Add pages to the second part (pages split_page-1 to end)
+            for page_num in range(split_page - 1, total_pages):
+                part2_writer.add_page(pdf.pages[page_num])
+
+            with open(part1_path, 'wb') as output_file:
+                part1_writer.write(output_file)
+
+            with open(part2_path, 'wb') as output_file:
+                part2_writer.write(output_file)
+
+        return total_pages
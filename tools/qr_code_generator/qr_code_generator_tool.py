@@ -1,9 +1,11 @@
 # python
 import os
+import uuid
 import tempfile
 import qrcode
 from flask_babel import lazy_gettext as _
 from tool_interface import MiniTool
+from artifact_store import artifact_store, artifact_url
 
 class QrCodeGeneratorTool(MiniTool):
     def __init__(self):
@@ -37,11 +39,11 @@ class QrCodeGeneratorTool(MiniTool):
 
             # Speicherung des Bildes im temporären Verzeichnis
             temp_dir = tempfile.gettempdir()
-            file_path = os.path.join(temp_dir, "qrcode.png")
+            file_path = os.path.join(temp_dir, f"qrcode_{uuid.uuid4().hex}.png")
             img.save(file_path)
+            image_token = artifact_store.register(file_path, "qrcode.png", "image/png")
 
             # Zusammenbau des HTML Ergebnisses mit Übersetzungen
-            image_base64 = self._get_image_base64(file_path)
             result = (
                 "<div class=\"qr-code-result\">"
                     "<div class=\"row\">"
@@ -51,10 +53,10 @@ class QrCodeGeneratorTool(MiniTool):
                                     "<h5 class=\"mb-0\">" + _(r"Ihr QR\-Code") + "</h5>"
                                 "</div>"
                                 "<div class=\"card-body text-center\">"
-                                    "<img src=\"data:image/png;base64," + image_base64 + 
+                                    "<img src=\"" + artifact_url(image_token) + 
                                     "\" alt=\"" + _(r"QR\-Code") + "\" class=\"img-fluid\">"
                                     "<div class=\"mt-3\">"
-                                        "<a href=\"data:image/png;base64," + image_base64 + 
+                                        "<a href=\"" + artifact_url(image_token, download=True) + 
                                         "\" download=\"qrcode.png\" class=\"fancy-button\">" + _(r"QR\-Code herunterladen") + "</a>"
                                     "</div>"
                                 "</div>"
@@ -70,9 +72,3 @@ class QrCodeGeneratorTool(MiniTool):
         except Exception as e:
             self.error_message = _(r"Fehler bei der QR\-Code Erstellung:") + " " + str(e)
             return False
-
-    def _get_image_base64(self, image_path):
-        """Convert image to base64 string for embedding in HTML"""
-        import base64
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
\ No newline at end of file
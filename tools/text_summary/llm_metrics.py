@@ -0,0 +1,57 @@
+import uuid
+from datetime import timedelta
+from token_store import TokenStore
+
+# Messwerte der letzten 24 Stunden; die Zusammenfassungen laufen in den Job-Workern,
+# daher liegen sie im TokenStore und nicht im Speicher eines Prozesses
+RETENTION = timedelta(hours=24)
+
+
+class LLMMetrics:
+    """
+    Queue wait, time to first token and generation speed of streamed
+    completions. The wait for a free Ollama slot is kept apart from the time
+    to first token, so a full queue doesn't look like a slow model. Every
+    completion is stored as its own entry, so concurrent jobs never overwrite
+    each other's measurements; stats() aggregates them per model.
+    """
+
+    def __init__(self, retention=RETENTION):
+        self.samples = TokenStore("llm_metrics", retention)
+
+    def record(self, model, ttft_seconds, tokens, generation_seconds, queue_seconds=0.0):
+        self.samples[str(uuid.uuid4())] = {
+            "model": model,
+            "queue_seconds": queue_seconds,
+            "ttft_seconds": ttft_seconds,
+            "tokens": tokens,
+            "generation_seconds": generation_seconds,
+        }
+
+    def stats(self):
+        """Returns the number of completions, mean queue wait, mean time to first token and tokens/s per model."""
+        per_model = {}
+        for _token, sample in self.samples.items():
+            model = per_model.setdefault(sample["model"], {"completions": 0, "queue_seconds": 0.0, "ttft_seconds": 0.0,
+                                                           "tokens": 0, "generation_seconds": 0.0})
+            model["completions"] += 1
+            # Ältere Messwerte kennen die Wartezeit noch nicht
+            model["queue_seconds"] += sample.get("queue_seconds", 0.0)
+            model["ttft_seconds"] += sample["ttft_seconds"]
+            model["tokens"] += sample["tokens"]
+            model["generation_seconds"] += sample["generation_seconds"]
+
+        return {
+            name: {
+                "completions": model["completions"],
+                "queue_seconds": round(model["queue_seconds"] / model["completions"], 3),
+                "ttft_seconds": round(model["ttft_seconds"] / model["completions"], 3),
+                "tokens_per_second": round(model["tokens"] / model["generation_seconds"], 1)
+                if model["generation_seconds"] > 0 else None,
+            }
+            for name, model in per_model.items()
+        }
+
+
+# Gemeinsame Instanz für Tool und /metrics
+llm_metrics = LLMMetrics()
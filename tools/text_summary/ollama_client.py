@@ -0,0 +1,195 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+import httpx
+
+from host_slots import HostSlots, SlotTimeout
+
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
+# Sollte OLLAMA_NUM_PARALLEL des Ollama-Servers entsprechen, mehr Anfragen würden dort nur warten
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+# Anfragen, die auf einen freien Platz warten dürfen, bevor neue abgewiesen werden
+OLLAMA_MAX_QUEUE = int(os.environ.get("OLLAMA_MAX_QUEUE", 32))
+OLLAMA_QUEUE_TIMEOUT_SECONDS = int(os.environ.get("OLLAMA_QUEUE_TIMEOUT_SECONDS", 600))
+# So lange hält Ollama ein Modell nach der letzten Anfrage im Speicher
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+KEEP_ALIVE_PING_SECONDS = int(os.environ.get("OLLAMA_KEEP_ALIVE_PING_SECONDS", 240))
+
+CONNECT_TIMEOUT_SECONDS = 5
+# Lange Texte auf der CPU können mehrere Minuten bis zum ersten Token brauchen
+READ_TIMEOUT_SECONDS = 600
+# Kurz nachfassen, falls ein freier Warteplatz gerade von in_use() geprüft wird
+QUEUE_ENTRY_SECONDS = 0.1
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaBusy(OllamaError):
+    """Raised instead of queueing a request when too many requests are already waiting."""
+    pass
+
+
+class OllamaClient:
+    """
+    Shared client for the Ollama HTTP API. Connections are pooled and kept
+    alive between requests. At most max_parallel requests run at the same
+    time. Further requests wait, and once max_queue of them are waiting, new
+    ones fail with OllamaBusy. Both limits are lock-file slots, so they hold
+    for all web processes and job workers of the host together, and the slot
+    of a crashed process is freed with it.
+    """
+
+    def __init__(self, base_url=OLLAMA_BASE_URL, max_parallel=OLLAMA_NUM_PARALLEL, max_queue=OLLAMA_MAX_QUEUE,
+                 queue_timeout=OLLAMA_QUEUE_TIMEOUT_SECONDS, keep_alive=OLLAMA_KEEP_ALIVE):
+        self.base_url = base_url
+        self.max_parallel = max_parallel
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.keep_alive = keep_alive
+        self._slots = HostSlots("ollama", max_parallel)
+        self._queue = HostSlots("ollama_queue", max_queue)
+        self._http = None
+        self._http_lock = threading.Lock()
+        self._pinger = None
+        self._stop_pinging = threading.Event()
+        # Gepoolte Verbindungen dürfen nicht mit dem Kindprozess geteilt werden
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._http = None
+        self._http_lock = threading.Lock()
+        self._pinger = None
+        self._stop_pinging = threading.Event()
+
+    @property
+    def http(self):
+        with self._http_lock:
+            if self._http is None:
+                self._http = httpx.Client(
+                    base_url=self.base_url,
+                    limits=httpx.Limits(max_connections=self.max_parallel + 1,
+                                        max_keepalive_connections=self.max_parallel + 1),
+                    timeout=httpx.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                )
+            return self._http
+
+    def waiting(self):
+        """Number of requests waiting for a free slot."""
+        return self._queue.in_use()
+
+    @contextmanager
+    def _slot(self):
+        try:
+            ticket = self._queue.acquire(timeout=QUEUE_ENTRY_SECONDS)
+        except SlotTimeout:
+            raise OllamaBusy(f"{self.max_queue} requests are already waiting for Ollama")
+        try:
+            slot = self._slots.acquire(timeout=self.queue_timeout)
+        except SlotTimeout:
+            raise OllamaBusy(f"No Ollama slot became free within {self.queue_timeout} seconds")
+        finally:
+            self._queue.release(ticket)
+        try:
+            yield
+        finally:
+            self._slots.release(slot)
+
+    def _payload(self, model, prompt, temperature, stream):
+        return {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": temperature},
+        }
+
+    def _raise_for_status(self, response):
+        if response.status_code < 400:
+            return
+        try:
+            message = json.loads(response.read())["error"]
+        except (ValueError, KeyError, TypeError):
+            message = f"Ollama answered with HTTP {response.status_code}"
+        raise OllamaError(message)
+
+    def chat(self, model, prompt, temperature=0):
+        """Returns the complete answer of the model to prompt."""
+        with self._slot():
+            try:
+                response = self.http.post("/api/chat", json=self._payload(model, prompt, temperature, False))
+            except httpx.HTTPError as e:
+                raise OllamaError(f"Ollama is not reachable at {self.base_url}: {str(e)}")
+            self._raise_for_status(response)
+            return response.json()["message"]["content"]
+
+    def stream_chat(self, model, prompt, temperature=0, on_slot=None):
+        """
+        Yields the messages of a streamed answer as Ollama sends them. The last
+        one has done=True and carries eval_count and eval_duration. on_slot is
+        called once the request got its slot and is sent.
+        """
+        with self._slot():
+            if on_slot:
+                on_slot()
+            try:
+                with self.http.stream("POST", "/api/chat",
+                                      json=self._payload(model, prompt, temperature, True)) as response:
+                    self._raise_for_status(response)
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        message = json.loads(line)
+                        if "error" in message:
+                            raise OllamaError(message["error"])
+                        yield message
+            except httpx.HTTPError as e:
+                raise OllamaError(f"Ollama is not reachable at {self.base_url}: {str(e)}")
+
+    def ping(self, model):
+        """Loads the model, or keeps it loaded for another keep_alive period, without generating anything."""
+        try:
+            response = self.http.post("/api/generate", json={"model": model, "keep_alive": self.keep_alive})
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama is not reachable at {self.base_url}: {str(e)}")
+        self._raise_for_status(response)
+
+    def start_keep_alive(self, models, interval=KEEP_ALIVE_PING_SECONDS):
+        """Pings the models in a background thread, so Ollama does not unload them between requests."""
+        if not models or self._pinger is not None:
+            return
+
+        def ping_forever():
+            while not self._stop_pinging.is_set():
+                for model in models:
+                    try:
+                        self.ping(model)
+                    except OllamaError as e:
+                        print(f"Keep-alive ping for {model} failed: {str(e)}")
+                self._stop_pinging.wait(interval)
+
+        self._pinger = threading.Thread(target=ping_forever, name="ollama-keep-alive", daemon=True)
+        self._pinger.start()
+
+    def keep_alive_from_env(self):
+        """Starts the keep-alive pings for the models listed in OLLAMA_KEEP_ALIVE_MODELS (comma-separated)."""
+        models = [m.strip() for m in os.environ.get("OLLAMA_KEEP_ALIVE_MODELS", "").split(",") if m.strip()]
+        self.start_keep_alive(models)
+
+    def close(self):
+        self._stop_pinging.set()
+        if self._pinger is not None:
+            self._pinger.join()
+            self._pinger = None
+        with self._http_lock:
+            if self._http is not None:
+                self._http.close()
+                self._http = None
+
+
+# Gemeinsame Instanz pro Prozess, die Grenzen gelten über die Sperrdateien für den ganzen Host
+ollama_client = OllamaClient()
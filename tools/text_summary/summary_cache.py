@@ -0,0 +1,113 @@
+import os
+import hashlib
+import unicodedata
+from result_cache import result_cache
+
+# Maximaler Hamming-Abstand der SimHashes, ab dem ein Text als leicht bearbeitete Fassung gilt (0 = aus)
+NEAR_DUPLICATE_BITS = int(os.environ.get("SUMMARY_NEAR_DUPLICATE_BITS", 3))
+
+SIMHASH_BITS = 64
+# 4 Bänder à 16 Bit: bei höchstens 3 abweichenden Bits stimmt mindestens ein Band exakt überein
+BANDS = 4
+SHINGLE_WORDS = 3
+# Kurze Texte ändern sich durch eine Bearbeitung zu stark, als dass ihr SimHash aussagekräftig wäre
+MIN_SHINGLES = 20
+# Auch ein ähnlicher Text muss ungefähr gleich lang sein
+MAX_LENGTH_DIFFERENCE = 0.1
+MAX_BUCKET_ENTRIES = 64
+
+
+def normalize_text(text):
+    """Unicode compatibility form, case-folded, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def _shingles(words):
+    if len(words) < SHINGLE_WORDS:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+
+def simhash(normalized_text):
+    """64-bit SimHash over word shingles of an already normalized text."""
+    weights = [0] * SIMHASH_BITS
+    for shingle in _shingles(normalized_text.split(" ")):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _bands(fingerprint):
+    width = SIMHASH_BITS // BANDS
+    return [(i, fingerprint >> (i * width) & ((1 << width) - 1)) for i in range(BANDS)]
+
+
+class SummaryCache:
+    """
+    Finished summaries keyed by the normalized text, language and model, so
+    resubmissions that differ only in case, whitespace or Unicode form are
+    answered from the cache. With near-duplicate detection, texts whose
+    SimHash differs in at most max_distance bits from a cached one (e.g. a
+    fixed typo) get that summary as well; they are found through an index of
+    SimHash bands. Summaries and index live in the result cache, whose size
+    limit and LRU eviction also bound this cache.
+    """
+
+    def __init__(self, cache=result_cache, max_distance=NEAR_DUPLICATE_BITS):
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance must be smaller than the number of bands ({BANDS})")
+        self.cache = cache
+        self.max_distance = max_distance
+
+    def _bucket_key(self, language, model, band):
+        return self.cache.key("summary_simhash", language, model, *band)
+
+    def _fingerprint(self, normalized):
+        if self.max_distance <= 0 or len(_shingles(normalized.split(" "))) < MIN_SHINGLES:
+            return None
+        return simhash(normalized)
+
+    def get(self, text, language, model):
+        """Returns the summary of the same or a nearly identical text, or None."""
+        normalized = normalize_text(text)
+        summary = self.cache.get(self.cache.key("summary", normalized, language, model))
+        if summary is not None:
+            return summary
+
+        fingerprint = self._fingerprint(normalized)
+        if fingerprint is None:
+            return None
+        for band in _bands(fingerprint):
+            for other, key, length in self.cache.get(self._bucket_key(language, model, band), []):
+                if hamming_distance(fingerprint, other) > self.max_distance:
+                    continue
+                if abs(length - len(normalized)) > MAX_LENGTH_DIFFERENCE * len(normalized):
+                    continue
+                summary = self.cache.get(key)
+                if summary is not None:
+                    return summary
+        return None
+
+    def put(self, text, language, model, summary):
+        normalized = normalize_text(text)
+        key = self.cache.key("summary", normalized, language, model)
+        self.cache.put(key, summary)
+
+        fingerprint = self._fingerprint(normalized)
+        if fingerprint is None:
+            return
+        # Gleichzeitige Schreiber können sich einen Eintrag überschreiben, das kostet nur einen Treffer
+        for band in _bands(fingerprint):
+            bucket_key = self._bucket_key(language, model, band)
+            bucket = [entry for entry in self.cache.get(bucket_key, []) if entry[1] != key]
+            bucket.append((fingerprint, key, len(normalized)))
+            self.cache.put(bucket_key, bucket[-MAX_BUCKET_ENTRIES:])
+
+
+# Gemeinsame Instanz für das Tool
+summary_cache = SummaryCache()
@@ -1,10 +1,18 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from tool_interface import MiniTool
+from result_cache import result_cache
+from tools.text_summary.llm_metrics import llm_metrics
+from tools.text_summary.ollama_client import ollama_client, OllamaBusy
+from tools.text_summary.summary_cache import summary_cache
 from pydantic import ConfigDict
 from flask_babel import lazy_gettext as _
 
 def get_api_base_url():
-    """Get API base URL. Uses the Docker service name 'ollama' to connect to the Ollama server."""
-    return "http://127.0.0.1:11434"
+    """Get API base URL. Configured with OLLAMA_BASE_URL, e.g. http://ollama:11434 for the Docker service."""
+    return ollama_client.base_url
 
 METAPROMPT_EN = """
 Summarize the following text. The Summary must be in English. Be short, concise and truthful. Immediately respond with the contents of your summary:
@@ -14,11 +22,98 @@ METAPROMPT_DE = """
 Fasse den folgenden Text zusammen. Die Zusammenfassung muss auf Deutsch sein. Halte dich kurz und wahrheitsgetrau. Antworte sofort mit dem Inhalt der Zusammenfassung:
 """
 
+# Längere Texte werden in Abschnitten zusammengefasst (Map-Reduce)
+REDUCE_METAPROMPT_EN = """
+The following are summaries of consecutive parts of one document. Combine them into one summary of the whole document. The Summary must be in English. Be short, concise and truthful. Immediately respond with the contents of your summary:
+"""
+
+REDUCE_METAPROMPT_DE = """
+Im Folgenden stehen Zusammenfassungen aufeinanderfolgender Teile eines Dokuments. Fasse sie zu einer Zusammenfassung des gesamten Dokuments zusammen. Die Zusammenfassung muss auf Deutsch sein. Halte dich kurz und wahrheitsgetrau. Antworte sofort mit dem Inhalt der Zusammenfassung:
+"""
+
+# Bis zu dieser Länge wird der Text in einem Aufruf zusammengefasst
 MAX_CHARS = 8_000
+# Obergrenze für Texte, die abschnittsweise zusammengefasst werden (ca. 100+ Seiten)
+MAX_DOCUMENT_CHARS = 500_000
+
+# Grobe Schätzung, die ohne Tokenizer des jeweiligen Modells auskommt
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 2000))
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", 4))
+# Höchstzahl der Ebenen, auf denen Abschnitte zusammengefasst werden, bevor gekürzt wird
+MAX_REDUCE_LEVELS = 3
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_into_chunks(text, max_tokens=None):
+    """
+    Splits text into chunks of at most max_tokens (estimated), preferably at
+    paragraph boundaries, then at sentence ends and finally at spaces.
+    """
+    max_chars = (max_tokens or CHUNK_TOKENS) * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            pieces.append(sentence)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def shorten_evenly(summaries, max_tokens=None):
+    """
+    Joins the summaries into a text of at most max_tokens (estimated). Each
+    summary is shortened in proportion to its length, cut at a space, so every
+    part of the document stays represented instead of only the first ones.
+    """
+    max_chars = (max_tokens or CHUNK_TOKENS) * CHARS_PER_TOKEN
+    separator = "\n\n"
+    combined = separator.join(summaries)
+    if len(combined) <= max_chars:
+        return combined
+
+    # Platz für die Trennzeichen und die Auslassungszeichen abziehen
+    available = max(0, max_chars - len(separator) * (len(summaries) - 1) - len(summaries))
+    total = sum(len(summary) for summary in summaries)
+    shortened = []
+    for summary in summaries:
+        share = len(summary) * available // total
+        if len(summary) <= share:
+            shortened.append(summary)
+            continue
+        cut = summary.rfind(" ", 0, share + 1)
+        cut = cut if cut > 0 else share
+        shortened.append(summary[:cut].rstrip() + "…")
+    return separator.join(shortened)
 
 
 class TextSummaryTool(MiniTool):
     model_config = ConfigDict(arbitrary_types_allowed=True)
+    reports_progress = True
 
     def __init__(self):
         super().__init__(_("Text zusammenfassen Tool"), "TextSummaryTool")
@@ -37,8 +132,6 @@ class TextSummaryTool(MiniTool):
         
     def execute_tool(self, input_params: dict) -> bool:
         try:
-            from litellm import completion
-            
             self.error_message = ""
             
             text_to_summarize = input_params.get(_("Text"), "")
@@ -46,29 +139,117 @@ class TextSummaryTool(MiniTool):
                 self.error_message = _("Der Eingabetext ist leer oder ungültig.")
                 return False
             
-            if len(text_to_summarize) > MAX_CHARS:
+            if len(text_to_summarize) > MAX_DOCUMENT_CHARS:
                 self.error_message = _("Der Eingabetext is zu lang.")
                 return False
             
             language = input_params.get(_("Sprache"), "de")
             model = input_params.get(_("Model"), "gemma3:4b-it-qat")
             
-            meta_prompt = METAPROMPT_DE if language == "de" else METAPROMPT_EN
+            # Derselbe oder ein nur leicht bearbeiteter Text wurde schon zusammengefasst
+            summary = summary_cache.get(text_to_summarize, language, model)
+            if summary is not None:
+                self.output = summary
+                return True
 
-            prompt = meta_prompt + " \n " + text_to_summarize
-            
-            print("trying to connect to ollama backend with url " + get_api_base_url())
-            
-            response = completion(
-                model=f"ollama/{model}",
-                messages=[{ "content": prompt,"role": "user"}],
-                api_base=get_api_base_url()
-            )
+            meta_prompt = METAPROMPT_DE if language == "de" else METAPROMPT_EN
 
-            summary = response.choices[0].message.content
+            if len(text_to_summarize) <= MAX_CHARS:
+                summary = self._complete(model, meta_prompt + " \n " + text_to_summarize, stream=True)
+            else:
+                summary = self._map_reduce(model, language, text_to_summarize)
+            summary_cache.put(text_to_summarize, language, model, summary)
             self.output = summary
             return True
+        except OllamaBusy as e:
+            print(str(e))
+            self.error_message = _("Das Sprachmodell ist gerade ausgelastet. Bitte versuche es später erneut.")
+            return False
         except Exception as e:
             print(str(e))
             self.error_message = str(e)
             return False
+
+    def _complete(self, model, prompt, stream=False):
+        """
+        Sends one prompt to the LLM and returns the answer. With stream=True
+        the tokens are reported as progress events while they are generated.
+        """
+        # Mit temperature=0 ist die Antwort deterministisch und kann wiederverwendet werden
+        cache_key = result_cache.key("text_summary", model, prompt)
+        summary = result_cache.get(cache_key)
+        if summary is not None:
+            return summary
+
+        print("trying to connect to ollama backend with url " + get_api_base_url())
+
+        # Streamen lohnt sich nur, wenn jemand zuschaut (als Hintergrund-Job im Browser)
+        stream = stream and self.progress_callback is not None
+
+        if stream:
+            summary = self._read_stream(model, prompt)
+        else:
+            summary = ollama_client.chat(model, prompt, temperature=0)
+        result_cache.put(cache_key, summary)
+        return summary
+
+    def _read_stream(self, model, prompt):
+        """
+        Streams the answer to prompt, reports its tokens and records the wait
+        for a free Ollama slot, time to first token and tokens/s for the model.
+        """
+        queued = time.perf_counter()
+        # Die Zeit bis zum ersten Token zählt erst, wenn die Anfrage ihren Platz hat
+        timing = {}
+        messages = ollama_client.stream_chat(model, prompt, temperature=0,
+                                             on_slot=lambda: timing.setdefault("start", time.perf_counter()))
+        first_token = None
+        parts = []
+        for message in messages:
+            text = message.get("message", {}).get("content")
+            if text:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                parts.append(text)
+                self.report_progress({"type": "token", "text": text})
+            if message.get("done") and first_token is not None:
+                # Ollama misst Tokenanzahl und Generierungsdauer (in Nanosekunden) selbst
+                start = timing.get("start", queued)
+                llm_metrics.record(model, round(first_token - start, 3), message.get("eval_count", len(parts)),
+                                   round(message.get("eval_duration", 0) / 1e9, 3), round(start - queued, 3))
+        return "".join(parts)
+
+    def _map_reduce(self, model, language, text):
+        """
+        Summarizes the chunks of a long text concurrently, then summarizes the
+        summaries, repeating until they fit into a single chunk. After
+        MAX_REDUCE_LEVELS levels, or once a level no longer gets shorter, each
+        summary is shortened so that all of them fit into the final call.
+        """
+        meta_prompt = METAPROMPT_DE if language == "de" else METAPROMPT_EN
+        reduce_prompt = REDUCE_METAPROMPT_DE if language == "de" else REDUCE_METAPROMPT_EN
+
+        chunks = split_into_chunks(text)
+        prompt = meta_prompt
+        previous_length = len(text)
+        level = 1
+        with ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as pool:
+            while True:
+                summaries = list(pool.map(lambda chunk: self._complete(model, prompt + " \n " + chunk), chunks))
+                combined = "\n\n".join(summaries)
+                if estimate_tokens(combined) <= CHUNK_TOKENS or len(summaries) == 1:
+                    break
+                # Ein Modell, das nicht kürzt, würde sonst endlos weitere Ebenen erzeugen
+                if level >= MAX_REDUCE_LEVELS or len(combined) >= previous_length:
+                    break
+                # Die Zusammenfassungen sind immer noch zu lang für einen Aufruf: eine Ebene höher weitermachen
+                chunks = split_into_chunks(combined)
+                prompt = reduce_prompt
+                previous_length = len(combined)
+                level += 1
+
+        if len(summaries) == 1:
+            return summaries[0]
+        combined = shorten_evenly(summaries)
+        # Nur der letzte Aufruf wird gestreamt, die Abschnitte laufen parallel und würden sich vermischen
+        return self._complete(model, reduce_prompt + " \n " + combined, stream=True)
@@ -0,0 +1,162 @@
+import os
+import json
+import shutil
+import threading
+import subprocess
+from abc import ABC, abstractmethod
+
+XTTS_MODEL = "tts_models/multilingual/multi-dataset/xtts_v2"
+DEFAULT_SPEAKER = "Ana Florence"
+
+# Piper ist kein Debian-Paket (dort heißt ein anderes Programm so), daher Pfad und Stimmen konfigurierbar
+PIPER_BINARY = os.environ.get("PIPER_BINARY", "piper")
+PIPER_VOICE_DIR = os.environ.get("PIPER_VOICE_DIR", "/opt/piper/voices")
+PIPER_VOICES = {
+    "de": os.environ.get("PIPER_VOICE_DE", "de_DE-thorsten-medium.onnx"),
+    "en": os.environ.get("PIPER_VOICE_EN", "en_US-lessac-medium.onnx"),
+}
+
+
+class SynthesisError(Exception):
+    pass
+
+
+class TTSEngine(ABC):
+    """
+    A speech synthesis backend. synthesize() writes one sentence as WAV file;
+    the tool concatenates the sentences and calls it from up to
+    `parallelism` threads at once.
+    """
+
+    name = ""
+    model_id = ""
+    parallelism = 1
+
+    @abstractmethod
+    def synthesize(self, text, language, path):
+        pass
+
+    def voice(self, language):
+        """Identifies the voice used for a language, part of the phrase cache key."""
+        return language
+
+    def is_available(self, language):
+        return True
+
+    def is_busy(self):
+        """True if a request would have to wait for other requests first."""
+        return False
+
+
+class XttsEngine(TTSEngine):
+    """
+    XTTS v2 model loaded once per replica of the synthesis worker. The
+    conditioning latents of the given speakers are computed while loading,
+    so the first request doesn't pay for them; other speakers are computed
+    on first use and reused for every later request.
+    """
+
+    name = "xtts"
+    model_id = XTTS_MODEL
+
+    def __init__(self, speakers=(DEFAULT_SPEAKER,)):
+        from TTS.api import TTS
+        self.tts = TTS(XTTS_MODEL, gpu=False)
+        self.model = self.tts.synthesizer.tts_model
+        self._latents = {}
+        for speaker in speakers:
+            self.latents(speaker)
+
+    def latents(self, speaker):
+        if speaker not in self._latents:
+            # Eingebaute Sprecher bringen ihre Latents mit, eigene werden aus Referenzaudio berechnet
+            if speaker in self.model.speaker_manager.speakers:
+                entry = self.model.speaker_manager.speakers[speaker]
+                self._latents[speaker] = (entry["gpt_cond_latent"], entry["speaker_embedding"])
+            else:
+                self._latents[speaker] = self.model.get_conditioning_latents(audio_path=[speaker])
+        return self._latents[speaker]
+
+    def voice(self, language):
+        return DEFAULT_SPEAKER
+
+    def synthesize(self, text, language, path, speaker=DEFAULT_SPEAKER):
+        gpt_cond_latent, speaker_embedding = self.latents(speaker)
+        result = self.model.inference(text, language, gpt_cond_latent, speaker_embedding,
+                                      enable_text_splitting=True)
+        self.tts.synthesizer.save_wav(wav=result["wav"], path=path)
+
+
+class PiperEngine(TTSEngine):
+    """
+    Piper voices run in real time on a CPU. One piper process per language
+    stays resident and receives the sentences as JSON lines, so the voice
+    model is loaded only once per process.
+    """
+
+    name = "piper"
+    model_id = "piper"
+
+    def __init__(self, binary=PIPER_BINARY, voice_dir=PIPER_VOICE_DIR, voices=None):
+        self.binary = binary
+        self.voice_dir = voice_dir
+        self.voices = PIPER_VOICES if voices is None else voices
+        self._processes = {}
+        self._lock = threading.Lock()
+        # Die Pipes gehören dem Elternprozess, Job-Worker starten ihre eigenen
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._processes = {}
+        self._lock = threading.Lock()
+
+    def voice(self, language):
+        return self.voices.get(language)
+
+    def _model_path(self, language):
+        voice = self.voice(language)
+        return os.path.join(self.voice_dir, voice) if voice else None
+
+    def is_available(self, language):
+        model_path = self._model_path(language)
+        return shutil.which(self.binary) is not None and model_path is not None and os.path.exists(model_path)
+
+    def _process(self, language):
+        process = self._processes.get(language)
+        if process is None or process.poll() is not None:
+            model_path = self._model_path(language)
+            if model_path is None:
+                raise SynthesisError(f"No Piper voice is configured for language {language}")
+            try:
+                process = subprocess.Popen([self.binary, "--model", model_path, "--json-input"],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                           stderr=subprocess.DEVNULL, text=True, bufsize=1)
+            except OSError as e:
+                raise SynthesisError(f"Piper could not be started ({self.binary}): {str(e)}")
+            self._processes[language] = process
+        return process
+
+    def synthesize(self, text, language, path):
+        with self._lock:
+            process = self._process(language)
+            try:
+                process.stdin.write(json.dumps({"text": text, "output_file": path}) + "\n")
+                process.stdin.flush()
+                # Piper meldet den Pfad, sobald die Datei geschrieben ist
+                finished = process.stdout.readline()
+            except OSError as e:
+                raise SynthesisError(f"Piper failed: {str(e)}")
+        if not finished:
+            raise SynthesisError("Piper exited unexpectedly.")
+
+    def close(self):
+        with self._lock:
+            for process in self._processes.values():
+                process.stdin.close()
+                process.wait()
+            self._processes = {}
+
+
+# Gemeinsame Instanz pro Prozess
+piper_engine = PiperEngine()
@@ -0,0 +1,160 @@
+import re
+import wave
+import struct
+
+import ffmpeg
+
+# XTTS warnt ab ca. 250 Zeichen pro Satz und schneidet die Aussprache dann ab
+MAX_SENTENCE_CHARS = 250
+
+# Platzhalter-Größe im WAV-Header, solange noch nicht feststeht, wie lang die Datei wird
+_STREAMING_DATA_SIZE = 0xFFFFFFFF - 36
+
+# Ausgabeformate; komprimierte werden von ffmpeg während der Synthese kodiert.
+# Alle Container lassen sich abspielen, bevor die Datei vollständig ist.
+AUDIO_FORMATS = {
+    "wav": {"extension": "wav", "mimetype": "audio/wav"},
+    "opus": {"extension": "ogg", "mimetype": "audio/ogg", "codec": "libopus", "bitrate": "32k", "container": "ogg"},
+    "mp3": {"extension": "mp3", "mimetype": "audio/mpeg", "codec": "libmp3lame", "bitrate": "64k", "container": "mp3"},
+    "aac": {"extension": "aac", "mimetype": "audio/aac", "codec": "aac", "bitrate": "64k", "container": "adts"},
+}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\s*\n\s*")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def _split_long(sentence, max_chars):
+    """Splits a sentence that is too long at commas, or at word boundaries as a last resort."""
+    parts = []
+    current = ""
+    for piece in _CLAUSE_END.split(sentence):
+        words = piece.split() if len(piece) > max_chars else [piece]
+        for word in words:
+            candidate = f"{current} {word}" if current else word
+            if len(candidate) <= max_chars or not current:
+                current = candidate
+            else:
+                parts.append(current)
+                current = word
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_sentences(text, max_chars=MAX_SENTENCE_CHARS):
+    """Splits text into sentences of at most max_chars characters (single words may be longer)."""
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        if len(sentence) > max_chars:
+            sentences.extend(_split_long(sentence, max_chars))
+        else:
+            sentences.append(sentence)
+    return sentences
+
+
+def _read_wav(wav_path):
+    with wave.open(wav_path, "rb") as part:
+        params = (part.getnchannels(), part.getsampwidth(), part.getframerate())
+        return params, part.readframes(part.getnframes())
+
+
+def _wav_header(channels, sample_width, frame_rate, data_size):
+    block_align = channels * sample_width
+    return struct.pack("<4sI4s4sIHHIIHH4sI",
+                       b"RIFF", 36 + data_size, b"WAVE",
+                       b"fmt ", 16, 1, channels, frame_rate, frame_rate * block_align, block_align, sample_width * 8,
+                       b"data", data_size)
+
+
+class ProgressiveWavWriter:
+    """
+    Concatenates WAV files into one PCM WAV file that can be played while it
+    is still being written. The header first announces the maximum length,
+    close() patches in the real one so the finished file is seekable.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.params = None
+        self.data_size = 0
+        self._file = None
+
+    def append(self, wav_path):
+        params, frames = _read_wav(wav_path)
+
+        if self._file is None:
+            self.params = params
+            self._file = open(self.path, "wb")
+            self._file.write(_wav_header(*params, _STREAMING_DATA_SIZE))
+        elif params != self.params:
+            raise ValueError(f"WAV parameters changed from {self.params} to {params}")
+
+        self._file.write(frames)
+        self.data_size += len(frames)
+        # Sofort sichtbar machen, die Datei wird parallel an den Browser gestreamt
+        self._file.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._file.write(_wav_header(*self.params, self.data_size))
+        self._file.close()
+        self._file = None
+
+
+class StreamingEncoder:
+    """
+    Same interface as ProgressiveWavWriter, but pipes the PCM data of the
+    appended WAV files into ffmpeg, which writes the compressed file while
+    the synthesis is still running.
+    """
+
+    def __init__(self, path, audio_format):
+        self.path = path
+        self.encoding = AUDIO_FORMATS[audio_format]
+        self.params = None
+        self._process = None
+
+    def append(self, wav_path):
+        params, frames = _read_wav(wav_path)
+
+        if self._process is None:
+            self.params = params
+            channels, sample_width, frame_rate = params
+            sample_format = "u8" if sample_width == 1 else f"s{sample_width * 8}le"
+            # Datei vorab anlegen, damit sie sofort als Artefakt ausgeliefert werden kann
+            open(self.path, "wb").close()
+            self._process = (
+                ffmpeg
+                .input("pipe:", format=sample_format, ac=channels, ar=frame_rate)
+                .output(self.path, acodec=self.encoding["codec"], audio_bitrate=self.encoding["bitrate"],
+                        format=self.encoding["container"], flush_packets=1)
+                .global_args("-loglevel", "error")
+                .overwrite_output()
+                .run_async(pipe_stdin=True, pipe_stderr=True)
+            )
+        elif params != self.params:
+            raise ValueError(f"WAV parameters changed from {self.params} to {params}")
+
+        self._process.stdin.write(frames)
+        self._process.stdin.flush()
+
+    def close(self):
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        process.stdin.close()
+        error = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {error.decode('utf-8', errors='replace').strip()}")
+
+
+def open_audio_writer(path, audio_format="wav"):
+    """Returns the writer that produces the given format from appended WAV files."""
+    if audio_format == "wav":
+        return ProgressiveWavWriter(path)
+    return StreamingEncoder(path, audio_format)
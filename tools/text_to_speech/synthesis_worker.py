@@ -0,0 +1,298 @@
+import os
+import sys
+import time
+import fcntl
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+from tools.text_to_speech.engines import TTSEngine, XttsEngine, SynthesisError, DEFAULT_SPEAKER, XTTS_MODEL
+
+# Unix-Socket des Synthese-Workers, alle Webprozesse und Job-Worker des Hosts nutzen denselben
+ADDRESS = os.environ.get("TTS_WORKER_SOCKET") or os.path.join(tempfile.gettempdir(), "werkzeugkaestchen_tts.sock")
+# Anzahl der Prozesse, die jeweils ein XTTS-Modell im Speicher halten
+REPLICAS = int(os.environ.get("TTS_REPLICAS", 1))
+
+# Wartende Anfragen, bis ein Replikat frei wird
+BACKLOG = 64
+START_TIMEOUT_SECONDS = 30
+SUPERVISE_INTERVAL_SECONDS = 1
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _authkey(address):
+    """Shared secret of server and clients, stored next to the socket and readable only by this user."""
+    key_path = address + ".key"
+    try:
+        with open(key_path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    # Erst vollständig schreiben, dann per Link veröffentlichen: andere Prozesse sehen nie eine leere Datei
+    key = os.urandom(32)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(key_path) or ".", suffix=".key.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        try:
+            os.link(temp_path, key_path)
+        except FileExistsError:
+            # Ein anderer Prozess war schneller, dessen Schlüssel gilt
+            with open(key_path, "rb") as f:
+                return f.read()
+    finally:
+        os.remove(temp_path)
+    return key
+
+
+def _is_listening(address):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(address)
+        return True
+    except OSError:
+        return False
+
+
+def _status_address(address):
+    return address + ".status"
+
+
+def _serve(listener, loader, busy, index):
+    """Replica loop: loads the engine once, then answers one request per connection."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        engine = loader()
+        load_error = None
+    except Exception as e:
+        engine = None
+        load_error = str(e)
+        print(f"Error loading TTS model: {load_error}")
+
+    while True:
+        try:
+            # Alle Replikate warten am selben Socket, der Kernel verteilt die Verbindungen
+            connection = listener.accept()
+        except Exception as e:
+            print(f"Error accepting TTS request: {str(e)}")
+            continue
+
+        with connection:
+            try:
+                request = connection.recv()
+                if engine is None:
+                    connection.send({"error": f"TTS model could not be loaded: {load_error}"})
+                    continue
+                start = time.perf_counter()
+                busy[index] = 1
+                try:
+                    engine.synthesize(**request)
+                finally:
+                    busy[index] = 0
+                connection.send({"replica": os.getpid(), "seconds": round(time.perf_counter() - start, 3)})
+            except (EOFError, OSError):
+                # Client hat aufgegeben, nichts mehr zu senden
+                pass
+            except Exception as e:
+                try:
+                    connection.send({"error": str(e)})
+                except OSError:
+                    pass
+
+
+class SynthesisWorker:
+    """
+    Long-lived synthesis server. It listens on a Unix socket and forks the
+    given number of replicas, each keeping its own model in memory. Requests
+    wait in the socket's backlog until a replica is free. Crashed replicas
+    are replaced by serve_forever(). A second socket reports how many
+    replicas are busy, so clients can choose another engine under load.
+    """
+
+    def __init__(self, address=ADDRESS, replicas=REPLICAS, loader=XttsEngine):
+        self.address = address
+        self.replicas = replicas
+        self.loader = loader
+        self.listener = None
+        self.status_listener = None
+        self.processes = []
+        self.busy = None
+        self._stopping = False
+
+    def start(self):
+        if os.path.exists(self.address):
+            if _is_listening(self.address):
+                raise SynthesisError(f"A synthesis worker is already listening on {self.address}")
+            os.remove(self.address)
+
+        authkey = _authkey(self.address)
+        self.listener = Listener(self.address, "AF_UNIX", backlog=BACKLOG, authkey=authkey)
+        os.chmod(self.address, 0o600)
+        # Ein Eintrag pro Replikat statt eines Zählers, damit abgestürzte Replikate nicht ewig belegt wirken
+        self.busy = multiprocessing.get_context("fork").Array("b", self.replicas, lock=False)
+        self.processes = [self._start_replica(i) for i in range(self.replicas)]
+
+        status_address = _status_address(self.address)
+        if os.path.exists(status_address):
+            os.remove(status_address)
+        self.status_listener = Listener(status_address, "AF_UNIX", authkey=authkey)
+        os.chmod(status_address, 0o600)
+        self._stopping = False
+        threading.Thread(target=self._answer_status, name="tts-status", daemon=True).start()
+        print(f"TTS synthesis worker listening on {self.address} with {self.replicas} replica(s)")
+
+    def _start_replica(self, index):
+        # fork, damit die Replikate den offenen Listener erben
+        context = multiprocessing.get_context("fork")
+        process = context.Process(target=_serve, args=(self.listener, self.loader, self.busy, index),
+                                  name=f"tts-replica-{index}", daemon=True)
+        process.start()
+        return process
+
+    def _answer_status(self):
+        while not self._stopping:
+            try:
+                connection = self.status_listener.accept()
+            except Exception:
+                continue
+            with connection:
+                try:
+                    connection.send(self.status())
+                except OSError:
+                    pass
+
+    def status(self):
+        return {"replicas": self.replicas, "busy": sum(self.busy)}
+
+    def supervise(self):
+        """Replaces replicas that died, e.g. because they ran out of memory."""
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                print(f"TTS replica {process.pid} exited with {process.exitcode}, restarting")
+                self.busy[index] = 0
+                self.processes[index] = self._start_replica(index)
+
+    def serve_forever(self):
+        self.start()
+        # SIGTERM wie Strg+C behandeln, damit stop() den Socket entfernt
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            while True:
+                time.sleep(SUPERVISE_INTERVAL_SECONDS)
+                self.supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        if self.status_listener is not None:
+            self._stopping = True
+            # accept() wacht durch das Schließen allein nicht auf
+            _is_listening(_status_address(self.address))
+            self.status_listener.close()
+            self.status_listener = None
+
+
+class SynthesisClient(TTSEngine):
+    """
+    XTTS engine as seen by the tool: sends synthesis requests to the worker.
+    If no worker is running and autostart is enabled, one is started as a
+    separate process; a lock file makes sure concurrent callers start only one.
+    """
+
+    name = "xtts"
+    model_id = XTTS_MODEL
+
+    def __init__(self, address=ADDRESS, autostart=True):
+        self.address = address
+        self.autostart = autostart
+
+    @property
+    def parallelism(self):
+        """
+        Number of replicas of the running worker, asked on every access since
+        the worker may have been restarted with another TTS_REPLICAS. Without
+        a worker, the one autostart launches gets TTS_REPLICAS of this process.
+        """
+        status = self.status()
+        return status["replicas"] if status is not None else REPLICAS
+
+    def voice(self, language):
+        return DEFAULT_SPEAKER
+
+    def status(self):
+        """Returns the number of replicas and busy replicas, or None if no worker is running."""
+        try:
+            with Client(_status_address(self.address), "AF_UNIX", authkey=_authkey(self.address)) as connection:
+                return connection.recv()
+        except (OSError, EOFError):
+            return None
+
+    def is_busy(self):
+        status = self.status()
+        # Ohne laufenden Worker müsste XTTS erst geladen werden
+        return status is None or status["busy"] >= status["replicas"]
+
+    def synthesize(self, text, language, path, speaker=DEFAULT_SPEAKER):
+        """Writes the speech for text to path (WAV). Blocks until a replica has finished."""
+        with self._connect() as connection:
+            connection.send({"text": text, "language": language, "path": path, "speaker": speaker})
+            try:
+                reply = connection.recv()
+            except EOFError:
+                raise SynthesisError("The synthesis worker closed the connection.")
+        if "error" in reply:
+            raise SynthesisError(reply["error"])
+        return reply
+
+    def _connect(self):
+        try:
+            return Client(self.address, "AF_UNIX", authkey=_authkey(self.address))
+        except (FileNotFoundError, ConnectionRefusedError):
+            if not self.autostart:
+                raise SynthesisError(f"No synthesis worker is listening on {self.address}")
+
+        self._start_worker()
+        deadline = time.time() + START_TIMEOUT_SECONDS
+        while True:
+            try:
+                return Client(self.address, "AF_UNIX", authkey=_authkey(self.address))
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.time() > deadline:
+                    raise SynthesisError("The synthesis worker did not start in time.")
+                time.sleep(0.1)
+
+    def _start_worker(self):
+        with open(self.address + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if _is_listening(self.address):
+                return
+            # Eigene Sitzung, damit der Worker den Job-Prozess überlebt, der ihn gestartet hat
+            subprocess.Popen([sys.executable, "-m", "tools.text_to_speech.synthesis_worker"],
+                             cwd=_ROOT_DIR, start_new_session=True,
+                             env=dict(os.environ, TTS_WORKER_SOCKET=self.address))
+            deadline = time.time() + START_TIMEOUT_SECONDS
+            while not _is_listening(self.address) and time.time() < deadline:
+                time.sleep(0.1)
+
+
+# Gemeinsamer Client für das Tool
+synthesis_client = SynthesisClient(autostart=os.environ.get("TTS_WORKER_AUTOSTART", "1") != "0")
+
+
+if __name__ == "__main__":
+    SynthesisWorker().serve_forever()
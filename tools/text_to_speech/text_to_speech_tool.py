@@ -1,38 +1,126 @@
 # Python
 import uuid
+import shutil
 import tempfile
 import os
-import base64
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from tool_interface import MiniTool, OutputType
+from artifact_store import artifact_store, artifact_url
+from result_cache import result_cache
+from tools.text_to_speech.engines import piper_engine, DEFAULT_SPEAKER, XTTS_MODEL
+from tools.text_to_speech.synthesis_worker import synthesis_client
+from tools.text_to_speech.streaming import split_sentences, open_audio_writer, AUDIO_FORMATS
 from flask_babel import lazy_gettext as _
 
+# Kurze Texte gehen im Modus "Auto" an Piper, solange alle XTTS-Replikate belegt sind
+AUTO_PIPER_MAX_CHARS = int(os.environ.get("TTS_AUTO_PIPER_MAX_CHARS", 500))
+
+ENGINE_NAMES = {"xtts": "XTTS", "piper": "Piper"}
+
+
+def sentence_cache_key(sentence, language, speaker=DEFAULT_SPEAKER, model=XTTS_MODEL):
+    """Cache key of a synthesized sentence. Whitespace and Unicode forms don't change the audio."""
+    normalized = unicodedata.normalize("NFC", " ".join(sentence.split()))
+    return result_cache.key("tts_sentence", normalized, language, speaker, model)
+
+
 class TextToSpeechTool(MiniTool):
     name = _("Text zu Sprache")
     description = _("Konvertiert Text in gesprochene Sprache (TTS Text To Speech)")
-    TTS_TOOL_CHARACTER_LIMIT = 6000
-
-    def _get_audio_base64(self, audio_path):
-        """Convert audio to base64 string for embedding in HTML"""
-        with open(audio_path, "rb") as audio_file:
-            return base64.b64encode(audio_file.read()).decode("utf-8")
+    reports_progress = True
+    # Sätze werden parallel erzeugt und gestreamt, lange Texte verzögern den Start der Wiedergabe nicht
+    TTS_TOOL_CHARACTER_LIMIT = 20000
 
     def __init__(self):
         super().__init__(self.name, "TextToSpeechTool")
         self.input_params = {_("Text"): "string", _("Sprache"): {
             "type": "enum",
             "options": ["en", "de"]
+        }, _("Format"): {
+            "type": "enum",
+            # WAV zuerst, damit es die Vorauswahl bleibt; Opus ist etwa zehnmal kleiner
+            "options": ["WAV", "Opus", "MP3", "AAC"]
+        }, _("Sprachmodell"): {
+            "type": "enum",
+            # XTTS klingt natürlicher, Piper antwortet auf der CPU in Echtzeit
+            "options": ["Auto", "XTTS", "Piper"]
         }}
 
+    def select_engine(self, choice, text, language):
+        """Returns the engine for the user's choice or None if it isn't available."""
+        choice = (choice or "Auto").lower()
+        if choice == "piper":
+            return piper_engine if piper_engine.is_available(language) else None
+        if choice == "auto" and len(text) <= AUTO_PIPER_MAX_CHARS \
+                and piper_engine.is_available(language) and synthesis_client.is_busy():
+            return piper_engine
+        return synthesis_client
+
+    def _synthesize(self, sentences, language, filepath, audio_format="wav", engine=synthesis_client):
+        """
+        Synthesizes the sentences in parallel with the engine and appends
+        them to filepath in order, encoded in audio_format. Sentences from the
+        phrase cache are not synthesized again. The file is registered as
+        artifact as soon as the first sentence is ready, so playback can start
+        while the rest is still being generated. Returns the artifact token.
+        """
+        parts_dir = tempfile.mkdtemp(prefix="tts_parts_")
+        writer = open_audio_writer(filepath, audio_format)
+        encoding = AUDIO_FORMATS[audio_format]
+        download_name = "speech." + encoding["extension"]
+        token = None
+        pool = ThreadPoolExecutor(max_workers=engine.parallelism)
+        try:
+            keys = [sentence_cache_key(sentence, language, engine.voice(language), engine.model_id)
+                    for sentence in sentences]
+            parts = []
+            futures = []
+            # Sätze, die im selben Text mehrfach vorkommen, nur einmal erzeugen
+            submitted = {}
+            for index, (sentence, key) in enumerate(zip(sentences, keys)):
+                future, part = submitted.get(key, (None, None))
+                if part is None:
+                    part = result_cache.get_file(key, os.path.join(parts_dir, f"{index}.wav"))
+                if part is None:
+                    # Das Modell bleibt im Synthese-Worker bzw. Piper-Prozess geladen
+                    part = os.path.join(parts_dir, f"{index}.wav")
+                    future = pool.submit(engine.synthesize, sentence, language, part)
+                    submitted[key] = (future, part)
+                parts.append(part)
+                futures.append(future)
+
+            for future, part, key in zip(futures, parts, keys):
+                if future is not None:
+                    future.result()
+                    result_cache.put_file(key, part)
+                writer.append(part)
+                if token is None:
+                    token = artifact_store.register(filepath, download_name, encoding["mimetype"], complete=False)
+                    self.report_progress({"type": "audio", "url": artifact_url(token)})
+        finally:
+            # Bei einem Fehler die restlichen Sätze nicht mehr erzeugen
+            pool.shutdown(wait=True, cancel_futures=True)
+            writer.close()
+            if token is not None:
+                artifact_store.finish(token)
+            shutil.rmtree(parts_dir, ignore_errors=True)
+        return token
+
     def execute_tool(self, input_params: dict) -> bool:
         try:
             self.error_message = None
-            from TTS.api import TTS
             if not input_params.get(_("Text")) or not input_params.get(_("Sprache")):
                 self.error_message = _("Alle Eingabefelder müssen ausgefüllt sein.")
                 return False
 
             text = input_params.get(_("Text"), "")
             language = input_params.get(_("Sprache"), "de")
+            audio_format = (input_params.get(_("Format")) or "WAV").lower()
+            if audio_format not in AUDIO_FORMATS:
+                self.error_message = _("Das Format {0} wird nicht unterstützt.").format(input_params.get(_("Format")))
+                return False
+            encoding = AUDIO_FORMATS[audio_format]
 
             if len(text) > self.TTS_TOOL_CHARACTER_LIMIT:
                 self.error_message = _("Eingabetext darf wegen technischen Limitationen nicht länger als {0} Zeichen sein.").format(self.TTS_TOOL_CHARACTER_LIMIT)
@@ -40,23 +128,21 @@ class TextToSpeechTool(MiniTool):
 
             temp_dir = tempfile.gettempdir()
             uid = str(uuid.uuid4())
-            filename = "output_" + uid + ".wav"
+            filename = "output_" + uid + "." + encoding["extension"]
             filepath = os.path.join(temp_dir, filename)
 
-            if text == "":
+            sentences = split_sentences(text)
+            if not sentences:
                 self.error_message = _("Alle Eingabefelder müssen ausgefüllt sein.")
                 return False
 
-            tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=False)
-            tts.tts_to_file(
-                text=text,
-                file_path=filepath,
-                speaker="Ana Florence",
-                language=language,
-                split_sentences=True,
-            )
+            engine = self.select_engine(input_params.get(_("Sprachmodell")), text, language)
+            if engine is None:
+                self.error_message = _("Piper ist auf diesem Server nicht verfügbar.")
+                return False
 
-            audio_base64 = self._get_audio_base64(filepath)
+            # Player und Download-Link nutzen dieselbe Datei, statt sie zweimal einzubetten
+            audio_token = self._synthesize(sentences, language, filepath, audio_format, engine)
 
             # Textvariablen zur Übersetzung extern definieren
             header_audio = _("Sprachausgabe")
@@ -65,6 +151,8 @@ class TextToSpeechTool(MiniTool):
             header_details = _("Details")
             label_text = _("Text:")
             label_language = _("Sprache:")
+            label_format = _("Format:")
+            label_engine = _("Sprachmodell:")
 
             result = (
                 f"<div class=\"text-to-speech-result\">"
@@ -76,11 +164,11 @@ class TextToSpeechTool(MiniTool):
                 f"</div>"
                 f"<div class=\"card-body text-center\">"
                 f"<audio controls>"
-                f"<source src=\"data:audio/wav;base64,{audio_base64}\" type=\"audio/wav\">"
+                f"<source src=\"{artifact_url(audio_token)}\" type=\"{encoding['mimetype']}\">"
                 f"{unsupported}"
                 f"</audio>"
                 f"<div class=\"mt-3\">"
-                f"<a href=\"data:audio/wav;base64,{audio_base64}\" download=\"speech.wav\" class=\"fancy-button\">{download_audio}</a>"
+                f"<a href=\"{artifact_url(audio_token, download=True)}\" download=\"speech.{encoding['extension']}\" class=\"fancy-button\">{download_audio}</a>"
                 f"</div>"
                 f"</div>"
                 f"</div>"
@@ -95,6 +183,8 @@ class TextToSpeechTool(MiniTool):
                 f"<tbody>"
                 f"<tr><th>{label_text}</th><td>{text}</td></tr>"
                 f"<tr><th>{label_language}</th><td>{language}</td></tr>"
+                f"<tr><th>{label_format}</th><td>{input_params.get(_('Format')) or 'WAV'}</td></tr>"
+                f"<tr><th>{label_engine}</th><td>{ENGINE_NAMES[engine.name]}</td></tr>"
                 f"</tbody>"
                 f"</table>"
                 f"</div>"
@@ -0,0 +1,51 @@
+import uuid
+from datetime import timedelta
+from token_store import TokenStore
+
+# Messwerte der letzten 24 Stunden; die Modelle werden in den Job-Workern geladen,
+# daher liegen die Messwerte im TokenStore und nicht im Speicher eines Prozesses
+RETENTION = timedelta(hours=24)
+
+
+class ModelCacheMetrics:
+    """
+    Hits, misses, evictions and load times of the Whisper model caches of all
+    worker processes. Every event is stored as its own entry, so concurrent
+    workers never overwrite each other's counts; stats() aggregates them per
+    model size.
+    """
+
+    def __init__(self, retention=RETENTION):
+        self.samples = TokenStore("whisper_model_cache", retention)
+
+    def record(self, model_size, event, load_seconds=0.0):
+        """event is "hit", "miss" (with the load time) or "eviction"."""
+        self.samples[str(uuid.uuid4())] = {
+            "model": model_size,
+            "event": event,
+            "load_seconds": load_seconds,
+        }
+
+    def stats(self):
+        """Returns hits, misses, evictions, hit rate and mean load time per model size."""
+        per_model = {}
+        for _token, sample in self.samples.items():
+            model = per_model.setdefault(sample["model"], {"hit": 0, "miss": 0, "eviction": 0, "load_seconds": 0.0})
+            model[sample["event"]] += 1
+            model["load_seconds"] += sample["load_seconds"]
+
+        return {
+            name: {
+                "hits": model["hit"],
+                "misses": model["miss"],
+                "evictions": model["eviction"],
+                "hit_rate": round(model["hit"] / (model["hit"] + model["miss"]), 3)
+                if model["hit"] + model["miss"] else None,
+                "load_seconds": round(model["load_seconds"] / model["miss"], 3) if model["miss"] else None,
+            }
+            for name, model in per_model.items()
+        }
+
+
+# Gemeinsame Instanz für den Modell-Cache und /metrics
+model_cache_metrics = ModelCacheMetrics()
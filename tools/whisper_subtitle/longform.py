@@ -0,0 +1,185 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+from whisper.audio import N_SAMPLES, SAMPLE_RATE
+
+from tools.whisper_subtitle.model_cache import model_cache
+
+# Zielgröße der Abschnitte und Suchfenster für eine leise Stelle um die Zielgrenze herum
+CHUNK_SECONDS = int(os.environ.get("WHISPER_LONGFORM_CHUNK_SECONDS", 300))
+SEARCH_SECONDS = 30
+FRAME_SECONDS = 0.1
+
+
+def cpu_budget():
+    """Cores one job may use; up to HEAVY_TOOL_WORKERS jobs (see job_queue) run at the same time."""
+    return max(1, (os.cpu_count() or 2) // int(os.environ.get("HEAVY_TOOL_WORKERS", 2)))
+
+
+def default_workers():
+    budget = cpu_budget()
+    return max(1, min(budget, int(os.environ.get("WHISPER_LONGFORM_WORKERS", budget // 2))))
+
+
+def find_split_points(audio, chunk_seconds=CHUNK_SECONDS, search_seconds=SEARCH_SECONDS,
+                      frame_seconds=FRAME_SECONDS, sample_rate=SAMPLE_RATE):
+    """
+    Splits the audio into (start, end) sample ranges of roughly chunk_seconds.
+
+    Each boundary is moved to the quietest frame (lowest RMS energy) within
+    +/- search_seconds of the target position, so that cuts fall into pauses.
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    if total <= chunk + search_seconds * sample_rate:
+        return [(0, total)]
+
+    frame = max(1, int(frame_seconds * sample_rate))
+    frame_count = total // frame
+    frames = audio[:frame_count * frame].reshape(frame_count, frame)
+    energy = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+
+    search = int(search_seconds * sample_rate) // frame
+    boundaries = [0]
+    target = chunk // frame
+    while target < frame_count - search:
+        low = max(boundaries[-1] // frame + 1, target - search)
+        high = min(frame_count, target + search + 1)
+        quietest = low + int(np.argmin(energy[low:high]))
+        boundaries.append(quietest * frame)
+        target = quietest + chunk // frame
+
+    boundaries.append(total)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _shift_segments(segments, offset):
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words", []):
+            word["start"] += offset
+            word["end"] += offset
+    return segments
+
+
+def transcribe_chunk(model_size, audio, offset, options):
+    """Transcribes one chunk and moves its timestamps to the position in the full file."""
+    model = model_cache.get(model_size)
+    result = model.transcribe(audio, **options)
+    return {
+        "text": result["text"],
+        "language": result.get("language"),
+        "segments": _shift_segments(result["segments"], offset),
+    }
+
+
+def _init_worker(threads, model_size):
+    # Ohne Begrenzung würde jeder Worker alle Kerne für torch beanspruchen
+    torch.set_num_threads(threads)
+    model_cache.get(model_size)
+
+
+def _pool_context():
+    # torch/OpenMP hat im Job-Worker bereits Threads gestartet, fork wäre danach nicht sicher
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _merge_results(results):
+    segments = []
+    for result in results:
+        segments.extend(result["segments"])
+    for index, segment in enumerate(segments):
+        segment["id"] = index
+
+    return {
+        "text": "".join(result["text"] for result in results),
+        "segments": segments,
+        "language": results[0]["language"] if results else None,
+    }
+
+
+def transcribe_long_form(audio, model_size, workers=None, on_segments=None, sample_rate=SAMPLE_RATE, **options):
+    """
+    Transcribes long recordings by splitting them at pauses and transcribing the
+    chunks in parallel worker processes. Each worker loads the model once when
+    it starts. Workers times torch threads stay within cpu_budget().
+
+    on_segments is called with the segments of each chunk in order, as soon as
+    the chunk and all chunks before it are done.
+    Returns a result in the same format as whisper's transcribe().
+    """
+    workers = workers or default_workers()
+    ranges = find_split_points(audio, chunk_seconds=CHUNK_SECONDS, sample_rate=sample_rate)
+    jobs = [(model_size, audio[start:end], start / sample_rate, options) for start, end in ranges]
+
+    results = []
+    if workers <= 1 or len(jobs) == 1:
+        for job in jobs:
+            results.append(transcribe_chunk(*job))
+            if on_segments:
+                on_segments(results[-1]["segments"])
+    else:
+        workers = min(workers, len(jobs))
+        threads = max(1, cpu_budget() // workers)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                                 initializer=_init_worker, initargs=(threads, model_size)) as executor:
+            for result in executor.map(transcribe_chunk, *zip(*jobs)):
+                results.append(result)
+                if on_segments:
+                    on_segments(result["segments"])
+
+    return _merge_results(results)
+
+
+# Länge eines Fensters, wie es whisper auf einmal dekodiert, und Textende, das als Prompt weitergegeben wird
+WINDOW_SAMPLES = N_SAMPLES
+PROMPT_CHARS = 200
+
+
+def transcribe_streaming(model, audio, on_segments, sample_rate=SAMPLE_RATE, **options):
+    """
+    Transcribes the audio window by window, each through a regular
+    model.transcribe() call, and calls on_segments with the segments of every
+    window as soon as it is done.
+
+    The end of the text so far is passed on as initial_prompt and the language
+    detected in the first window is kept. The last segment of a window may be
+    cut off at its end, so it is dropped and the next window starts there.
+    Returns a result in the same format as whisper's transcribe().
+    """
+    user_prompt = options.pop("initial_prompt", None)
+    language = options.pop("language", None)
+    segments = []
+    text = ""
+    position = 0
+    while position < len(audio):
+        window = audio[position:position + WINDOW_SAMPLES]
+        prompt = text[-PROMPT_CHARS:] if text else user_prompt
+        result = model.transcribe(window, language=language, initial_prompt=prompt, **options)
+        language = language or result.get("language")
+        new_segments = result["segments"]
+
+        advance = len(window)
+        if position + len(window) < len(audio) and len(new_segments) > 1:
+            cut = int(new_segments[-1]["start"] * sample_rate)
+            # Nur zurückgehen, wenn das Fenster trotzdem vorankommt
+            if 0 < cut < len(window):
+                new_segments = new_segments[:-1]
+                advance = cut
+
+        new_segments = _shift_segments(new_segments, position / sample_rate)
+        for segment in new_segments:
+            segment["id"] = len(segments)
+            segments.append(segment)
+            text += segment["text"]
+        if new_segments:
+            on_segments(new_segments)
+        position += advance
+
+    return {"text": text, "segments": segments, "language": language}
@@ -0,0 +1,122 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import whisper
+
+from tools.whisper_subtitle.cache_metrics import model_cache_metrics
+
+
+def _model_size_bytes(model):
+    """Approximate memory footprint of a loaded model (parameters + buffers)."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class WhisperModelCache:
+    """
+    Process-wide registry that keeps recently used Whisper models in memory.
+
+    Models are evicted in LRU order once the configured memory budget is exceeded.
+    The most recently used model is always kept, even if it alone exceeds the budget.
+    Hits, misses and evictions are also passed to metrics (see ModelCacheMetrics),
+    so /metrics can report them for all worker processes.
+    """
+
+    def __init__(self, budget_bytes=None, loader=whisper.load_model, metrics=None):
+        if budget_bytes is None:
+            budget_bytes = int(os.environ.get("WHISPER_CACHE_BUDGET_MB", 4096)) * 1024 * 1024
+        self.budget_bytes = budget_bytes
+        self._loader = loader
+        self._metrics = metrics
+        self._models = OrderedDict()  # model_size -> (model, size_bytes)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, model_size):
+        """Returns the model for the given size, loading it if necessary."""
+        model = self._lookup(model_size)
+        if model is not None:
+            print(f"Whisper model cache hit: {model_size}")
+            self._record(model_size, "hit")
+            return model
+
+        # Nur ein Ladevorgang gleichzeitig, damit dasselbe Modell nicht doppelt geladen wird
+        with self._load_lock:
+            model = self._lookup(model_size, count_hit=False)
+            if model is not None:
+                return model
+
+            start = time.perf_counter()
+            model = self._loader(model_size)
+            duration = time.perf_counter() - start
+
+            with self._lock:
+                self.misses += 1
+                self.load_seconds += duration
+                self._models[model_size] = (model, _model_size_bytes(model))
+                self._evict()
+
+            print(f"Whisper model cache miss: {model_size} loaded in {duration:.2f}s")
+            self._record(model_size, "miss", duration)
+            return model
+
+    def _lookup(self, model_size, count_hit=True):
+        with self._lock:
+            entry = self._models.get(model_size)
+            if entry is None:
+                return None
+            self._models.move_to_end(model_size)
+            if count_hit:
+                self.hits += 1
+            return entry[0]
+
+    def _record(self, model_size, event, load_seconds=0.0):
+        if self._metrics is None:
+            return
+        try:
+            self._metrics.record(model_size, event, load_seconds)
+        except Exception as e:
+            # Messwerte dürfen eine Transkription nicht scheitern lassen
+            print(f"Error recording Whisper cache metrics: {str(e)}")
+
+    def _evict(self):
+        while len(self._models) > 1 and self.resident_bytes() > self.budget_bytes:
+            model_size, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            print(f"Whisper model cache evicted: {model_size}")
+            self._record(model_size, "eviction")
+
+    def resident_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def preload(self, model_sizes):
+        """Loads the given model sizes ahead of the first request."""
+        for model_size in model_sizes:
+            self.get(model_size)
+
+    def preload_from_env(self):
+        """Preloads the comma separated sizes from WHISPER_PRELOAD_MODELS, e.g. "tiny,base"."""
+        model_sizes = [size.strip() for size in os.environ.get("WHISPER_PRELOAD_MODELS", "").split(",") if size.strip()]
+        self.preload(model_sizes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_seconds": round(self.load_seconds, 3),
+                "resident_models": list(self._models.keys()),
+                "resident_bytes": self.resident_bytes(),
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+# Gemeinsame Instanz für den ganzen Prozess
+model_cache = WhisperModelCache(metrics=model_cache_metrics)
@@ -1,24 +1,40 @@
 import os
+import uuid
+import shutil
 import subprocess
 import tempfile
 from enum import Enum
 from flask_babel import lazy_gettext as _
 
 import torch
-import base64 # Added import
 
 import whisper
 from whisper.utils import get_writer
 
 from tool_interface import MiniTool, OutputType
+from temp_janitor import janitor
+from artifact_store import artifact_store, artifact_url
+from result_cache import result_cache
 from tools.whisper_subtitle.languages import LANGUAGES
+from tools.whisper_subtitle.model_cache import model_cache
+from tools.whisper_subtitle.longform import transcribe_long_form, transcribe_streaming
 
 FULL_TO_CODE = {v: k for k, v in LANGUAGES.items()}
 
+# Teil des Cache-Schlüssels; erhöhen, wenn sich das Ergebnis bei gleichen Einstellungen ändert
+# (2: Streaming im Standardmodus transkribiert wieder in einem Durchlauf statt in 30-Sekunden-Abschnitten,
+#  3: Streaming dekodiert fensterweise über die öffentliche transcribe()-Schnittstelle)
+TRANSCRIPT_VERSION = 3
+
 class Task(Enum):
     TRANSCRIBE = "transcribe"
     TRANSLATE = "translate"
 
+class Mode(Enum):
+    STANDARD = "standard"
+    # Teilt lange Aufnahmen an Pausen und transkribiert die Abschnitte parallel
+    LONGFORM = "longform"
+
 class ModelSize(Enum):
     TINY = "tiny"
     BASE = "base"
@@ -33,6 +49,17 @@ class ModelSize(Enum):
     MEDIUMEN = "medium.en"
 
 class WhisperSubtitleTool(MiniTool):
+    reports_progress = True
+    # Ausgabeformate mit ihrem Content-Type, werden alle als normale Downloads angeboten
+    SUBTITLE_FORMATS = {
+        "srt": "application/x-subrip",
+        "vtt": "text/vtt",
+        "json": "application/json",
+        "tsv": "text/tab-separated-values",
+    }
+
+    temp_dir = tempfile.gettempdir()
+
     def __init__(self):
         super().__init__(
             name=_("Whisper Subtitle"),
@@ -52,6 +79,10 @@ class WhisperSubtitleTool(MiniTool):
             _("Aufgabe"): {
                 "type": "enum",
                 "options": [e.value for e in Task] # Get values from Task enum
+            },
+            _("Modus"): {
+                "type": "enum",
+                "options": [e.value for e in Mode]
             }
         }
         
@@ -59,11 +90,13 @@ class WhisperSubtitleTool(MiniTool):
         self.subtitle_file_header = _("Untertiteldatei")
         self.subtitle_success = _("Untertitel erfolgreich generiert.")
         self.download_button = _("SRT-Datei herunterladen")
+        self.other_formats_label = _("Weitere Formate:")
         self.details_header = _("Details")
         self.input_file_label = _("Eingabedatei:")
         self.language_label = _("Sprache:")
         self.model_size_label = _("Modellgröße:")
         self.task_label = _("Aufgabe:")
+        self.mode_label = _("Modus:")
 
     def execute_tool(self, input_params: dict) -> bool:
         try:
@@ -71,6 +104,7 @@ class WhisperSubtitleTool(MiniTool):
             language = input_params.get(_("Sprache"))
             model_size = input_params.get(_("Modellgröße"))
             task = input_params.get(_("Aufgabe"))
+            mode = input_params.get(_("Modus"), Mode.STANDARD.value)
 
             if not input_file:
                 self.error_message = _("Keine Eingabedatei angegeben.")
@@ -97,45 +131,56 @@ class WhisperSubtitleTool(MiniTool):
                 self.error_message = _("Eingabedatei '{0}' existiert nicht.").format(input_file_cleared)
                 return False
 
-            print("gpu available: " + str(torch.cuda.is_available()))
-            gpu = torch.cuda.is_available()
-            model = whisper.load_model(model_size)
-
-            whisper_output = model.transcribe(
-                input_file_cleared,
-                task=task,
-                language=FULL_TO_CODE[language],
-                verbose=True,
-                fp16=gpu,
-            )
-
-            temp_dir = str(tempfile.gettempdir())
-            audio = whisper.load_audio(input_file_cleared)
-            if audio is None or len(audio) == 0:
-                self.error_message = _("Audio-Daten konnten nicht aus '{0}' geladen werden").format(input_file_cleared)
+            language_code = FULL_TO_CODE.get(language)
+            if language_code is None:
+                self.error_message = _("Ungültige Sprache: {0}").format(language)
                 return False
 
-            writer = get_writer("srt", temp_dir)
-            # Pass the input file path, not the loaded audio array
-            writer(whisper_output, input_file_cleared)
+            # Gleiche Datei mit gleichen Einstellungen ergibt dasselbe Transkript
+            cache_key = result_cache.file_key("whisper", input_file if isinstance(input_file, dict) else input_file_cleared,
+                                              model_size, language_code, task, mode, TRANSCRIPT_VERSION)
+            whisper_output = result_cache.get(cache_key)
+            if whisper_output is not None:
+                print("Whisper result cache hit")
+                if self.progress_callback:
+                    self._report_segments(whisper_output["segments"])
+            else:
+                whisper_output = self._transcribe(input_file_cleared, model_size, language_code, task, mode)
+                if whisper_output is None:
+                    return False
+                result_cache.put(cache_key, whisper_output)
 
-            srt_file = os.path.join(
-                temp_dir, os.path.basename(input_filename).rsplit(".", 1)[0] + ".srt" # Use original filename for SRT name
-            )
+            # Eigenes Verzeichnis pro Ergebnis, damit gleichnamige Uploads sich nicht überschreiben
+            output_dir = os.path.join(self.temp_dir, f"whisper_{uuid.uuid4()}")
+            os.makedirs(output_dir, exist_ok=True)
+            base_name = os.path.splitext(os.path.basename(input_filename))[0]
 
-            # Read SRT content and encode as Base64
             try:
-                with open(srt_file, "r", encoding="utf-8") as f:
-                    srt_content = f.read()
-                srt_base64 = base64.b64encode(srt_content.encode("utf-8")).decode("utf-8")
-                # Clean up temporary SRT file after reading
-                os.remove(srt_file)
+                files = {}
+                for subtitle_format in self.SUBTITLE_FORMATS:
+                    writer = get_writer(subtitle_format, output_dir)
+                    # Der Writer benennt die Datei nach dem übergebenen Pfad
+                    writer(whisper_output, input_filename)
+                    files[subtitle_format] = os.path.join(output_dir, f"{base_name}.{subtitle_format}")
             except Exception as e:
-                self.error_message = _("SRT-Datei konnte nicht gelesen oder kodiert werden:") + f" {e}"
+                shutil.rmtree(output_dir, ignore_errors=True)
+                self.error_message = _("Untertiteldateien konnten nicht geschrieben werden:") + f" {e}"
                 return False
 
+            janitor.track(output_dir)
+            urls = {
+                subtitle_format: artifact_url(artifact_store.register(
+                    path, f"{base_name}.{subtitle_format}", self.SUBTITLE_FORMATS[subtitle_format]), download=True)
+                for subtitle_format, path in files.items()
+            }
+
+            other_formats = "".join(
+                f'<a href="{urls[subtitle_format]}" class="btn btn-outline-primary btn-sm mx-1" download>'
+                f'{subtitle_format.upper()}</a>'
+                for subtitle_format in self.SUBTITLE_FORMATS if subtitle_format != "srt"
+            )
+
             # Construct HTML output
-            download_filename = os.path.basename(srt_file)
             result = f"""
             <div class="whisper-subtitle-result">
                 <div class="row">
@@ -147,11 +192,13 @@ class WhisperSubtitleTool(MiniTool):
                             <div class="card-body text-center">
                                 <p>{self.subtitle_success}</p>
                                 <div class="mt-3">
-                                    <a href="data:text/plain;charset=utf-8;base64,{srt_base64}"
-                                       download="{download_filename}" class="fancy-button">
+                                    <a href="{urls['srt']}" class="fancy-button" download>
                                        {self.download_button}
                                     </a>
                                 </div>
+                                <div class="mt-3">
+                                    {self.other_formats_label} {other_formats}
+                                </div>
                             </div>
                         </div>
                     </div>
@@ -179,6 +226,10 @@ class WhisperSubtitleTool(MiniTool):
                                             <th>{self.task_label}</th>
                                             <td>{task}</td>
                                         </tr>
+                                        <tr>
+                                            <th>{self.mode_label}</th>
+                                            <td>{mode}</td>
+                                        </tr>
                                     </tbody>
                                 </table>
                             </div>
@@ -194,6 +245,51 @@ class WhisperSubtitleTool(MiniTool):
             self.error_message = str(e)
             return False
 
+    def _transcribe(self, input_file_cleared, model_size, language_code, task, mode):
+        """Decodes and transcribes the input file. Returns None and sets error_message on failure."""
+        # Audio genau einmal dekodieren (16 kHz, float32) und vor dem Laden des Modells prüfen.
+        # Derselbe Puffer wird an transcribe übergeben, damit ffmpeg nicht ein zweites Mal läuft.
+        audio = whisper.load_audio(input_file_cleared)
+        if audio is None or len(audio) == 0:
+            self.error_message = _("Audio-Daten konnten nicht aus '{0}' geladen werden").format(input_file_cleared)
+            return None
+
+        print("gpu available: " + str(torch.cuda.is_available()))
+        gpu = torch.cuda.is_available()
+
+        # Im Hintergrund-Job werden fertige Untertitel sofort an den Browser gestreamt
+        on_segments = self._report_segments if self.progress_callback else None
+
+        if mode == Mode.LONGFORM.value:
+            whisper_output = transcribe_long_form(
+                audio,
+                model_size,
+                on_segments=on_segments,
+                task=task,
+                language=language_code,
+                verbose=False,
+                fp16=gpu,
+            )
+        else:
+            model = model_cache.get(model_size)
+            options = dict(task=task, language=language_code, verbose=True, fp16=gpu)
+            if on_segments:
+                # Fensterweise, damit die Untertitel nach jeweils 30 Sekunden Audio gemeldet werden
+                whisper_output = transcribe_streaming(model, audio, on_segments, **options)
+            else:
+                whisper_output = model.transcribe(audio, **options)
+
+        return whisper_output
+
+    def _report_segments(self, segments):
+        for segment in segments:
+            self.report_progress({
+                "type": "cue",
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": segment["text"].strip(),
+            })
+
 
 if __name__ == "__main__":
     # Example usage
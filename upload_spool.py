@@ -0,0 +1,132 @@
+import io
+import os
+import hashlib
+import tempfile
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from temp_janitor import janitor
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("UPLOAD_MAX_MB", 1024)) * 1024 * 1024
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR") or tempfile.gettempdir()
+
+
+class SpooledUpload(io.RawIOBase):
+    """
+    Receives an uploaded file from the form parser and writes it straight to
+    its final path in fixed-size chunks. The SHA-256 is computed while
+    writing, and the upload is rejected as soon as it exceeds max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._file = open(path, "wb+", buffering=CHUNK_SIZE)
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            # Sofort abbrechen, statt den Rest des Uploads noch auf die Platte zu schreiben
+            self.close()
+            os.remove(self.path)
+            raise RequestEntityTooLarge()
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        super().close()
+
+
+class SpoolingRequest(Request):
+    """
+    Request class that stores every uploaded file in a directory of its own
+    per request, so equal file names of concurrent users can't collide.
+    """
+
+    _upload_dir = None
+
+    @property
+    def upload_dir(self):
+        """Directory of this request's uploads, created on the first file."""
+        if self._upload_dir is None:
+            self._upload_dir = tempfile.mkdtemp(prefix="upload_", dir=UPLOAD_DIR)
+            # Auch abgebrochene Uploads (413) werden so wieder entfernt
+            janitor.track(self._upload_dir)
+        return self._upload_dir
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Leere Dateifelder (keine Datei ausgewählt) brauchen keine Datei auf der Platte
+        if not filename:
+            return io.BytesIO()
+
+        name = secure_filename(os.path.basename(filename)) or "upload"
+        path = os.path.join(self.upload_dir, name)
+        counter = 1
+        while os.path.exists(path):
+            # Gleichnamige Dateien im selben Request (z.B. PDF Merge)
+            path = os.path.join(self.upload_dir, f"{counter}_{name}")
+            counter += 1
+        return SpooledUpload(path)
+
+
+def spooled_file_info(file):
+    """
+    Returns the file info dict the tools expect for an uploaded FileStorage.
+    Spooled files are used in place, other streams are saved to a unique directory.
+    The directory is handed to the janitor, now that its size is known.
+    """
+    stream = file.stream
+    if isinstance(stream, SpooledUpload):
+        stream.flush()
+        janitor.track(os.path.dirname(stream.path))
+        return {
+            "file_obj": file,
+            "file_path": stream.path,
+            "filename": file.filename,
+            "sha256": stream.sha256,
+        }
+
+    # z.B. Testclients oder andere Request-Klassen: herkömmlich speichern
+    directory = tempfile.mkdtemp(prefix="upload_", dir=UPLOAD_DIR)
+    path = os.path.join(directory, secure_filename(os.path.basename(file.filename)) or "upload")
+    file.save(path)
+    janitor.track(directory)
+    return {
+        "file_obj": file,
+        "file_path": path,
+        "filename": file.filename,
+    }
@@ -1,10 +1,19 @@
 import os
+import json
+import time
 import tempfile
-from flask import Flask, render_template, request, redirect, send_from_directory, url_for, flash, jsonify, send_file, session
-from flask_babel import Babel, gettext as _
+import threading
+import multiprocessing
+from flask import Flask, Response, render_template, request, redirect, send_from_directory, url_for, flash, jsonify, send_file, session
+from flask_babel import Babel, gettext as _, get_locale as get_babel_locale
 from markupsafe import Markup
 from pytz import all_timezones
 from tool_descriptions import get_description, get_use_cases
+from job_queue import JobQueue, HEAVY_TOOLS, read_events
+from temp_janitor import janitor
+from result_cache import result_cache
+from artifact_store import artifact_store
+from upload_spool import SpoolingRequest, spooled_file_info, MAX_UPLOAD_BYTES, UPLOAD_DIR
 from tools.base64_encode.base64_encode_tool import Base64EncodeTool
 from tools.base64_decode.base64_decode_tool import Base64DecodeTool
 from tools.qr_code_generator.qr_code_generator_tool import QrCodeGeneratorTool
@@ -28,16 +37,24 @@ from tools.color_converter.color_converter_tool import ColorConverterTool
 from tools.timezone_converter.timezone_converter_tool import TimezoneConverterTool
 from tools.gif_video_converter.gif_video_converter_tool import GifVideoConverterTool
 from tools.whisper_subtitle.whisper_subtitle_tool import WhisperSubtitleTool
+from tools.whisper_subtitle.model_cache import model_cache as whisper_model_cache
+from tools.whisper_subtitle.cache_metrics import model_cache_metrics as whisper_cache_metrics
 from tools.pdf_split.pdf_split_tool import PdfSplitTool
 from tools.text_summary.text_summary_tool import TextSummaryTool
+from tools.text_summary.llm_metrics import llm_metrics
+from tools.text_summary.ollama_client import ollama_client
 from tools.pdf_merge.pdf_merge_tool import PdfMergeTool
 from tools.file_size_converter.file_size_converter_tool import FileSizeConverterTool
-from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool
+from tools.ocr_scanner.ocr_scanner_tool import OcrScannerTool, tesseract_pool
 
 
 # Erstellen einer Flask-Anwendung
 app = Flask(__name__)
 
+# Uploads direkt beim Empfang in ein eigenes Verzeichnis pro Request schreiben
+app.request_class = SpoolingRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
 # Festlegen eines geheimen Schlüssels für die Anwendung.
 # Dieser Schlüssel wird für die Sitzungsverwaltung und andere sicherheitsrelevante Funktionen verwendet.
 app.secret_key = 'supersecretkey'
@@ -93,6 +110,49 @@ tools = {
 }
 
 
+def create_tool(tool_name):
+    """
+    Creates a fresh tool instance for a single request.
+
+    Tools write their results into self.output / self.error_message, so sharing the
+    instances from `tools` between concurrent requests would leak results between users.
+    The instances in `tools` are only used for metadata (name, description, input_params).
+    """
+    tool = tools.get(tool_name)
+    if not tool:
+        return None
+    return type(tool)()
+
+
+def _preload_models():
+    whisper_model_cache.preload_from_env()
+    tesseract_pool.preload_from_env()
+
+
+# Rechenintensive Tools laufen in einem eigenen Prozess-Pool, siehe HEAVY_TOOLS.
+# Jeder Worker lädt beim Start die in WHISPER_PRELOAD_MODELS angegebenen Modelle
+# und mit OCR_PRELOAD=1 je Sprache eine Tesseract-Instanz.
+job_queue = JobQueue(initializer=_preload_models)
+job_queue.init_app(app)
+
+# Die Job-Worker importieren dieses Modul ebenfalls, die Hintergrund-Threads braucht nur der Webprozess
+IS_WEB_PROCESS = multiprocessing.parent_process() is None
+
+# Reste früherer Läufe entfernen, die nach einem Neustart kein Prozess mehr verfolgt
+if IS_WEB_PROCESS:
+    threading.Thread(target=janitor.sweep, args=([tempfile.gettempdir(), UPLOAD_DIR],),
+                     name="temp-sweep", daemon=True).start()
+
+# Ein Event-Stream belegt für seine Dauer einen Thread des Webservers. Darüber hinaus
+# und nach Ablauf der Zeit fragt der Browser nur noch den Job-Status ab.
+MAX_EVENT_STREAMS = int(os.environ.get("SSE_MAX_STREAMS", 2))  # pro Webprozess
+EVENT_STREAM_SECONDS = int(os.environ.get("SSE_MAX_SECONDS", 600))
+EVENT_STREAM_HEARTBEAT_SECONDS = 15
+event_stream_slots = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+if IS_WEB_PROCESS:
+    ollama_client.keep_alive_from_env()
+
+
 @app.route('/')
 def index():
     tools_classes = []
@@ -190,43 +250,34 @@ def tool_form(tool_name):
 @app.route("/handle_tool", methods=["POST"])
 def handle_tool():
     tool_name = request.form.get('tool_name')
-    tool = tools.get(tool_name)
+    tool = create_tool(tool_name)
 
     if not tool:
         return "Tool not found", 404
 
     input_params = {}
 
-    # Handle file uploads
-    temp_dir = tempfile.gettempdir()
-
+    # Handle file uploads (already written to disk while the request was received)
     if request.form.get("tool_name") == "PdfMergeTool":
         uploaded_files = request.files.getlist("pdf_files")
         files_info = []
 
         for file in uploaded_files:
             if file and file.filename.lower().endswith(".pdf"):
-                file_path = os.path.join(temp_dir, file.filename)
-                file.save(file_path)
-                files_info.append({
-                    "file_obj": file,
-                    "file_path": file_path,
-                    "filename": file.filename
-                })
+                files_info.append(spooled_file_info(file))
 
         input_params["pdf_files"] = files_info
         input_params["pdf_order"] = request.form.get("pdf_order", "")
 
     else:
-        for key, file in request.files.items():
-            if file and file.filename != '':
-                file_path = os.path.join(temp_dir, file.filename)
-                file.save(file_path)
-                input_params[key] = {
-                    "file_obj": file,
-                    "file_path": file_path,
-                    "filename": file.filename
-                }
+        # Mehrere Dateien unter demselben Namen (multiple) werden als Liste übergeben
+        for key in request.files.keys():
+            files_info = [spooled_file_info(file) for file in request.files.getlist(key)
+                          if file and file.filename != '']
+            if len(files_info) == 1:
+                input_params[key] = files_info[0]
+            elif files_info:
+                input_params[key] = files_info
 
 
     # Handle form inputs
@@ -237,6 +288,13 @@ def handle_tool():
             else:
                 input_params[key] = value
 
+    if tool_name in HEAVY_TOOLS:
+        job_id = job_queue.submit(tool, input_params, locale=str(get_babel_locale() or app.config['BABEL_DEFAULT_LOCALE']))
+        return render_template('output.html',
+                               toolName=tool.name,
+                               job_id=job_id,
+                               stream_events=tool.reports_progress)
+
     success = tool.execute_tool(input_params)
 
     if not success:
@@ -250,6 +308,66 @@ def handle_tool():
                            output_text=tool.output)
 
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"id": job_id,
+                        "status": "unknown",
+                        "error_message": _("Unbekannter oder abgelaufener Job.")}), 404
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Streams the progress events of a job as server-sent events until the job is
+    done, at most EVENT_STREAM_SECONDS long. Only MAX_EVENT_STREAMS streams run
+    per process; further requests get 503 and the browser falls back to polling.
+    """
+    events, offset = read_events(job_id)
+    if events is None:
+        return "Job nicht gefunden", 404
+    if not event_stream_slots.acquire(blocking=False):
+        return "Zu viele Event-Streams", 503
+
+    def stream(events, offset):
+        deadline = time.time() + EVENT_STREAM_SECONDS
+        last_sent = time.time()
+        while time.time() < deadline:
+            for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
+                last_sent = time.time()
+                if event.get("type") == "done":
+                    return
+
+            # Kommentarzeile, damit ein geschlossener Tab den Thread bald wieder freigibt
+            if time.time() - last_sent > EVENT_STREAM_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+
+            # Falls der Worker-Prozess abgestürzt ist, wird kein "done" mehr geschrieben
+            job = job_queue.get(job_id)
+            if job and job["status"] == "failed":
+                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                return
+
+            # Kurzes Intervall, damit gestreamte Tokens flüssig ankommen
+            time.sleep(0.2)
+            events, offset = read_events(job_id, offset)
+            if events is None:
+                return
+
+        # Zeit abgelaufen: der Browser schließt den Stream und fragt weiter den Status ab
+        yield f"data: {json.dumps({'type': 'timeout'})}\n\n"
+
+    response = Response(stream(events, offset),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(event_stream_slots.release)
+    return response
+
+
 @app.route('/submit_contact', methods=['POST'])
 def submit_contact():
     name = request.form.get('name')
@@ -317,16 +435,22 @@ def about():
 
 @app.route('/download/<token>')
 def download_converted_image(token):
-    image_tool = tools.get("ImageConverterTool")
+    image_tool = create_tool("ImageConverterTool")
     if not image_tool:
         return "Tool nicht gefunden", 404
 
+    # Nur der erste Download-Request erhält den Token, egal auf welchem Worker er landet
+    conversion = image_tool.pending_conversions.claim(token)
+    if not conversion:
+        return "Konvertierung fehlgeschlagen oder Token ungültig", 404
+
     temp_path = image_tool.convert_and_save(token)
     if not temp_path:
+        image_tool.pending_conversions.release(token)
         return "Konvertierung fehlgeschlagen oder Token ungültig", 404
 
     # Get the original filename from pending_conversions
-    filename = image_tool.pending_conversions[token]['filename']
+    filename = conversion['filename']
 
     # Send the file with the original filename
     response = send_file(temp_path, as_attachment=True, download_name=filename)
@@ -334,25 +458,31 @@ def download_converted_image(token):
     # Schedule cleanup after response is sent
     @response.call_on_close
     def cleanup():
-        # Mark as downloaded and cleanup
-        image_tool.pending_conversions[token]['downloaded'] = True
-        image_tool.cleanup_old_files()
+        # Token ist eingelöst, Upload und Ergebnis sofort entfernen
+        image_tool.pending_conversions.pop(token, None)
+        janitor.expire(conversion["file_path"])
+        janitor.expire(temp_path)
 
     return response
 
 
 @app.route('/download_crop/<token>')
 def download_cropped_image(token):
-    image_tool = tools.get("ImageCropperTool")
+    image_tool = create_tool("ImageCropperTool")
     if not image_tool:
         return "Tool nicht gefunden", 404
 
+    crop = image_tool.pending_crops.claim(token)
+    if not crop:
+        return "Zuschneiden fehlgeschlagen oder Token ungültig", 404
+
     temp_path = image_tool.crop_and_save(token)
     if not temp_path:
+        image_tool.pending_crops.release(token)
         return "Zuschneiden fehlgeschlagen oder Token ungültig", 404
 
     # Get the original filename from pending_crops
-    filename = image_tool.pending_crops[token]['filename']
+    filename = crop['filename']
 
     # Send the file with the original filename
     response = send_file(temp_path, as_attachment=True,
@@ -361,22 +491,24 @@ def download_cropped_image(token):
     # Schedule cleanup after response is sent
     @response.call_on_close
     def cleanup():
-        # Mark as downloaded and cleanup
-        image_tool.pending_crops[token]['downloaded'] = True
-        image_tool.cleanup_old_files()
+        # Token ist eingelöst, Upload und Ergebnis sofort entfernen
+        image_tool.pending_crops.pop(token, None)
+        janitor.expire(crop["file_path"])
+        janitor.expire(temp_path)
 
     return response
 
 
 @app.route('/download_audio/<token>')
 def download_converted_audio(token):
-    audio_tool = tools.get("AudioConverterTool")
+    audio_tool = create_tool("AudioConverterTool")
     if not audio_tool:
         print("Error: AudioConverterTool not found")
         return "Tool nicht gefunden", 404
 
-    # Check if the conversion exists
-    if token not in audio_tool.pending_conversions:
+    # Check if the conversion exists and wasn't already claimed by another request
+    conversion = audio_tool.pending_conversions.claim(token)
+    if not conversion:
         print(f"Error: Invalid or expired download token: {token}")
         return "Ungültiger oder abgelaufener Download-Token", 404
 
@@ -385,14 +517,15 @@ def download_converted_audio(token):
         temp_path = audio_tool.convert_and_save(token)
         if not temp_path:
             print(f"Error: Failed to convert audio file for token: {token}")
+            audio_tool.pending_conversions.release(token)
             return "Konvertierung fehlgeschlagen", 500
 
         if not os.path.exists(temp_path):
             print(f"Error: Converted file not found at: {temp_path}")
+            audio_tool.pending_conversions.release(token)
             return "Konvertierte Datei nicht gefunden", 404
 
         # Get file info
-        conversion = audio_tool.pending_conversions[token]
         filename = conversion['filename']
         target_format = conversion['target_format']
 
@@ -426,9 +559,10 @@ def download_converted_audio(token):
         @response.call_on_close
         def cleanup():
             try:
-                # Mark as downloaded and cleanup
-                audio_tool.pending_conversions[token]['downloaded'] = True
-                audio_tool.cleanup_old_files()
+                # Token ist eingelöst, Upload und Ergebnis sofort entfernen
+                audio_tool.pending_conversions.pop(token, None)
+                janitor.expire(conversion["file_path"])
+                janitor.expire(temp_path)
             except Exception as e:
                 print(f"Error during cleanup: {str(e)}")
 
@@ -443,16 +577,20 @@ def download_converted_audio(token):
 
 @app.route('/download_converted_media/<token>', methods=['GET', 'POST'])
 def download_converted_media(token):
-    converter_tool = tools.get("GifVideoConverterTool")
+    converter_tool = create_tool("GifVideoConverterTool")
     if not converter_tool:
         return "Tool nicht gefunden", 404
 
+    conversion = converter_tool.pending_conversions.claim(token)
+    if not conversion:
+        return "Konvertierung fehlgeschlagen oder Token ungültig", 404
+
     temp_path = converter_tool.convert_and_save(token)
     if not temp_path:
+        converter_tool.pending_conversions.release(token)
         return "Konvertierung fehlgeschlagen oder Token ungültig", 404
 
     # Original-Dateiname aus pending_conversions abrufen
-    conversion = converter_tool.pending_conversions[token]
     is_gif = conversion["is_gif"]
 
     # Ausgabenamen bestimmen
@@ -470,16 +608,17 @@ def download_converted_media(token):
     # Cleanup nach dem Senden der Antwort planen
     @response.call_on_close
     def cleanup():
-        # Als heruntergeladen markieren und aufräumen
-        converter_tool.pending_conversions[token]['downloaded'] = True
-        converter_tool.cleanup_old_files()
+        # Token ist eingelöst, Upload und Ergebnis sofort entfernen
+        converter_tool.pending_conversions.pop(token, None)
+        janitor.expire(conversion["file_path"])
+        janitor.expire(temp_path)
 
     return response
 
 
 @app.route('/download_text/<token>')
 def download_extracted_text(token):
-    ocr_tool = tools.get("OcrScannerTool")
+    ocr_tool = create_tool("OcrScannerTool")
     if not ocr_tool:
         return "Tool nicht gefunden", 404
 
@@ -501,15 +640,45 @@ def download_extracted_text(token):
     # Schedule cleanup
     @response.call_on_close
     def cleanup():
-        if os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-                ocr_tool.cleanup_old_files()
-            except Exception as e:
-                print(f"Error cleaning up files: {str(e)}")
+        janitor.expire(temp_file)
 
     return response
 
+@app.route('/artifact/<token>')
+def download_artifact(token):
+    """Streams a tool output. Supports Range requests and conditional GETs, ?download=1 saves the file."""
+    artifact = artifact_store.get(token)
+    if not artifact:
+        return "Datei nicht gefunden oder Token ungültig", 404
+
+    if not artifact["complete"]:
+        # Wird noch geschrieben (z.B. Sprachausgabe), mitlesen statt auf das Ende zu warten
+        return Response(artifact_store.follow(token),
+                        mimetype=artifact["mimetype"],
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    # Die Datei bleibt bis zum Ablauf des Tokens abrufbar (z.B. für Seek im Audioplayer)
+    return send_file(artifact["path"],
+                     mimetype=artifact["mimetype"],
+                     as_attachment=request.args.get("download") == "1",
+                     download_name=artifact["download_name"],
+                     conditional=True,
+                     etag=True)
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Counters of the temp janitor and the result cache of this worker process,
+    LLM speed and Whisper model cache hits per model.
+    """
+    return jsonify({
+        "temp_janitor": janitor.stats(),
+        "result_cache": result_cache.stats(),
+        "llm": llm_metrics.stats(),
+        "whisper_model_cache": whisper_cache_metrics.stats(),
+    })
+
 # byebye
 @app.route('/robots.txt')
 def robots():